@@ -29,3 +29,28 @@ app = Celery('proj')
 # app.config_from_object('django.conf:settings')
 app.config_from_envvar('CELERY_CONFIG_MODULE')
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
+
+# Seconds between runs of the predictive scaling task
+PREDICTIVE_SCALING_INTERVAL = 15 * 60
+# Seconds between checks of autoscaler schedules, which is how late
+# scaling may be at the start or end of a window
+AUTOSCALER_SCHEDULES_INTERVAL = 60
+# Seconds between reconciliations of clusters with rancher and kubernetes
+RECONCILE_INTERVAL = 10 * 60
+
+
+@app.on_after_configure.connect
+def setup_periodic_tasks(sender, **kwargs):
+    # Tasks are referenced by name, as the apps are not loaded yet
+    sender.add_periodic_task(
+        PREDICTIVE_SCALING_INTERVAL,
+        sender.signature('clusterman.tasks.predictive_scaling'),
+        name='clusterman predictive scaling')
+    sender.add_periodic_task(
+        AUTOSCALER_SCHEDULES_INTERVAL,
+        sender.signature('clusterman.tasks.apply_autoscaler_schedules'),
+        name='clusterman autoscaler schedules')
+    sender.add_periodic_task(
+        RECONCILE_INTERVAL,
+        sender.signature('clusterman.tasks.reconcile_clusters'),
+        name='clusterman reconciliation')
@@ -0,0 +1,63 @@
+"""
+Splitting of Alertmanager webhook payloads which carry alerts for several
+clusters, so that a single receiver can serve all of them.
+
+The firing alerts of a payload are grouped by the cluster and zone in
+their labels, and each group becomes a payload of its own, as if
+Alertmanager had sent it to the cluster's own signal endpoint. The labels
+and annotations shared by the group's alerts become its common labels and
+annotations, so that scaling policies see the same values they would for
+a payload grouped by Alertmanager.
+"""
+
+DEFAULT_CLUSTER_LABEL = 'cluster'
+ZONE_LABEL = 'availability_zone'
+
+
+def _common(mappings):
+    first, rest = mappings[0], mappings[1:]
+    return {key: value for key, value in first.items()
+            if all(m.get(key) == value for m in rest)}
+
+
+def _label(signal, alert, name):
+    return ((alert.get('labels') or {}).get(name) or
+            (signal.get('commonLabels') or {}).get(name))
+
+
+def group_alerts(signal, cluster_label=DEFAULT_CLUSTER_LABEL):
+    """
+    Groups the firing alerts of signal by their cluster_label and
+    availability_zone labels. Returns a dict of a payload for each
+    (cluster, zone) pair, in the order the pairs first appear, where zone
+    is None for alerts without a zone, and the number of firing alerts
+    without a cluster label, which are left out. Each payload's groupKey
+    is extended with its cluster and zone, so that repeats of the same
+    group can be told apart from other groups. Payloads of a signal
+    without a groupKey have none either, so they are never coalesced.
+    """
+    alerts = {}
+    unlabelled = 0
+    for alert in signal.get('alerts') or []:
+        if alert.get('status', 'firing') == 'resolved':
+            continue
+        cluster = _label(signal, alert, cluster_label)
+        if not cluster:
+            unlabelled += 1
+            continue
+        zone = _label(signal, alert, ZONE_LABEL)
+        alerts.setdefault((cluster, zone), []).append(alert)
+    group_key = signal.get('groupKey')
+    groups = {}
+    for (cluster, zone), group in alerts.items():
+        labels = dict(signal.get('commonLabels') or {}, **_common(
+            [alert.get('labels') or {} for alert in group]))
+        labels[cluster_label] = cluster
+        annotations = dict(signal.get('commonAnnotations') or {}, **_common(
+            [alert.get('annotations') or {} for alert in group]))
+        groups[(cluster, zone)] = dict(
+            signal, alerts=group, commonLabels=labels,
+            commonAnnotations=annotations,
+            groupKey="{0}:{1}/{2}".format(group_key, cluster, zone or '')
+            if group_key else None)
+    return groups, unlabelled
@@ -1,15 +1,30 @@
 """CloudMan Service API."""
+import logging
 import uuid
+from datetime import timedelta
 
+from django.core.cache import cache
 from django.db import IntegrityError
+from django.db import transaction
+from django.db.models import F
+from django.db.models import Prefetch
+from django.utils import timezone
 
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import ValidationError
 
 from cloudlaunch import models as cl_models
 from cloudlaunch_cli.api.client import APIClient
 from . import exceptions
+from . import forecasting
 from . import models
+from . import queryset_rules
+from . import reconciliation
 from . import resources
+from . import scale_stats
+from . import scaling_policies
+
+log = logging.getLogger(__name__)
 
 
 class CMServiceContext(object):
@@ -65,6 +80,14 @@ class CMService(object):
             scope = [scopes]
         return self.context.user.has_perms(scope, obj)
 
+    def filter_permitted(self, scope, queryset):
+        """
+        Returns the objects in queryset which the user has permission scope
+        on, filtering in the database where the rule allows it.
+        """
+        return queryset_rules.filter_objects(self.context.user, scope,
+                                             queryset)
+
     def check_permissions(self, scopes, obj=None):
         if not self.has_permissions(scopes, obj):
             self.raise_no_permissions(scopes)
@@ -100,20 +123,37 @@ class CMClusterService(CMService):
         cluster = resources.Cluster(self, model)
         cluster.nodes = CMClusterNodeService(self.context, cluster)
         cluster.autoscalers = CMClusterAutoScalerService(self.context, cluster)
+        cluster.operations = CMScaleOperationService(self.context, cluster)
+        cluster.events = CMScaleEventService(self.context, cluster)
+        cluster.reconciliation = CMReconcileService(self.context, cluster)
         return cluster
 
     def list(self):
-        return [self.to_api_object(c) for c in models.CMCluster.objects.all()
-                if self.has_permissions('clusters.view_cluster', c)]
+        return [self.to_api_object(c) for c in self.filter_permitted(
+            'clusters.view_cluster', self._get_queryset())]
+
+    @staticmethod
+    def _get_queryset():
+        return models.CMCluster.objects.select_related(
+            '_default_zone__region__cloud')
 
     def get(self, cluster_id):
-        obj = models.CMCluster.objects.get(id=cluster_id)
+        obj = self._get_queryset().get(id=cluster_id)
         self.check_permissions('clusters.view_cluster', obj)
         return self.to_api_object(obj)
 
     def find(self, name):
-        return [self.to_api_object(c) for c in models.CMCluster.objects.filter(name=name)
-                if self.has_permissions('clusters.view_cluster', c)]
+        return [self.to_api_object(c) for c in self.filter_permitted(
+            'clusters.view_cluster', self._get_queryset().filter(name=name))]
+
+    def find_by_names(self, names):
+        """
+        Returns the clusters with any of the given names, keyed by name,
+        with a single query.
+        """
+        return {c.name: self.to_api_object(c) for c in self.filter_permitted(
+            'clusters.view_cluster',
+            self._get_queryset().filter(name__in=names))}
 
     def create(self, name, cluster_type, connection_settings, autoscale=True):
         self.check_permissions('clusters.add_cluster')
@@ -156,27 +196,97 @@ class CMClusterNodeService(CMService):
 
     def list(self):
         nodes = models.CMClusterNode.objects.filter(
-            cluster=self.cluster.db_model)
-        return [self.to_api_object(n) for n in nodes
-                if self.has_permissions('clusternodes.view_clusternode', n)]
+            cluster=self.cluster.db_model).select_related(
+                'cluster___default_zone__region__cloud')
+        return [self.to_api_object(n) for n in self.filter_permitted(
+            'clusternodes.view_clusternode', nodes)]
 
     def get(self, node_id):
         obj = models.CMClusterNode.objects.get(id=node_id)
         self.check_permissions('clusternodes.view_clusternode', obj)
         return self.to_api_object(obj)
 
-    def create(self, vm_type=None, zone=None, autoscaler=None):
+    def _generate_node_name(self):
+        return "{0}-{1}".format(self.cluster.name, str(uuid.uuid4())[:6])
+
+    def _release_nodes(self, autoscaler_id, count, standby=False):
+        """
+        Removes nodes which failed to launch or were deleted from an
+        autoscaler's node_count, or its standby_count for standby nodes.
+        """
+        if autoscaler_id and count:
+            field = 'standby_count' if standby else 'node_count'
+            models.CMAutoScaler.objects.filter(id=autoscaler_id).update(
+                **{field: F(field) - count})
+
+    def create(self, vm_type=None, zone=None, autoscaler=None,
+               standby=False):
+        """
+        Launches a node. Nodes launched for an autoscaler must already be
+        counted in its node_count, or standby_count for standby nodes, and
+        are removed from it if the launch fails.
+        """
         self.check_permissions('clusternodes.add_clusternode')
-        name = "{0}-{1}".format(self.cluster.name, str(uuid.uuid4())[:6])
+        name = self._generate_node_name()
         template = self.cluster.get_cluster_template()
-        cli_deployment = template.add_node(name, vm_type=vm_type, zone=zone)
+        try:
+            cli_deployment = template.add_node(
+                name, vm_type=vm_type, zone=zone, standby=standby)
+        except Exception:
+            self._release_nodes(autoscaler.id if autoscaler else None, 1,
+                                standby=standby)
+            raise
         deployment = cl_models.ApplicationDeployment.objects.get(
             pk=cli_deployment.id)
         node = models.CMClusterNode.objects.create(
             name=name, cluster=self.cluster.db_model, deployment=deployment,
-            autoscaler=autoscaler.db_model if autoscaler else None)
+            autoscaler=autoscaler.db_model if autoscaler else None,
+            standby=standby)
         return self.to_api_object(node)
 
+    def create_many(self, count, vm_type=None, zone=None, autoscaler=None,
+                    standby=False):
+        """
+        Launches count nodes at once. The deployments are created
+        concurrently, and the nodes recorded with a single bulk insert.
+        If some of the launches fail, the nodes which were launched are
+        still recorded before a ValidationError is raised, and the failed
+        ones are removed from the autoscaler's node_count.
+        """
+        self.check_permissions('clusternodes.add_clusternode')
+        names = [self._generate_node_name() for _ in range(count)]
+        template = self.cluster.get_cluster_template()
+        error = None
+        try:
+            cli_deployments = template.add_nodes(
+                names, vm_type=vm_type, zone=zone, standby=standby)
+        except exceptions.CMBatchCommandException as e:
+            cli_deployments = e.results
+            error = e
+        except Exception:
+            self._release_nodes(autoscaler.id if autoscaler else None, count,
+                                standby=standby)
+            raise
+        launched = {name: d.id for name, d in zip(names, cli_deployments)
+                    if d}
+        self._release_nodes(autoscaler.id if autoscaler else None,
+                            count - len(launched), standby=standby)
+        deployments = cl_models.ApplicationDeployment.objects.in_bulk(
+            list(launched.values()))
+        models.CMClusterNode.objects.bulk_create([
+            models.CMClusterNode(
+                name=name, cluster=self.cluster.db_model,
+                deployment=deployments[deployment_id],
+                autoscaler=autoscaler.db_model if autoscaler else None,
+                standby=standby)
+            for name, deployment_id in launched.items()])
+        if error:
+            raise ValidationError(str(error))
+        # bulk_create does not set primary keys on all databases
+        nodes = models.CMClusterNode.objects.filter(
+            cluster=self.cluster.db_model, name__in=names)
+        return [self.to_api_object(n) for n in nodes]
+
     def delete(self, node):
         if node:
             self.check_permissions('clusternodes.delete_clusternode', node)
@@ -184,16 +294,53 @@ class CMClusterNodeService(CMService):
             template.remove_node(node)
             # call the saved django delete method which we remapped
             node.original_delete()
+            self._release_nodes(node.autoscaler_id, 1, standby=node.standby)
+
+    def delete_many(self, nodes):
+        """
+        Deletes many nodes at once, draining them and removing them from
+        the cluster together, see the cluster template's remove_nodes. If
+        some of the removals fail, the other nodes are still deleted before
+        the CMBatchCommandException is raised, and the nodes it lists as
+        failed are kept.
+        """
+        nodes = list(nodes)
+        for node in nodes:
+            self.check_permissions('clusternodes.delete_clusternode', node)
+        if not nodes:
+            return
+        template = self.cluster.get_cluster_template()
+        error = None
+        try:
+            template.remove_nodes(nodes)
+        except exceptions.CMBatchCommandException as e:
+            error = e
+        failed = {index for index, _, _ in error.failures} if error else set()
+        for index, node in enumerate(nodes):
+            if index not in failed:
+                node.original_delete()
+                self._release_nodes(node.autoscaler_id, 1,
+                                    standby=node.standby)
+        if error:
+            raise error
 
 
 class CMClusterAutoScalerService(CMService):
 
+    # Seconds before the cached zone table is rebuilt anyway, in case a
+    # zone was renamed. The table only holds zone ids, so a stale table in
+    # another process, such as a celery worker, never returns stale
+    # autoscalers and the default per-process cache is enough.
+    ROUTES_CACHE_TIMEOUT = 300
+
     def __init__(self, context, cluster):
         super(CMClusterAutoScalerService, self).__init__(context)
         self.cluster = cluster
 
     def to_api_object(self, model):
         autoscaler = resources.ClusterAutoScaler(self, model)
+        autoscaler.schedules = CMAutoScalerScheduleService(self.context,
+                                                           autoscaler)
         return autoscaler
 
     def list(self):
@@ -207,20 +354,76 @@ class CMClusterAutoScalerService(CMService):
         obj = models.CMAutoScaler.objects.get(id=autoscaler_id)
         return self.to_api_object(obj)
 
+    def _get_routes(self):
+        key = models.autoscaler_routes_cache_key(self.cluster.id)
+        routes = cache.get(key)
+        if routes is None:
+            routes = {}
+            for zone_name, zone_id in models.CMAutoScaler.objects.filter(
+                    cluster=self.cluster.db_model).values_list(
+                        'zone__name', 'zone_id').distinct():
+                routes.setdefault(zone_name, []).append(zone_id)
+            cache.set(key, routes, self.ROUTES_CACHE_TIMEOUT)
+        return routes
+
+    def route(self, zone_name=None):
+        """
+        Returns the autoscalers which match a scaling signal for zone_name.
+        A cached table maps zone names to the ids of the zones the cluster
+        has autoscalers in, so the autoscalers themselves are always
+        fetched fresh, by zone id, without a join on the zone table.
+        """
+        self.check_permissions('clusters.view_cluster', self.cluster)
+        if not zone_name:
+            return []
+        scalers = models.CMAutoScaler.objects.filter(
+            cluster=self.cluster.db_model)
+        zone_ids = self._get_routes().get(zone_name)
+        if zone_ids:
+            scalers = list(scalers.filter(zone_id__in=zone_ids))
+        else:
+            # The table may predate an autoscaler added to this zone by
+            # another process, so look it up by name, and rebuild the
+            # table if one turns up
+            scalers = list(scalers.filter(zone__name=zone_name))
+            if scalers:
+                cache.delete(
+                    models.autoscaler_routes_cache_key(self.cluster.id))
+        return [self.to_api_object(scaler) for scaler in scalers]
+
     def create(self, vm_type=None, name=None, zone=None,
-               min_nodes=None, max_nodes=None):
+               min_nodes=None, max_nodes=None, policy=None,
+               scale_up_cooldown=None, scale_down_cooldown=None,
+               max_nodes_per_minute=None, standby_nodes=None,
+               forecast_period=None, predictive_dry_run=None):
         self.check_permissions('clusters.change_cluster', self.cluster)
         if not name:
             name = "{0}-{1}".format(self.cluster.name, str(uuid.uuid4())[:6])
         vm_type = vm_type or self.cluster.default_vm_type
         autoscaler = models.CMAutoScaler.objects.create(
             cluster=self.cluster.db_model, name=name, vm_type=vm_type,
-            zone=zone, min_nodes=min_nodes, max_nodes=max_nodes)
-        return self.to_api_object(autoscaler)
+            zone=zone, min_nodes=min_nodes, max_nodes=max_nodes,
+            policy=policy or scaling_policies.DEFAULT_POLICY,
+            scale_up_cooldown=scale_up_cooldown or 0,
+            scale_down_cooldown=scale_down_cooldown or 0,
+            max_nodes_per_minute=max_nodes_per_minute,
+            standby_nodes=standby_nodes or 0,
+            forecast_period=forecast_period or forecasting.DAILY,
+            predictive_dry_run=bool(predictive_dry_run))
+        autoscaler = self.to_api_object(autoscaler)
+        if autoscaler.standby_nodes:
+            autoscaler.schedule_replenish()
+        return autoscaler
 
     def update(self, autoscaler):
         self.check_permissions('clusters.change_cluster', autoscaler)
-        autoscaler.db_model.save()
+        # Leave the scaling state to the workers which maintain it
+        autoscaler.db_model.save(update_fields=[
+            f.name for f in models.CMAutoScaler._meta.concrete_fields
+            if not f.primary_key and
+            f.name not in autoscaler.SCALING_STATE_FIELDS])
+        if autoscaler.standby_nodes != autoscaler.standby_count:
+            autoscaler.schedule_replenish()
         return autoscaler
 
     def delete(self, autoscaler):
@@ -240,3 +443,301 @@ class CMClusterAutoScalerService(CMService):
                 'max_nodes': 5
             })
         return self.to_api_object(obj)
+
+
+class CMAutoScalerScheduleService(CMService):
+
+    def __init__(self, context, autoscaler):
+        super(CMAutoScalerScheduleService, self).__init__(context)
+        self.autoscaler = autoscaler
+
+    def to_api_object(self, schedule):
+        # Remap the django model's delete method to the API method, as for
+        # cluster nodes
+        schedule.original_delete = schedule.delete
+        schedule.delete = lambda: self.delete(schedule)
+        return schedule
+
+    def list(self):
+        self.check_permissions('clusters.view_cluster',
+                               self.autoscaler.cluster)
+        return [self.to_api_object(s) for s in
+                models.CMAutoScalerSchedule.objects.filter(
+                    autoscaler=self.autoscaler.db_model)]
+
+    def get(self, schedule_id):
+        self.check_permissions('clusters.view_cluster',
+                               self.autoscaler.cluster)
+        return self.to_api_object(models.CMAutoScalerSchedule.objects.get(
+            id=schedule_id, autoscaler=self.autoscaler.db_model))
+
+    def create(self, name, start_time, end_time, days='*', timezone='UTC',
+               min_nodes=None, max_nodes=None, enabled=True):
+        """
+        Adds a window in which the autoscaler's min_nodes and max_nodes are
+        overridden. The apply_autoscaler_schedules task scales the
+        autoscaler to the new limits when the window opens and closes.
+        """
+        self.check_permissions('clusters.change_cluster',
+                               self.autoscaler.cluster)
+        try:
+            schedule = models.CMAutoScalerSchedule.objects.create(
+                autoscaler=self.autoscaler.db_model, name=name,
+                start_time=start_time, end_time=end_time, days=days,
+                timezone=timezone, min_nodes=min_nodes, max_nodes=max_nodes,
+                enabled=enabled)
+        except IntegrityError:
+            raise exceptions.CMDuplicateNameException(
+                "A schedule with name: %s already exists" % name)
+        return self.to_api_object(schedule)
+
+    def update(self, schedule):
+        self.check_permissions('clusters.change_cluster',
+                               self.autoscaler.cluster)
+        schedule.save()
+        return schedule
+
+    def delete(self, schedule):
+        self.check_permissions('clusters.change_cluster',
+                               self.autoscaler.cluster)
+        if schedule:
+            # call the saved django delete method which we remapped
+            schedule.original_delete()
+
+
+class CMScaleOperationService(CMService):
+
+    def __init__(self, context, cluster):
+        super(CMScaleOperationService, self).__init__(context)
+        self.cluster = cluster
+
+    def list(self):
+        self.check_permissions('clusters.view_cluster', self.cluster)
+        return models.CMScaleOperation.objects.filter(
+            cluster=self.cluster.db_model)
+
+    def get(self, operation_id):
+        self.check_permissions('clusters.view_cluster', self.cluster)
+        return models.CMScaleOperation.objects.get(
+            id=operation_id, cluster=self.cluster.db_model)
+
+    def create(self, direction, zone_name=None, count=1, group_key=None,
+               signal=None):
+        """
+        Records a scale operation, to be carried out in the background as
+        the current user by the process_scale_operation task.
+        """
+        self.check_permissions('autoscalers.can_autoscale')
+        return models.CMScaleOperation.objects.create(
+            cluster=self.cluster.db_model, direction=direction,
+            zone_name=zone_name, count=count, group_key=group_key,
+            signal=signal, user=self.context.user)
+
+    def find_recent(self, direction, zone_name=None, group_key=None,
+                    window=0):
+        """
+        Returns the latest operation in the same direction, zone and alert
+        group which was requested within the last window seconds and has
+        not failed, or None.
+        """
+        if not window:
+            return None
+        return models.CMScaleOperation.objects.filter(
+            cluster=self.cluster.db_model, direction=direction,
+            zone_name=zone_name, group_key=group_key,
+            added__gte=timezone.now() - timedelta(seconds=window)).exclude(
+                status=models.CMScaleOperation.STATUS_FAILED).first()
+
+    def get_or_create(self, direction, zone_name=None, count=1,
+                      group_key=None, window=0, signal=None):
+        """
+        Coalesces repeated signals. Returns a recent matching operation as
+        found by find_recent if there is one, and records a new operation
+        otherwise, along with whether it was created. Signals without a
+        group_key are never coalesced.
+        """
+        self.check_permissions('autoscalers.can_autoscale')
+        if not group_key or not window:
+            return self.create(direction, zone_name=zone_name, count=count,
+                               signal=signal), True
+        with transaction.atomic():
+            # Serialize concurrent repeats of a signal on the cluster row,
+            # so that only the first of them records an operation
+            models.CMCluster.objects.select_for_update().get(
+                id=self.cluster.db_model.id)
+            operation = self.find_recent(direction, zone_name=zone_name,
+                                         group_key=group_key, window=window)
+            if operation:
+                return operation, False
+            return self.create(direction, zone_name=zone_name, count=count,
+                               group_key=group_key, signal=signal), True
+
+    def run(self, operation):
+        """
+        Carries out a queued scale operation, recording its outcome and
+        timing on the operation.
+        """
+        operation.status = models.CMScaleOperation.STATUS_RUNNING
+        operation.started = timezone.now()
+        operation.save()
+        try:
+            if operation.direction == models.CMScaleOperation.DIRECTION_UP:
+                self.cluster.scaleup(zone_name=operation.zone_name,
+                                     count=operation.count,
+                                     signal=operation.signal,
+                                     operation=operation)
+            else:
+                self.cluster.scaledown(zone_name=operation.zone_name,
+                                       count=operation.count,
+                                       signal=operation.signal,
+                                       operation=operation)
+            operation.status = models.CMScaleOperation.STATUS_SUCCEEDED
+        except exceptions.CMScaleRejectedException as e:
+            log.info("Scale operation %s rejected: %s", operation.id, e)
+            operation.status = models.CMScaleOperation.STATUS_REJECTED
+            operation.message = str(e)
+        except Exception as e:
+            log.exception("Scale operation %s failed", operation.id)
+            operation.status = models.CMScaleOperation.STATUS_FAILED
+            operation.message = str(e)
+        operation.finished = timezone.now()
+        operation.save()
+        return operation
+
+
+class CMScaleEventService(CMService):
+
+    # Period and window size of stats, in seconds, unless asked otherwise
+    DEFAULT_STATS_PERIOD = 24 * 3600
+    DEFAULT_STATS_WINDOW = 3600
+
+    def __init__(self, context, cluster):
+        super(CMScaleEventService, self).__init__(context)
+        self.cluster = cluster
+
+    def list(self):
+        self.check_permissions('clusters.view_cluster', self.cluster)
+        return models.CMScaleEvent.objects.filter(
+            cluster=self.cluster.db_model)
+
+    def get(self, event_id):
+        self.check_permissions('clusters.view_cluster', self.cluster)
+        return models.CMScaleEvent.objects.get(
+            id=event_id, cluster=self.cluster.db_model)
+
+    def stats(self, since=None, until=None, window=None):
+        """
+        Returns counts and latency percentiles of the cluster's scale
+        events, per window seconds from since until until, as computed by
+        scale_stats.summarize. Covers the last day, by the hour, by
+        default. Raises a ValidationError if that makes for more than
+        scale_stats.MAX_WINDOWS windows.
+        """
+        self.check_permissions('clusters.view_cluster', self.cluster)
+        until = until or timezone.now()
+        since = since or until - timedelta(seconds=self.DEFAULT_STATS_PERIOD)
+        window = window or self.DEFAULT_STATS_WINDOW
+        if (until - since).total_seconds() / window > scale_stats.MAX_WINDOWS:
+            raise ValidationError("At most %s windows can be requested at once"
+                                  % scale_stats.MAX_WINDOWS)
+        events = models.CMScaleEvent.objects.filter(
+            cluster=self.cluster.db_model, requested__gte=since,
+            requested__lt=until).order_by('requested', 'id').values(
+                'autoscaler_id', 'direction', 'outcome', 'nodes',
+                'requested', 'completed')
+        return scale_stats.summarize(events, since, until, window)
+
+
+class CMReconcileService(CMService):
+
+    # Seconds after launch before a node which neither rancher nor
+    # kubernetes know about is taken to be missing, unless set otherwise
+    DEFAULT_GRACE_PERIOD = 3600
+    # How long reports are kept for
+    REPORT_RETENTION = timedelta(days=7)
+
+    def __init__(self, context, cluster):
+        super(CMReconcileService, self).__init__(context)
+        self.cluster = cluster
+
+    def list(self):
+        self.check_permissions('clusters.view_cluster', self.cluster)
+        return models.CMReconcileReport.objects.filter(
+            cluster=self.cluster.db_model)
+
+    def get(self, report_id):
+        self.check_permissions('clusters.view_cluster', self.cluster)
+        return models.CMReconcileReport.objects.get(
+            id=report_id, cluster=self.cluster.db_model)
+
+    def _get_db_inventory(self, grace_period):
+        """
+        Returns the cluster's nodes, with the IP addresses from their
+        launch results, in a single query plus one for the launch tasks.
+        """
+        settled_before = timezone.now() - timedelta(seconds=grace_period)
+        nodes = models.CMClusterNode.objects.filter(
+            cluster=self.cluster.db_model).select_related(
+                'deployment').prefetch_related(Prefetch(
+                    'deployment__tasks', to_attr='launch_tasks',
+                    queryset=cl_models.ApplicationDeploymentTask.objects.filter(
+                        action=cl_models.ApplicationDeploymentTask.LAUNCH)))
+        inventory = []
+        for node in nodes:
+            ips = set()
+            for task in node.deployment.launch_tasks:
+                result = task.result.get('cloudLaunch') or {}
+                ips.update(result.get(field) for field in
+                           ('publicIP', 'privateIP') if result.get(field))
+            inventory.append({
+                'id': node.id,
+                'ips': ips,
+                'settled': node.deployment.added < settled_before,
+            })
+        return inventory
+
+    def _repair(self, node_ids):
+        repaired = 0
+        for node_id in node_ids:
+            try:
+                # deleting through the node service also releases the node
+                # from its autoscaler's node_count
+                self.cluster.nodes.get(node_id).delete()
+                repaired += 1
+            except Exception:
+                log.exception("Could not remove missing node %s of cluster "
+                              "%s", node_id, self.cluster.id)
+        return repaired
+
+    def run(self, repair=False, grace_period=None):
+        """
+        Compares the nodes on record for the cluster with the nodes in
+        rancher and kubernetes, as described in reconciliation.diff, and
+        records the result as a CMReconcileReport. By default drift is only
+        reported. If repair is True, nodes which have been missing from both
+        for longer than grace_period seconds after launch are deleted, so
+        that autoscalers stop counting them. Other drift is never repaired. Reports older than
+        REPORT_RETENTION are removed.
+        """
+        self.check_permissions('clusters.change_cluster', self.cluster)
+        started = timezone.now()
+        if grace_period is None:
+            grace_period = self.DEFAULT_GRACE_PERIOD
+        template = self.cluster.get_cluster_template()
+        db_nodes = self._get_db_inventory(grace_period)
+        rancher_nodes, kube_nodes = template.get_node_inventories()
+        drift = reconciliation.diff(db_nodes, rancher_nodes, kube_nodes)
+        report = models.CMReconcileReport(
+            cluster=self.cluster.db_model, started=started,
+            db_nodes=len(db_nodes), rancher_nodes=len(rancher_nodes),
+            kubernetes_nodes=len(kube_nodes), details=drift,
+            **{kind: len(drift[kind])
+               for kind in reconciliation.DRIFT_KINDS})
+        if repair:
+            report.repaired = self._repair(drift[reconciliation.MISSING])
+        report.finished = timezone.now()
+        report.save()
+        models.CMReconcileReport.objects.filter(
+            cluster=self.cluster.db_model,
+            finished__lt=report.finished - self.REPORT_RETENTION).delete()
+        return report
@@ -1,11 +1,18 @@
 import csv
 import io
 import subprocess
-import yaml
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
+from .. import yaml_codec
+from ..exceptions import CMBatchCommandException
 from ..exceptions import CMRunCommandException
 
 
+# Upper bound on the number of commands run concurrently by a batch
+DEFAULT_BATCH_WORKERS = 8
+
+
 def run_command(command, shell=False):
     """
     Runs a command and returns stdout
@@ -37,7 +44,128 @@ def run_yaml_command(command):
     Runs a command, and parses the output as yaml.
     """
     output = run_command(command)
-    return yaml.safe_load(output)
+    return yaml_codec.safe_load(output)
+
+
+def stream_command(command, shell=False):
+    """
+    Runs a command and yields its stdout line by line as it is produced,
+    instead of buffering the entire output. stderr is spooled to a temporary
+    file so that a chatty child cannot block on a full pipe. If the caller
+    stops iterating early, the child process is killed.
+    """
+    with tempfile.TemporaryFile(mode="w+", encoding='utf-8') as err:
+        proc = subprocess.Popen(
+            command, universal_newlines=True, shell=shell, encoding='utf-8',
+            stdout=subprocess.PIPE, stderr=err)
+        try:
+            for line in proc.stdout:
+                yield line
+            if proc.wait():
+                err.seek(0)
+                raise CMRunCommandException(
+                    f"Error running command: {err.read()}")
+        finally:
+            proc.stdout.close()
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+
+def iter_list_command(command, delimiter="\t", skipinitialspace=True):
+    """
+    Streaming version of run_list_command. Runs a command and yields each
+    row of its tab separated columnar output as a dict, as soon as the row
+    has been read. First row must be column names.
+    """
+    reader = csv.DictReader(stream_command(command), delimiter=delimiter,
+                            skipinitialspace=skipinitialspace)
+    for row in reader:
+        yield {key.strip(): val.strip() for key, val in row.items()}
+
+
+class _LineReader(object):
+    """
+    Minimal file-like adapter over an iterable of lines, so that parsers
+    which pull data through read() can consume a generator incrementally.
+    """
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._chunks = []
+        self._length = 0
+
+    def read(self, size=-1):
+        while size < 0 or self._length < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._chunks.append(line)
+            self._length += len(line)
+        data = "".join(self._chunks)
+        if 0 <= size < len(data):
+            data, rest = data[:size], data[size:]
+            self._chunks = [rest]
+            self._length = len(rest)
+        else:
+            self._chunks = []
+            self._length = 0
+        return data
+
+
+def iter_yaml_command(command):
+    """
+    Streaming version of run_yaml_command. Runs a command and yields each
+    yaml document in its output as soon as it has been parsed, so that
+    multi-document output never has to be held in memory in full.
+    """
+    for document in yaml_codec.safe_load_all(
+            _LineReader(stream_command(command))):
+        yield document
+
+
+def run_batch(func, items, max_workers=DEFAULT_BATCH_WORKERS):
+    """
+    Calls func on each item using a bounded thread pool, and returns the
+    results in the same order as items. All calls are allowed to finish.
+    If any of them raised an exception, a single CMBatchCommandException
+    aggregating every failure is raised instead.
+    """
+    items = list(items)
+    if len(items) <= 1 or max_workers <= 1:
+        outcomes = []
+        for item in items:
+            try:
+                outcomes.append((func(item), None))
+            except Exception as e:
+                outcomes.append((None, e))
+    else:
+        with ThreadPoolExecutor(
+                max_workers=min(max_workers, len(items))) as executor:
+            futures = [executor.submit(func, item) for item in items]
+        outcomes = [(None, f.exception()) if f.exception()
+                    else (f.result(), None) for f in futures]
+    results = [result for result, _ in outcomes]
+    failures = [(index, items[index], e)
+                for index, (_, e) in enumerate(outcomes) if e is not None]
+    if failures:
+        raise CMBatchCommandException(failures, results)
+    return results
+
+
+def run_batch_command(commands, shell=False, parser=None,
+                      max_workers=DEFAULT_BATCH_WORKERS):
+    """
+    Runs many independent commands concurrently and returns their outputs in
+    the same order as commands. If a parser function (e.g. yaml_codec.safe_load)
+    is supplied, each output is parsed with it. Failures are aggregated into
+    a single CMBatchCommandException.
+    """
+    def run(command):
+        output = run_command(command, shell=shell)
+        return parser(output) if parser else output
+
+    return run_batch(run, commands, max_workers=max_workers)
 
 
 # based on: https://codereview.stackexchange.com/questions/21033/flatten-dic
@@ -80,10 +80,27 @@ class KubeNodeService(KubeService):
                 if node_ip in [addr.get('address') for addr in
                                node.get('status', {}).get('addresses', {})]]
 
+    def find_by_label(self, label, value):
+        data = helpers.run_yaml_command(
+            ["kubectl", "get", "nodes", "-l", f"{label}={value}", "-o", "yaml"])
+        return data['items']
+
     def cordon(self, node):
         name = node.get('metadata', {}).get('name')
         return helpers.run_command(["kubectl", "cordon", name])
 
+    def uncordon(self, node):
+        name = node.get('metadata', {}).get('name')
+        return helpers.run_command(["kubectl", "uncordon", name])
+
+    def remove_taint(self, node, key):
+        name = node.get('metadata', {}).get('name')
+        taints = node.get('spec', {}).get('taints') or []
+        if not any(taint.get('key') == key for taint in taints):
+            return None
+        return helpers.run_command(
+            ["kubectl", "taint", "nodes", name, f"{key}-"])
+
     def _get_job_pods_in_node(self, node_name, state):
         """
         Return a list of all pods in a node in a particular state, such
@@ -1,7 +1,19 @@
+import logging
+import threading
+import time
 import requests
 from string import Template
+from requests.adapters import HTTPAdapter
 from requests.auth import AuthBase
 
+import tenacity
+
+from . import helpers
+from ..exceptions import CMRancherCircuitOpenException
+from ..exceptions import CMRancherUnavailableException
+
+log = logging.getLogger(__name__)
+
 
 class RancherAuth(AuthBase):
 
@@ -16,6 +28,91 @@ class RancherAuth(AuthBase):
         return r
 
 
+class CircuitBreaker(object):
+    """
+    Tracks consecutive failures of calls to one rancher endpoint. Once
+    failure_threshold calls in a row have failed, the circuit opens and
+    calls fail fast for reset_timeout seconds. After that, the circuit is
+    half open: a single trial call is let through, and closes the circuit
+    again if it succeeds, or reopens it if it fails. Other calls fail fast
+    while the trial is in progress, or until it is reset_timeout seconds
+    old, in case its outcome was never recorded.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_started = None
+
+    def _current_state(self):
+        if (self._state == self.OPEN and
+                time.monotonic() - self._opened_at >= self.reset_timeout):
+            return self.HALF_OPEN
+        return self._state
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout
+            }
+
+    def before_call(self):
+        """
+        Raises CMRancherCircuitOpenException if calls should fail fast.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == self.OPEN:
+                raise CMRancherCircuitOpenException(
+                    "Rancher calls are suspended after %s consecutive "
+                    "failures" % self._failures)
+            if state == self.HALF_OPEN:
+                now = time.monotonic()
+                if (self._trial_started is not None and
+                        now - self._trial_started < self.reset_timeout):
+                    raise CMRancherCircuitOpenException(
+                        "Rancher calls are suspended until a trial call "
+                        "succeeds")
+                self._trial_started = now
+            self._state = state
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                log.info("Rancher circuit closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_started = None
+            if (self._state == self.HALF_OPEN or
+                    self._failures >= self.failure_threshold):
+                if self._state != self.OPEN:
+                    log.warning("Rancher circuit opened after %s consecutive "
+                                "failures", self._failures)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
 class RancherClient(object):
 
     INSTALLED_APP_URL = ("$rancher_url/v3/projects/$project_id/app"
@@ -25,11 +122,109 @@ class RancherClient(object):
     NODE_DRAIN_URL = "$rancher_url/v3/nodes/$node_id?action=drain"
     NODE_DELETE_URL = "$rancher_url/v3/nodes/$node_id"
 
-    def __init__(self, rancher_url, api_key, cluster_id, project_id):
+    # Maximum number of keep-alive connections kept open per rancher endpoint
+    DEFAULT_POOL_SIZE = 10
+    # (connect, read) timeouts in seconds for each rancher api call
+    DEFAULT_TIMEOUT = (5, 30)
+
+    # Seconds for which a cluster registration command is reused
+    DEFAULT_REGISTRATION_TTL = 600
+    # Seconds for which the IP to node id index used by find_nodes is reused
+    NODE_INDEX_TTL = 30
+    # Number of retries for idempotent calls, and the multiplier and cap in
+    # seconds for the jittered exponential backoff between them
+    DEFAULT_RETRIES = 3
+    DEFAULT_BACKOFF = 0.5
+    MAX_BACKOFF = 10
+    # Circuit breaker settings, see CircuitBreaker
+    FAILURE_THRESHOLD = 5
+    RESET_TIMEOUT = 30
+    # Seconds to wait for deleted nodes to disappear, and between polls
+    DEFAULT_DELETE_TIMEOUT = 300
+    DELETE_POLL_INTERVAL = 2
+    # HTTP methods which are safe to retry
+    IDEMPOTENT_METHODS = ("GET", "DELETE")
+
+    # Sessions shared by all clients talking to the same rancher endpoint
+    # with the same key and pool size, keyed by (rancher_url, api_key,
+    # pool_size), so that each session's pool fits the clients using it
+    _sessions = {}
+    _sessions_lock = threading.Lock()
+    # Node registration commands keyed by (rancher_url, cluster_id), with
+    # values of (command, expiry time), and a lock per key, so that a slow
+    # token request only holds up callers for the same cluster
+    _registration_commands = {}
+    _registration_locks = {}
+    _registration_lock = threading.Lock()
+    # IP address to node id indexes keyed by (rancher_url, cluster_id), with
+    # values of (index, expiry time), and a lock per key, so that listing
+    # one cluster's nodes only holds up callers for the same cluster
+    _node_indexes = {}
+    _node_index_locks = {}
+    _node_indexes_lock = threading.Lock()
+    # Circuit breakers keyed by rancher_url
+    _breakers = {}
+    _breakers_lock = threading.Lock()
+
+    def __init__(self, rancher_url, api_key, cluster_id, project_id,
+                 pool_size=None, timeout=None, registration_ttl=None,
+                 retries=None, backoff=None):
         self.rancher_url = rancher_url
         self.api_key = api_key
         self.cluster_id = cluster_id
         self.project_id = project_id
+        self.pool_size = pool_size or self.DEFAULT_POOL_SIZE
+        # a list, e.g. from yaml settings, is treated as (connect, read)
+        self.timeout = (tuple(timeout) if isinstance(timeout, list)
+                        else timeout or self.DEFAULT_TIMEOUT)
+        self.registration_ttl = (self.DEFAULT_REGISTRATION_TTL
+                                 if registration_ttl is None
+                                 else registration_ttl)
+        self.retries = self.DEFAULT_RETRIES if retries is None else retries
+        self.backoff = self.DEFAULT_BACKOFF if backoff is None else backoff
+
+    @property
+    def session(self):
+        """
+        Returns the pooled keep-alive session for this rancher endpoint, so
+        that successive api calls reuse connections instead of paying for a
+        new TLS handshake each time.
+        """
+        key = (self.rancher_url, self.api_key, self.pool_size)
+        with self._sessions_lock:
+            session = self._sessions.get(key)
+            if not session:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1,
+                                      pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[key] = session
+            return session
+
+    @property
+    def circuit_breaker(self):
+        """
+        Returns the circuit breaker shared by all clients of this rancher
+        endpoint.
+        """
+        with self._breakers_lock:
+            breaker = self._breakers.get(self.rancher_url)
+            if not breaker:
+                breaker = CircuitBreaker(self.FAILURE_THRESHOLD,
+                                         self.RESET_TIMEOUT)
+                self._breakers[self.rancher_url] = breaker
+            return breaker
+
+    @classmethod
+    def circuit_states(cls):
+        """
+        Returns the circuit breaker state of every rancher endpoint used by
+        this process, keyed by rancher url, for monitoring.
+        """
+        with cls._breakers_lock:
+            breakers = dict(cls._breakers)
+        return {url: breaker.to_dict() for url, breaker in breakers.items()}
 
     def _format_url(self, url):
         result = Template(url).safe_substitute({
@@ -42,40 +237,201 @@ class RancherClient(object):
     def _get_auth(self):
         return RancherAuth(self)
 
-    def _api_get(self, url, data):
-        return requests.get(self._format_url(url), auth=self._get_auth(),
-                            verify=False, json=data).json()
+    def _attempt_request(self, method, url, data, params):
+        breaker = self.circuit_breaker
+        breaker.before_call()
+        try:
+            response = self.session.request(
+                method, url, auth=self._get_auth(), verify=False, json=data,
+                params=params, timeout=self.timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            breaker.record_failure()
+            raise CMRancherUnavailableException(
+                f"Could not reach rancher at {url}: {e}") from e
+        if response.status_code >= 500:
+            breaker.record_failure()
+            raise CMRancherUnavailableException(
+                f"Rancher returned {response.status_code} for {method} "
+                f"{url}: {response.text}")
+        breaker.record_success()
+        return response
+
+    def _request(self, method, url, data=None, params=None):
+        """
+        Performs an api call through the circuit breaker. Idempotent calls
+        which fail with a connection error, timeout or server error are
+        retried with jittered exponential backoff. Calls are never retried
+        while the circuit is open.
+        """
+        retries = self.retries if method in self.IDEMPOTENT_METHODS else 0
+        retryer = tenacity.Retrying(
+            stop=tenacity.stop_after_attempt(retries + 1),
+            wait=tenacity.wait_random_exponential(
+                multiplier=self.backoff, max=self.MAX_BACKOFF),
+            retry=tenacity.retry_if_exception(
+                lambda e: (isinstance(e, CMRancherUnavailableException) and
+                           not isinstance(e, CMRancherCircuitOpenException))),
+            reraise=True)
+        return retryer(self._attempt_request, method, self._format_url(url),
+                       data, params)
+
+    def _api_get(self, url, data, params=None):
+        return self._request("GET", url, data=data, params=params).json()
 
     def _api_post(self, url, data, json_response=True):
-        r = requests.post(self._format_url(url), auth=self._get_auth(),
-                          verify=False, json=data)
+        r = self._request("POST", url, data=data)
         if json_response:
             return r.json()
         else:
             return r
 
     def _api_delete(self, url, data):
-        return requests.delete(self._format_url(url), auth=self._get_auth(),
-                               verify=False, json=data).json()
+        return self._request("DELETE", url, data=data).json()
 
-    def get_cluster_registration_command(self):
-        return self._api_post(
-            self.NODE_COMMAND_URL,
-            data={"type": "clusterRegistrationToken",
-                  "clusterId": f"{self.cluster_id}"}
-        ).get('nodeCommand')
+    def get_cluster_registration_command(self, refresh=False):
+        """
+        Returns the command for joining a node to this cluster. Creating a
+        registration token is a round trip to rancher, so the command is
+        cached per cluster for registration_ttl seconds, and concurrent
+        callers for the same cluster share a single request. Pass
+        refresh=True to force a new token to be created.
+        """
+        key = (self.rancher_url, self.cluster_id)
+        with self._get_registration_lock(key):
+            cached = self._registration_commands.get(key)
+            if cached and not refresh and time.monotonic() < cached[1]:
+                return cached[0]
+            command = self._api_post(
+                self.NODE_COMMAND_URL,
+                data={"type": "clusterRegistrationToken",
+                      "clusterId": f"{self.cluster_id}"}
+            ).get('nodeCommand')
+            if command and self.registration_ttl > 0:
+                self._registration_commands[key] = (
+                    command, time.monotonic() + self.registration_ttl)
+            return command
 
-    def get_nodes(self):
-        return self._api_get(self.NODE_LIST_URL, data=None)
+    def _get_registration_lock(self, key):
+        with self._registration_lock:
+            return self._registration_locks.setdefault(key, threading.Lock())
+
+    def invalidate_registration_command(self):
+        """
+        Discards the cached registration command for this cluster, for
+        example, after a node launched with it has failed.
+        """
+        key = (self.rancher_url, self.cluster_id)
+        with self._get_registration_lock(key):
+            self._registration_commands.pop(key, None)
+
+    def get_nodes(self, **filters):
+        """
+        Yields each node in the cluster, following rancher's pagination links
+        so that no page is missed. Any keyword arguments are passed on to
+        rancher as query filters, e.g. get_nodes(ipAddress='10.0.0.1').
+        """
+        url = self.NODE_LIST_URL
+        params = filters
+        while url:
+            page = self._api_get(url, data=None, params=params)
+            for node in page.get('data', []):
+                yield node
+            url = (page.get('pagination') or {}).get('next')
+            # the next link already carries the original filters
+            params = None
 
     def find_node(self, ip):
-        matches = [n for n in self.get_nodes()['data']
-                   if n.get('ipAddress') == ip or
-                   n.get('externalIpAddress') == ip]
-        return matches[0]['id'] if matches else None
+        """
+        Returns the id of the node with the given internal or external IP,
+        letting rancher do the filtering, or None if there is no such node.
+        """
+        for field in ('ipAddress', 'externalIpAddress'):
+            # Double check the match in case the filter was not applied
+            node = next((n for n in self.get_nodes(**{field: ip})
+                         if n.get(field) == ip), None)
+            if node:
+                return node['id']
+        return None
 
-    def delete_node(self, node_id):
+    def _build_node_index(self):
+        index = {}
+        for node in self.get_nodes():
+            for field in ('ipAddress', 'externalIpAddress'):
+                if node.get(field):
+                    index.setdefault(node[field], node['id'])
+        return index
+
+    def _get_node_index_lock(self, key):
+        with self._node_indexes_lock:
+            return self._node_index_locks.setdefault(key, threading.Lock())
+
+    def find_nodes(self, ips):
+        """
+        Batch version of find_node. Returns a dict mapping each of the given
+        IPs to a node id, or None if there is no such node. Uses an index of
+        the whole cluster, built with a single paginated listing, which is
+        reused for NODE_INDEX_TTL seconds, including for IPs it does not
+        hold, so that unknown IPs do not force a new listing each time.
+        Concurrent callers for the same cluster share a single listing.
+        """
+        key = (self.rancher_url, self.cluster_id)
+        with self._get_node_index_lock(key):
+            index, expiry = self._node_indexes.get(key, (None, 0))
+            if index is None or time.monotonic() >= expiry:
+                index = self._build_node_index()
+                self._node_indexes[key] = (
+                    index, time.monotonic() + self.NODE_INDEX_TTL)
+        return {ip: index.get(ip) for ip in ips}
+
+    def _invalidate_node_index(self):
+        key = (self.rancher_url, self.cluster_id)
+        with self._get_node_index_lock(key):
+            self._node_indexes.pop(key, None)
+
+    def _delete_node_request(self, node_id):
         node_url = Template(self.NODE_DELETE_URL).safe_substitute({
             'node_id': node_id
         })
         return self._api_delete(node_url, data=None)
+
+    def delete_node(self, node_id):
+        self._invalidate_node_index()
+        return self._delete_node_request(node_id)
+
+    def delete_nodes(self, node_ids, wait=True, timeout=None,
+                     poll_interval=None):
+        """
+        Deletes many nodes at once. The deletions are issued concurrently,
+        at most pool_size at a time so that each one reuses a pooled
+        connection, and a CMBatchCommandException is raised if any of them
+        failed. If wait is True, the cluster's nodes are then listed every
+        poll_interval seconds until none of the deleted nodes remain, so that
+        the whole batch takes about as long as its slowest node's removal.
+        """
+        node_ids = list(node_ids)
+        if not node_ids:
+            return
+        self._invalidate_node_index()
+        helpers.run_batch(self._delete_node_request, node_ids,
+                          max_workers=self.pool_size)
+        if wait:
+            self.wait_till_nodes_deleted(node_ids, timeout=timeout,
+                                         poll_interval=poll_interval)
+
+    def _get_remaining_nodes(self, node_ids):
+        return set(node_ids) & {node['id'] for node in self.get_nodes()}
+
+    def wait_till_nodes_deleted(self, node_ids, timeout=None,
+                                poll_interval=None):
+        """
+        Blocks until none of the given nodes are listed by rancher. Raises
+        tenacity.RetryError if any remain after timeout seconds.
+        """
+        retryer = tenacity.Retrying(
+            stop=tenacity.stop_after_delay(
+                self.DEFAULT_DELETE_TIMEOUT if timeout is None else timeout),
+            retry=tenacity.retry_if_result(bool),
+            wait=tenacity.wait_fixed(self.DELETE_POLL_INTERVAL
+                                     if poll_interval is None
+                                     else poll_interval))
+        retryer(self._get_remaining_nodes, node_ids)
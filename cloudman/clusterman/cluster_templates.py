@@ -1,11 +1,19 @@
 import abc
+import copy
+import logging
 import os
 import yaml
 from rest_framework.exceptions import ValidationError
+from .clients import helpers
+from .clients.kube_client import KubeClient
 from .clients.rancher import RancherClient
+from .exceptions import CMBatchCommandException
+from .reconciliation import kube_node_ips
 from cloudlaunch import models as cl_models
 import subprocess
 
+log = logging.getLogger(__name__)
+
 
 class CMClusterTemplate(object):
 
@@ -18,13 +26,29 @@ class CMClusterTemplate(object):
         return self.cluster.connection_settings
 
     @abc.abstractmethod
-    def add_node(self, name, size):
+    def add_node(self, name, size, standby=False):
+        pass
+
+    @abc.abstractmethod
+    def add_nodes(self, names, size, standby=False):
         pass
 
     @abc.abstractmethod
     def remove_node(self):
         pass
 
+    @abc.abstractmethod
+    def remove_nodes(self, nodes):
+        pass
+
+    @abc.abstractmethod
+    def activate_node(self, node):
+        pass
+
+    @abc.abstractmethod
+    def get_node_inventories(self):
+        pass
+
     @abc.abstractmethod
     def activate_autoscaling(self, min_nodes=0, max_nodes=None, size=None):
         pass
@@ -44,6 +68,11 @@ class CMClusterTemplate(object):
 
 class CMRancherTemplate(CMClusterTemplate):
 
+    # Standby nodes register with this taint, which keeps pods off them,
+    # and a label to find them by once they are needed
+    STANDBY_TAINT_KEY = 'cloudman.org/standby'
+    NODE_NAME_LABEL = 'cloudman.org/node-name'
+
     def __init__(self, context, cluster):
         super(CMRancherTemplate, self).__init__(context, cluster)
         settings = cluster.connection_settings.get('rancher_config')
@@ -51,6 +80,11 @@ class CMRancherTemplate(CMClusterTemplate):
         self._rancher_api_key = settings.get('rancher_api_key')
         self._rancher_cluster_id = settings.get('rancher_cluster_id')
         self._rancher_project_id = settings.get('rancher_project_id')
+        self._rancher_pool_size = settings.get('rancher_pool_size')
+        self._rancher_timeout = settings.get('rancher_timeout')
+        self._rancher_registration_ttl = settings.get(
+            'rancher_registration_ttl')
+        self._rancher_client = None
 
     @property
     def rancher_url(self):
@@ -70,12 +104,24 @@ class CMRancherTemplate(CMClusterTemplate):
 
     @property
     def rancher_client(self):
-        return RancherClient(self.rancher_url, self.rancher_api_key,
-                             self.rancher_cluster_id,
-                             self.rancher_project_id)
+        if not self._rancher_client:
+            self._rancher_client = RancherClient(
+                self.rancher_url, self.rancher_api_key,
+                self.rancher_cluster_id, self.rancher_project_id,
+                pool_size=self._rancher_pool_size,
+                timeout=self._rancher_timeout,
+                registration_ttl=self._rancher_registration_ttl)
+        return self._rancher_client
 
-    def add_node(self, name, vm_type=None, zone=None):
-        print("Adding node: {0} of type: {1}".format(name, vm_type))
+    def _get_node_command(self, name, standby=False):
+        command = (self.rancher_client.get_cluster_registration_command()
+                   + " --worker")
+        if standby:
+            command += " --label {0}={1} --taints {2}=true:NoSchedule".format(
+                self.NODE_NAME_LABEL, name, self.STANDBY_TAINT_KEY)
+        return command
+
+    def _get_node_params(self, name, vm_type=None, zone=None, standby=False):
         settings = self.cluster.connection_settings
         zone = zone or self.cluster.default_zone
         deployment_target = cl_models.CloudDeploymentTarget.objects.get(
@@ -92,9 +138,8 @@ class CMRancherTemplate(CMClusterTemplate):
                     'rancher_api_key': self.rancher_api_key,
                     'rancher_cluster_id': self.rancher_cluster_id,
                     'rancher_project_id': self.rancher_project_id,
-                    'rancher_node_command': (
-                        self.rancher_client.get_cluster_registration_command()
-                        + " --worker")
+                    'rancher_node_command': self._get_node_command(
+                        name, standby=standby)
                 },
                 "config_appliance": {
                     "sshUser": "ubuntu",
@@ -107,8 +152,10 @@ class CMRancherTemplate(CMClusterTemplate):
                                          "ansible_ssh_private_key_file=pk\n"
                                          "ansible_ssh_extra_args='-o StrictHostKeyChecking=no'\n"
                 },
-                'config_cloudlaunch': (settings.get('app_config', {})
-                                       .get('config_cloudlaunch', {})),
+                # copied, since the cluster's parsed settings are shared
+                'config_cloudlaunch': copy.deepcopy(
+                    settings.get('app_config', {}).get(
+                        'config_cloudlaunch', {})),
                 'config_cloudman': {
                     'cluster_name': self.cluster.name
                 }
@@ -118,13 +165,143 @@ class CMRancherTemplate(CMClusterTemplate):
             vm_type or self.cluster.default_vm_type
         # Don't use hostname config
         params['config_app']['config_cloudlaunch'].pop('hostnameConfig', None)
+        return params
+
+    def add_node(self, name, vm_type=None, zone=None, standby=False):
+        print("Adding node: {0} of type: {1}".format(name, vm_type))
+        params = self._get_node_params(name, vm_type=vm_type, zone=zone,
+                                       standby=standby)
         try:
             print("Launching node with settings: {0}".format(params))
             return self.context.cloudlaunch_client.deployments.create(**params)
         except Exception as e:
+            # The cached registration token may be stale, so make sure the
+            # next launch fetches a fresh one
+            self.rancher_client.invalidate_registration_command()
             raise ValidationError(str(e))
 
+    def add_nodes(self, names, vm_type=None, zone=None, standby=False):
+        """
+        Launches a node for each of the given names, with the deployments
+        created concurrently. Returns the created deployments in the same
+        order as names. If any launch fails, a CMBatchCommandException is
+        raised, whose results hold the deployments that were created.
+        Standby nodes register with a NoSchedule taint, which keeps pods
+        off them until activate_node removes it.
+        """
+        print("Adding nodes: {0} of type: {1}".format(names, vm_type))
+        if not names:
+            return []
+        # Anything that touches the database is done up front, in this
+        # thread, so that the workers only make cloudlaunch api calls. Each
+        # worker gets its own client, as they are not shared across threads.
+        params = self._get_node_params(names[0], vm_type=vm_type, zone=zone,
+                                       standby=standby)
+        launches = []
+        for name in names:
+            node_params = copy.deepcopy(params)
+            node_params['name'] = name
+            if standby:
+                # standby nodes are labelled with their own name
+                node_params['config_app']['config_rancher_kube'][
+                    'rancher_node_command'] = self._get_node_command(
+                        name, standby=True)
+            launches.append((self.context.cloudlaunch_client, node_params))
+
+        def launch(client_and_params):
+            client, node_params = client_and_params
+            return client.deployments.create(**node_params)
+
+        try:
+            return helpers.run_batch(launch, launches)
+        except CMBatchCommandException:
+            self.rancher_client.invalidate_registration_command()
+            raise
+
     def remove_node(self, node):
         return self.context.cloudlaunch_client.deployments.tasks.create(
             action='DELETE', deployment_pk=node.deployment.pk)
 
+    @staticmethod
+    def _get_node_ips(node):
+        ips = set()
+        for task in node.deployment.tasks.filter(
+                action=cl_models.ApplicationDeploymentTask.LAUNCH):
+            result = (task.result or {}).get('cloudLaunch') or {}
+            ips.update(result.get(field) for field in
+                       ('publicIP', 'privateIP') if result.get(field))
+        return ips
+
+    @staticmethod
+    def _drain_k8s_node(kube_client, k8s_node):
+        # stop new jobs being scheduled on this node
+        kube_client.nodes.cordon(k8s_node)
+        # let existing jobs finish
+        kube_client.nodes.wait_till_jobs_complete(k8s_node)
+        # drain remaining pods
+        kube_client.nodes.drain(k8s_node, timeout=120)
+
+    def remove_nodes(self, nodes):
+        """
+        Removes many nodes at once. The nodes are drained concurrently, then
+        deleted from rancher together, waiting once for all of them to
+        disappear, so that the removal takes about as long as the slowest
+        node instead of the sum of all of them. Their deployments are then
+        deleted as in remove_node, which finds nothing left to drain.
+
+        Drain and rancher failures are only logged, as the deployments are
+        deleted regardless, and reconciliation reports any nodes left in
+        rancher. If deleting any of the deployments fails, a
+        CMBatchCommandException is raised, whose results hold the tasks
+        that were created.
+        """
+        nodes = list(nodes)
+        if not nodes:
+            return []
+        ips = set()
+        for node in nodes:
+            ips |= self._get_node_ips(node)
+        kube_client = KubeClient()
+        k8s_nodes = [k8s_node for k8s_node in kube_client.nodes.list()
+                     if kube_node_ips(k8s_node) & ips]
+        try:
+            helpers.run_batch(
+                lambda k8s_node: self._drain_k8s_node(kube_client, k8s_node),
+                k8s_nodes)
+        except CMBatchCommandException:
+            log.exception("Could not drain all nodes of cluster %s",
+                          self.cluster.id)
+        try:
+            rancher_node_ids = self.rancher_client.find_nodes(sorted(ips))
+            self.rancher_client.delete_nodes(
+                sorted({node_id for node_id in rancher_node_ids.values()
+                        if node_id}))
+        except Exception:
+            log.exception("Could not remove nodes of cluster %s from rancher",
+                          self.cluster.id)
+        return helpers.run_batch(self.remove_node, nodes)
+
+    def activate_node(self, node):
+        """
+        Brings a standby node into service, by removing its standby taint
+        and uncordoning it. Returns False if the node has not registered
+        with kubernetes yet.
+        """
+        kube_client = KubeClient()
+        k8s_nodes = kube_client.nodes.find_by_label(
+            self.NODE_NAME_LABEL, node.name)
+        if not k8s_nodes:
+            return False
+        for k8s_node in k8s_nodes:
+            kube_client.nodes.remove_taint(k8s_node, self.STANDBY_TAINT_KEY)
+            kube_client.nodes.uncordon(k8s_node)
+        return True
+
+    def get_node_inventories(self):
+        """
+        Returns the nodes rancher lists for the cluster, following its
+        pagination, and the nodes kubectl lists, with one listing each.
+        """
+        rancher_nodes = list(self.rancher_client.get_nodes())
+        kube_nodes = KubeClient().nodes.list()
+        return rancher_nodes, kube_nodes
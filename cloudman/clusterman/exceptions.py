@@ -7,3 +7,43 @@ class CMDuplicateNameException(Exception):
 
 class CMRunCommandException(Exception):
     pass
+
+
+class CMScaleRejectedException(Exception):
+    """
+    A scaling signal was rejected by an autoscaler's cooldown or rate limit.
+    """
+    pass
+
+
+class CMBatchCommandException(CMRunCommandException):
+    """
+    Raised when one or more commands in a batch fail. ``failures`` is a list
+    of (index, command, exception) tuples, one per failed command, and
+    ``results`` holds the outputs in submission order, with None in place of
+    each failed command.
+    """
+
+    def __init__(self, failures, results):
+        self.failures = failures
+        self.results = results
+        details = "; ".join(f"[{index}] {command}: {e}"
+                            for index, command, e in failures)
+        super().__init__(f"{len(failures)} of {len(results)} commands "
+                         f"failed: {details}")
+
+
+class CMRancherUnavailableException(Exception):
+    """
+    Rancher could not be reached, timed out or returned a server error,
+    even after retrying where that was safe.
+    """
+    pass
+
+
+class CMRancherCircuitOpenException(CMRancherUnavailableException):
+    """
+    Rancher calls are failing fast, without being attempted, because recent
+    calls to the same endpoint kept failing.
+    """
+    pass
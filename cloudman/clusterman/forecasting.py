@@ -0,0 +1,95 @@
+"""
+Demand forecasts for predictive scaling.
+
+Periodic load, such as daily training workshops, shows up in an
+autoscaler's history as it reaching similar sizes at the same time of day,
+or of the week. The size of the autoscaler at past times is reconstructed
+from its successful scale events, working backwards from its current node
+count, and the forecast for an upcoming window is the median of its peak
+demand in the same window over the preceding days or weeks. Only scale
+events made in response to demand, rather than to a schedule or an earlier
+forecast, set the level of demand, so that scaling ahead of a forecast
+does not feed into the next one. Any scaling not recorded as a scale event,
+such as nodes added by hand, is not accounted for.
+"""
+import math
+import statistics
+from datetime import timedelta
+
+DAILY = 'daily'
+WEEKLY = 'weekly'
+PERIODS = {
+    DAILY: timedelta(days=1),
+    WEEKLY: timedelta(weeks=1),
+}
+# Number of past periods to look at, for each kind of period
+LOOKBACK = {
+    DAILY: 7,
+    WEEKLY: 4,
+}
+# How far ahead of the expected demand to scale, and the length of the
+# window whose demand is forecast
+DEFAULT_LEAD = timedelta(minutes=15)
+DEFAULT_HORIZON = timedelta(hours=1)
+
+
+def node_history(current, events):
+    """
+    Returns the node count before the first event, and the node count and
+    level of demand after each event, as a list of (time, count, demand)
+    in time order. events are (time, direction, nodes, is_demand) tuples of
+    successful scale events, and current is the node count after the last
+    of them. All events change the node count, but only those with
+    is_demand set change the level of demand, which is otherwise carried
+    over from the previous event, or is the initial count.
+    """
+    counts = []
+    count = current
+    events = sorted(events, key=lambda event: event[0])
+    for time, direction, nodes, _ in reversed(events):
+        counts.append(count)
+        count += -nodes if direction == 'up' else nodes
+    counts.reverse()
+    initial = demand = count
+    history = []
+    for (time, _, _, is_demand), count in zip(events, counts):
+        if is_demand:
+            demand = count
+        history.append((time, count, demand))
+    return initial, history
+
+
+def peak_demand(initial, history, start, end):
+    """
+    Returns the highest level of demand between start and end, given the
+    initial count and history from node_history.
+    """
+    peak = initial
+    for time, _, demand in history:
+        if time >= end:
+            break
+        if time <= start:
+            peak = demand
+        else:
+            peak = max(peak, demand)
+    return peak
+
+
+def forecast_nodes(current, events, now, period=DAILY, lead=DEFAULT_LEAD,
+                   horizon=DEFAULT_HORIZON):
+    """
+    Returns the number of nodes forecast to be needed between now + lead
+    and now + lead + horizon, as the median of the peak demand over the
+    same window in each of the preceding days or weeks, depending on
+    period. events are as for node_history, and should cover all of those
+    periods. Returns None if there are no demand events to go by.
+    """
+    if not any(is_demand for _, _, _, is_demand in events):
+        return None
+    initial, history = node_history(current, events)
+    step = PERIODS[period]
+    start = now + lead
+    peaks = [peak_demand(initial, history, start - ago * step,
+                         start - ago * step + horizon)
+             for ago in range(1, LOOKBACK[period] + 1)]
+    return math.ceil(statistics.median(peaks))
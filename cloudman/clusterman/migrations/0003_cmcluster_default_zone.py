@@ -0,0 +1,38 @@
+# Generated by Django 2.2.10 on 2026-10-18 22:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import yaml
+
+
+def populate_default_zone(apps, schema_editor):
+    CMCluster = apps.get_model('clusterman', 'CMCluster')
+    Zone = apps.get_model('djcloudbridge', 'Zone')
+    for cluster in CMCluster.objects.all():
+        settings = yaml.safe_load(cluster._connection_settings or '') or {}
+        target_zone = settings.get(
+            'cloud_config', {}).get('target', {}).get('target_zone', {})
+        zone = Zone.objects.filter(
+            zone_id=target_zone.get('zone_id'),
+            region__region_id=target_zone.get('region', {}).get('region_id'),
+            region__cloud__id=target_zone.get('cloud', {}).get('id')).first()
+        if zone:
+            cluster._default_zone = zone
+            cluster.save(update_fields=['_default_zone'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djcloudbridge', '0001_initial'),
+        ('clusterman', '0002_create_rancher_app'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cmcluster',
+            name='_default_zone',
+            field=models.ForeignKey(blank=True, db_column='default_zone_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='djcloudbridge.Zone'),
+        ),
+        migrations.RunPython(populate_default_zone, migrations.RunPython.noop),
+    ]
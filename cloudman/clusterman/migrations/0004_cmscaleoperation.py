@@ -0,0 +1,37 @@
+# Generated by Django 2.2.10 on 2026-10-18 22:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('clusterman', '0003_cmcluster_default_zone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CMScaleOperation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('direction', models.CharField(choices=[('up', 'Scale up'), ('down', 'Scale down')], max_length=10)),
+                ('zone_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('count', models.IntegerField(default=1)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('message', models.TextField(blank=True, null=True)),
+                ('added', models.DateTimeField(auto_now_add=True)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scale_operations', to='clusterman.CMCluster')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Scale Operation',
+                'verbose_name_plural': 'Scale Operations',
+                'ordering': ['-added', '-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.10 on 2026-10-18 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clusterman', '0004_cmscaleoperation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cmscaleoperation',
+            name='group_key',
+            field=models.CharField(blank=True, max_length=1024, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.10 on 2026-10-18 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clusterman', '0005_cmscaleoperation_group_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='policy',
+            field=models.CharField(default='step', help_text='Name of the scaling policy used to compute the desired number of nodes. See clusterman.scaling_policies.', max_length=60),
+        ),
+        migrations.AddField(
+            model_name='cmscaleoperation',
+            name='_signal',
+            field=models.TextField(blank=True, db_column='signal', null=True),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 2.2.10 on 2026-10-19 00:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clusterman', '0006_scaling_policy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='scale_up_cooldown',
+            field=models.IntegerField(default=0, help_text='Seconds to wait after scaling up before scaling up again'),
+        ),
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='scale_down_cooldown',
+            field=models.IntegerField(default=0, help_text='Seconds to wait after scaling down before scaling down again'),
+        ),
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='max_nodes_per_minute',
+            field=models.IntegerField(blank=True, default=None, help_text='Maximum number of nodes added or removed per minute', null=True),
+        ),
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='last_scale_up',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='last_scale_down',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='rate_window_start',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='rate_window_nodes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='rejected_signals',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='last_rejection',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='last_rejection_reason',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='cmscaleoperation',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed'), ('rejected', 'Rejected')], default='queued', max_length=10),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.10 on 2026-10-19 01:10
+
+from django.db import migrations, models
+
+
+def populate_node_count(apps, schema_editor):
+    CMAutoScaler = apps.get_model('clusterman', 'CMAutoScaler')
+    for scaler in CMAutoScaler.objects.annotate(
+            nodes=models.Count('nodegroup')):
+        scaler.node_count = scaler.nodes
+        scaler.save(update_fields=['node_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clusterman', '0007_autoscaler_rate_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='node_count',
+            field=models.IntegerField(default=0, help_text='Number of nodes in the group, including nodes which are still being launched'),
+        ),
+        migrations.RunPython(populate_node_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.10 on 2026-10-19 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clusterman', '0008_cmautoscaler_node_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='standby_nodes',
+            field=models.IntegerField(default=0, help_text='Number of cordoned nodes to keep launched ahead of demand, which scale up signals bring into service first'),
+        ),
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='standby_count',
+            field=models.IntegerField(default=0, help_text='Number of standby nodes, including nodes which are still being launched'),
+        ),
+        migrations.AddField(
+            model_name='cmclusternode',
+            name='standby',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.10 on 2026-10-19 03:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clusterman', '0009_standby_nodes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CMScaleEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('direction', models.CharField(choices=[('up', 'Scale up'), ('down', 'Scale down')], max_length=10)),
+                ('signal_digest', models.CharField(blank=True, max_length=64, null=True)),
+                ('requested', models.DateTimeField()),
+                ('started', models.DateTimeField()),
+                ('completed', models.DateTimeField(blank=True, null=True)),
+                ('outcome', models.CharField(blank=True, choices=[('succeeded', 'Succeeded'), ('failed', 'Failed'), ('rejected', 'Rejected'), ('unchanged', 'Unchanged')], max_length=10, null=True)),
+                ('nodes', models.IntegerField(default=0)),
+                ('message', models.TextField(blank=True, null=True)),
+                ('autoscaler', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='scale_events', to='clusterman.CMAutoScaler')),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scale_events', to='clusterman.CMCluster')),
+                ('operation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='scale_events', to='clusterman.CMScaleOperation')),
+            ],
+            options={
+                'verbose_name': 'Scale Event',
+                'verbose_name_plural': 'Scale Events',
+                'ordering': ['-requested', '-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cmscaleevent',
+            index=models.Index(fields=['cluster', 'requested'], name='clusterman__cluster_c6a252_idx'),
+        ),
+    ]
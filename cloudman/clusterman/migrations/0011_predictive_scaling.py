@@ -0,0 +1,28 @@
+# Generated by Django 2.2.10 on 2026-10-19 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clusterman', '0010_cmscaleevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='forecast_period',
+            field=models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly')], default='daily', help_text='Whether demand repeats daily or weekly, for forecasts by the predictive policy', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='cmautoscaler',
+            name='predictive_dry_run',
+            field=models.BooleanField(default=False, help_text='Only record the scaling the predictive policy would do ahead of forecast demand, without scaling'),
+        ),
+        migrations.AlterField(
+            model_name='cmscaleevent',
+            name='outcome',
+            field=models.CharField(blank=True, choices=[('succeeded', 'Succeeded'), ('failed', 'Failed'), ('rejected', 'Rejected'), ('unchanged', 'Unchanged'), ('dry_run', 'Dry run')], max_length=10, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.10 on 2026-10-19 05:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clusterman', '0011_predictive_scaling'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CMAutoScalerSchedule',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=60)),
+                ('days', models.CharField(default='*', help_text="Days of the week on which the window starts, in cron's day of week syntax, e.g. 1-5 or mon-fri", max_length=60)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField(help_text='End of the window, which runs past midnight if it is at or before the start')),
+                ('timezone', models.CharField(default='UTC', max_length=60)),
+                ('min_nodes', models.IntegerField(blank=True, default=None, help_text='Minimum number of nodes during the window, if overridden', null=True)),
+                ('max_nodes', models.IntegerField(blank=True, default=None, help_text='Maximum number of nodes during the window, if overridden', null=True)),
+                ('enabled', models.BooleanField(default=True)),
+                ('autoscaler', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='clusterman.CMAutoScaler')),
+            ],
+            options={
+                'verbose_name': 'Autoscaler Schedule',
+                'verbose_name_plural': 'Autoscaler Schedules',
+                'unique_together': {('autoscaler', 'name')},
+            },
+        ),
+    ]
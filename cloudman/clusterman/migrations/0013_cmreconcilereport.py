@@ -0,0 +1,43 @@
+# Generated by Django 2.2.10 on 2026-10-19 06:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clusterman', '0012_cmautoscalerschedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CMReconcileReport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started', models.DateTimeField()),
+                ('finished', models.DateTimeField()),
+                ('db_nodes', models.IntegerField(default=0)),
+                ('rancher_nodes', models.IntegerField(default=0)),
+                ('kubernetes_nodes', models.IntegerField(default=0)),
+                ('missing', models.IntegerField(default=0)),
+                ('not_in_rancher', models.IntegerField(default=0)),
+                ('not_in_kubernetes', models.IntegerField(default=0)),
+                ('rancher_orphans', models.IntegerField(default=0)),
+                ('kubernetes_orphans', models.IntegerField(default=0)),
+                ('unmanaged', models.IntegerField(default=0)),
+                ('repaired', models.IntegerField(default=0)),
+                ('_details', models.TextField(blank=True, db_column='details', null=True)),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reconcile_reports', to='clusterman.CMCluster')),
+            ],
+            options={
+                'verbose_name': 'Reconcile Report',
+                'verbose_name_plural': 'Reconcile Reports',
+                'ordering': ['-finished', '-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cmreconcilereport',
+            index=models.Index(fields=['cluster', 'finished'], name='clusterman__cluster_d505b6_idx'),
+        ),
+    ]
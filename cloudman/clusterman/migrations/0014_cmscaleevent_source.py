@@ -0,0 +1,18 @@
+# Generated by Django 2.2.10 on 2026-10-19 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clusterman', '0013_cmreconcilereport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cmscaleevent',
+            name='source',
+            field=models.CharField(choices=[('signal', 'Scaling signal'), ('schedule', 'Autoscaler schedule'), ('predictive', 'Predictive scaling')], default='signal', max_length=10),
+        ),
+    ]
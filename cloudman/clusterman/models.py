@@ -1,10 +1,19 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 
 from hierarkey.models import GlobalSettingsBase, Hierarkey
 
 from cloudlaunch import models as cl_models
 from djcloudbridge import models as cb_models
-import yaml
+
+from . import yaml_codec
 
 
 hierarkey = Hierarkey(attribute_name='settings')
@@ -29,10 +38,29 @@ class CMCluster(models.Model):
         max_length=1024 * 16, help_text="External provider specific settings "
         "for this cluster.", blank=True, null=True,
         db_column='connection_settings')
+    # The zone named in connection_settings, resolved when the settings are
+    # saved, so that it can be loaded with select_related
+    _default_zone = models.ForeignKey(
+        cb_models.Zone, on_delete=models.SET_NULL, blank=True, null=True,
+        related_name='+', db_column='default_zone_id')
 
     @property
     def connection_settings(self):
-        return yaml.safe_load(self._connection_settings)
+        """
+        Returns the parsed connection settings.
+
+        The parsed value is cached on the instance, and reparsed only when
+        the underlying text changes, e.g. through the setter or
+        refresh_from_db. It is shared between callers, so it must not be
+        modified in place. Assign a new value instead.
+        """
+        raw = self._connection_settings
+        cached = getattr(self, '_parsed_connection_settings', None)
+        # Compare by identity, since any new value is a new string object
+        if cached is None or cached[0] is not raw:
+            cached = (raw, yaml_codec.safe_load(raw))
+            self._parsed_connection_settings = cached
+        return cached[1]
 
     @connection_settings.setter
     def connection_settings(self, value):
@@ -41,15 +69,43 @@ class CMCluster(models.Model):
 
         .. seealso:: connection_settings property getter
         """
-        self._connection_settings = yaml.dump(value, default_flow_style=False)
+        self._connection_settings = yaml_codec.safe_dump(value)
+        self._parsed_connection_settings = None
+        # Resolved again on save or first access
+        self._default_zone = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The zone was resolved when these settings were saved
+        instance._zone_settings = instance.__dict__.get('_connection_settings')
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._parsed_connection_settings = None
+        self._zone_settings = self.__dict__.get('_connection_settings')
+
+    def save(self, *args, **kwargs):
+        # Only look the zone up again when the settings have changed. A
+        # deferred field is not in __dict__, and so counts as unchanged.
+        raw = self.__dict__.get('_connection_settings')
+        if raw and raw != getattr(self, '_zone_settings', None):
+            try:
+                self._default_zone = self._resolve_default_zone()
+            except (cb_models.Zone.DoesNotExist, AttributeError, KeyError,
+                    TypeError):
+                # Settings without a usable target zone
+                self._default_zone = None
+            self._zone_settings = raw
+        super().save(*args, **kwargs)
 
     @property
     def default_vm_type(self):
         return self.connection_settings.get('app_config', {}).get(
             'config_cloudlaunch', {}).get('vmType')
 
-    @property
-    def default_zone(self):
+    def _resolve_default_zone(self):
         target_zone = self.connection_settings.get(
             'cloud_config', {}).get('target', {}).get('target_zone', {})
         cloud_id = target_zone.get('cloud', {}).get('id')
@@ -59,6 +115,12 @@ class CMCluster(models.Model):
                                           region__cloud__id=cloud_id)
         return zone
 
+    @property
+    def default_zone(self):
+        if self._default_zone_id is None:
+            self._default_zone = self._resolve_default_zone()
+        return self._default_zone
+
     class Meta:
         verbose_name = "Cluster"
         verbose_name_plural = "Clusters"
@@ -73,6 +135,46 @@ class CMAutoScaler(models.Model):
                              null=False, related_name="autoscaler_list")
     min_nodes = models.IntegerField(default=0)
     max_nodes = models.IntegerField(default=None, null=True)
+    policy = models.CharField(
+        max_length=60, default='step',
+        help_text="Name of the scaling policy used to compute the desired "
+        "number of nodes. See clusterman.scaling_policies.")
+    # Settings of the predictive policy
+    forecast_period = models.CharField(
+        max_length=10, default='daily',
+        choices=(('daily', 'Daily'), ('weekly', 'Weekly')),
+        help_text="Whether demand repeats daily or weekly, for forecasts "
+        "by the predictive policy")
+    predictive_dry_run = models.BooleanField(
+        default=False, help_text="Only record the scaling the predictive "
+        "policy would do ahead of forecast demand, without scaling")
+    # Scaling limits, which signals are rejected for exceeding
+    scale_up_cooldown = models.IntegerField(
+        default=0, help_text="Seconds to wait after scaling up before "
+        "scaling up again")
+    scale_down_cooldown = models.IntegerField(
+        default=0, help_text="Seconds to wait after scaling down before "
+        "scaling down again")
+    max_nodes_per_minute = models.IntegerField(
+        default=None, null=True, blank=True,
+        help_text="Maximum number of nodes added or removed per minute")
+    # Scaling state, shared by all workers
+    last_scale_up = models.DateTimeField(blank=True, null=True)
+    last_scale_down = models.DateTimeField(blank=True, null=True)
+    rate_window_start = models.DateTimeField(blank=True, null=True)
+    rate_window_nodes = models.IntegerField(default=0)
+    rejected_signals = models.IntegerField(default=0)
+    last_rejection = models.DateTimeField(blank=True, null=True)
+    last_rejection_reason = models.TextField(blank=True, null=True)
+    standby_nodes = models.IntegerField(
+        default=0, help_text="Number of cordoned nodes to keep launched "
+        "ahead of demand, which scale up signals bring into service first")
+    node_count = models.IntegerField(
+        default=0, help_text="Number of nodes in the group, including nodes "
+        "which are still being launched")
+    standby_count = models.IntegerField(
+        default=0, help_text="Number of standby nodes, including nodes "
+        "which are still being launched")
 
     class Meta:
         verbose_name = "Cluster Autoscaler"
@@ -80,6 +182,60 @@ class CMAutoScaler(models.Model):
         unique_together = (("cluster", "name"),)
 
 
+def autoscaler_routes_cache_key(cluster_id):
+    return "clusterman:autoscaler-routes:{0}".format(cluster_id)
+
+
+# Fields which decide the scaling signals an autoscaler receives
+AUTOSCALER_ROUTING_FIELDS = {'cluster', 'zone'}
+
+
+@receiver(post_save, sender=CMAutoScaler)
+@receiver(post_delete, sender=CMAutoScaler)
+def invalidate_autoscaler_routes(sender, instance, update_fields=None,
+                                 **kwargs):
+    """
+    Drops the cached signal zone table of an autoscaler's cluster when
+    the autoscaler is created, deleted or moved. Saves of the scaling state
+    alone, which happen on every signal, keep the table.
+    """
+    if update_fields and not AUTOSCALER_ROUTING_FIELDS & set(update_fields):
+        return
+    cache.delete(autoscaler_routes_cache_key(instance.cluster_id))
+
+
+class CMAutoScalerSchedule(models.Model):
+    """
+    A weekly time window in which an autoscaler's min_nodes and max_nodes
+    are overridden, so that capacity is ready ahead of expected demand and
+    released when it is over. See clusterman.schedules.
+    """
+    autoscaler = models.ForeignKey(CMAutoScaler, on_delete=models.CASCADE,
+                                   null=False, related_name="schedules")
+    name = models.CharField(max_length=60)
+    days = models.CharField(
+        max_length=60, default='*',
+        help_text="Days of the week on which the window starts, in cron's "
+        "day of week syntax, e.g. 1-5 or mon-fri")
+    start_time = models.TimeField()
+    end_time = models.TimeField(
+        help_text="End of the window, which runs past midnight if it is at "
+        "or before the start")
+    timezone = models.CharField(max_length=60, default='UTC')
+    min_nodes = models.IntegerField(
+        default=None, null=True, blank=True,
+        help_text="Minimum number of nodes during the window, if overridden")
+    max_nodes = models.IntegerField(
+        default=None, null=True, blank=True,
+        help_text="Maximum number of nodes during the window, if overridden")
+    enabled = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = "Autoscaler Schedule"
+        verbose_name_plural = "Autoscaler Schedules"
+        unique_together = (("autoscaler", "name"),)
+
+
 class CMClusterNode(models.Model):
     name = models.CharField(max_length=60)
     cluster = models.ForeignKey(CMCluster, on_delete=models.CASCADE,
@@ -94,7 +250,200 @@ class CMClusterNode(models.Model):
     autoscaler = models.ForeignKey(
         CMAutoScaler, on_delete=models.CASCADE, null=True,
         related_name="nodegroup")
+    # Standby nodes are cordoned, and not counted in the autoscaler's
+    # node_count, until a scale up signal brings them into service
+    standby = models.BooleanField(default=False)
 
     class Meta:
         verbose_name = "Cluster Node"
         verbose_name_plural = "Cluster Nodes"
+
+
+class CMScaleOperation(models.Model):
+    """
+    A scale up or down action requested by a scaling signal, which is
+    carried out in the background and tracked here.
+    """
+    DIRECTION_UP = 'up'
+    DIRECTION_DOWN = 'down'
+    DIRECTION_CHOICES = (
+        (DIRECTION_UP, 'Scale up'),
+        (DIRECTION_DOWN, 'Scale down'),
+    )
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_REJECTED = 'rejected'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_REJECTED, 'Rejected'),
+    )
+
+    cluster = models.ForeignKey(CMCluster, on_delete=models.CASCADE,
+                                null=False, related_name="scale_operations")
+    direction = models.CharField(max_length=10, choices=DIRECTION_CHOICES)
+    zone_name = models.CharField(max_length=255, blank=True, null=True)
+    count = models.IntegerField(default=1)
+    # The alertmanager groupKey of the signal, used to coalesce repeats
+    group_key = models.CharField(max_length=1024, blank=True, null=True)
+    # The alertmanager webhook payload, passed on to the scaling policy
+    _signal = models.TextField(blank=True, null=True, db_column='signal')
+    # The user the operation is carried out as
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.SET_NULL, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES,
+                              default=STATUS_QUEUED)
+    message = models.TextField(blank=True, null=True)
+    added = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(blank=True, null=True)
+    finished = models.DateTimeField(blank=True, null=True)
+
+    @property
+    def signal(self):
+        return json.loads(self._signal) if self._signal else None
+
+    @signal.setter
+    def signal(self, value):
+        self._signal = json.dumps(value) if value is not None else None
+
+    @property
+    def duration(self):
+        """Seconds taken to carry out the operation, once finished."""
+        if self.started and self.finished:
+            return (self.finished - self.started).total_seconds()
+        return None
+
+    class Meta:
+        verbose_name = "Scale Operation"
+        verbose_name_plural = "Scale Operations"
+        ordering = ['-added', '-id']
+
+
+class CMScaleEvent(models.Model):
+    """
+    A scale action carried out by an autoscaler, recorded for analysis of
+    scaling latency and of how often signals flap. Every call to
+    ClusterAutoScaler.scale records one, whether the action succeeded,
+    failed, was rejected or left the node count unchanged. Predictive
+    autoscalers in dry run mode record the actions they would have taken.
+    """
+    # What asked for the action. Only actions taken on signals reflect
+    # demand, so only those are used for forecasts.
+    SOURCE_SIGNAL = 'signal'
+    SOURCE_SCHEDULE = 'schedule'
+    SOURCE_PREDICTIVE = 'predictive'
+    SOURCE_CHOICES = (
+        (SOURCE_SIGNAL, 'Scaling signal'),
+        (SOURCE_SCHEDULE, 'Autoscaler schedule'),
+        (SOURCE_PREDICTIVE, 'Predictive scaling'),
+    )
+    OUTCOME_SUCCEEDED = 'succeeded'
+    OUTCOME_FAILED = 'failed'
+    OUTCOME_REJECTED = 'rejected'
+    OUTCOME_UNCHANGED = 'unchanged'
+    # Recorded instead of scaling by predictive autoscalers in dry run mode
+    OUTCOME_DRY_RUN = 'dry_run'
+    OUTCOME_CHOICES = (
+        (OUTCOME_SUCCEEDED, 'Succeeded'),
+        (OUTCOME_FAILED, 'Failed'),
+        (OUTCOME_REJECTED, 'Rejected'),
+        (OUTCOME_UNCHANGED, 'Unchanged'),
+        (OUTCOME_DRY_RUN, 'Dry run'),
+    )
+
+    cluster = models.ForeignKey(CMCluster, on_delete=models.CASCADE,
+                                null=False, related_name="scale_events")
+    autoscaler = models.ForeignKey(CMAutoScaler, on_delete=models.SET_NULL,
+                                   null=True, related_name="scale_events")
+    # The operation which requested the action, if any
+    operation = models.ForeignKey(CMScaleOperation, on_delete=models.SET_NULL,
+                                  null=True, blank=True,
+                                  related_name="scale_events")
+    direction = models.CharField(
+        max_length=10, choices=CMScaleOperation.DIRECTION_CHOICES)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES,
+                              default=SOURCE_SIGNAL)
+    # A digest of the signal, so that repeats can be told apart cheaply
+    signal_digest = models.CharField(max_length=64, blank=True, null=True)
+    requested = models.DateTimeField()
+    started = models.DateTimeField()
+    completed = models.DateTimeField(blank=True, null=True)
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES,
+                               blank=True, null=True)
+    # Number of nodes added or removed
+    nodes = models.IntegerField(default=0)
+    message = models.TextField(blank=True, null=True)
+
+    @staticmethod
+    def digest(signal):
+        if signal is None:
+            return None
+        return hashlib.sha256(json.dumps(
+            signal, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @property
+    def latency(self):
+        """Seconds from the request for the action to its completion."""
+        if self.completed:
+            return (self.completed - self.requested).total_seconds()
+        return None
+
+    class Meta:
+        verbose_name = "Scale Event"
+        verbose_name_plural = "Scale Events"
+        ordering = ['-requested', '-id']
+        indexes = [models.Index(fields=['cluster', 'requested'])]
+
+
+class CMReconcileReport(models.Model):
+    """
+    The outcome of comparing the nodes on record for a cluster with those
+    in rancher and kubernetes, with the number of nodes in each inventory
+    and of each kind of drift found. See clusterman.reconciliation.
+    """
+    cluster = models.ForeignKey(CMCluster, on_delete=models.CASCADE,
+                                null=False, related_name="reconcile_reports")
+    started = models.DateTimeField()
+    finished = models.DateTimeField()
+    # Number of nodes in each inventory
+    db_nodes = models.IntegerField(default=0)
+    rancher_nodes = models.IntegerField(default=0)
+    kubernetes_nodes = models.IntegerField(default=0)
+    # Number of nodes with each kind of drift
+    missing = models.IntegerField(default=0)
+    not_in_rancher = models.IntegerField(default=0)
+    not_in_kubernetes = models.IntegerField(default=0)
+    rancher_orphans = models.IntegerField(default=0)
+    kubernetes_orphans = models.IntegerField(default=0)
+    unmanaged = models.IntegerField(default=0)
+    # Number of missing nodes removed from the records
+    repaired = models.IntegerField(default=0)
+    # The ids or names of the nodes with each kind of drift, as json
+    _details = models.TextField(blank=True, null=True, db_column='details')
+
+    @property
+    def details(self):
+        return json.loads(self._details) if self._details else {}
+
+    @details.setter
+    def details(self, value):
+        self._details = json.dumps(value) if value is not None else None
+
+    @property
+    def drift(self):
+        """
+        Number of nodes out of sync between the inventories. Unmanaged
+        nodes, such as control plane nodes, are not counted.
+        """
+        return (self.missing + self.not_in_rancher + self.not_in_kubernetes
+                + self.rancher_orphans + self.kubernetes_orphans)
+
+    class Meta:
+        verbose_name = "Reconcile Report"
+        verbose_name_plural = "Reconcile Reports"
+        ordering = ['-finished', '-id']
+        indexes = [models.Index(fields=['cluster', 'finished'])]
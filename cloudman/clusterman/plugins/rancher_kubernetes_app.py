@@ -75,24 +75,57 @@ class RancherKubernetesApp(BaseVMAppPlugin):
         node_ip = deployment.get(
             'launch_result', {}).get('cloudLaunch', {}).get('publicIP')
         try:
-            rancher_node_id = rancher_client.find_node(ip=node_ip)
-            if rancher_node_id:
-                try:
-                    kube_client = KubeClient()
-                    k8s_node = kube_client.nodes.find(node_ip)[0]
-                    # stop new jobs being scheduled on this node
-                    kube_client.nodes.cordon(k8s_node)
-                    # let existing jobs finish
-                    kube_client.nodes.wait_till_jobs_complete(k8s_node)
-                    # drain remaining pods
-                    kube_client.nodes.drain(k8s_node, timeout=120)
-                finally:
+            lookup_failed = False
+            try:
+                rancher_node_id = self._find_node(rancher_client, node_ip)
+            except Exception:
+                # Still drain the node even if rancher is unavailable
+                log.exception("Could not find rancher node with ip: %s",
+                              node_ip)
+                rancher_node_id, lookup_failed = None, True
+            try:
+                self._drain_k8s_node(node_ip)
+            finally:
+                if lookup_failed:
+                    # rancher may have recovered while the node drained
+                    rancher_node_id = self._retry_find_node(
+                        rancher_client, node_ip)
+                if rancher_node_id:
                     # remove node from rancher
                     rancher_client.delete_node(rancher_node_id)
         finally:
             # delete the VM
             return super().delete(provider, deployment)
 
+    @staticmethod
+    def _find_node(rancher_client, node_ip):
+        # Several nodes are usually removed at once, so the lookups share
+        # the client's short lived index of the cluster's nodes
+        return rancher_client.find_nodes([node_ip]).get(node_ip)
+
+    def _retry_find_node(self, rancher_client, node_ip):
+        try:
+            return self._find_node(rancher_client, node_ip)
+        except Exception:
+            # The node is left in rancher, where reconciliation reports it
+            # as an orphan
+            log.exception("Could not remove node with ip: %s from rancher",
+                          node_ip)
+            return None
+
+    def _drain_k8s_node(self, node_ip):
+        kube_client = KubeClient()
+        k8s_nodes = kube_client.nodes.find(node_ip)
+        if not k8s_nodes:
+            return
+        k8s_node = k8s_nodes[0]
+        # stop new jobs being scheduled on this node
+        kube_client.nodes.cordon(k8s_node)
+        # let existing jobs finish
+        kube_client.nodes.wait_till_jobs_complete(k8s_node)
+        # drain remaining pods
+        kube_client.nodes.drain(k8s_node, timeout=120)
+
     def _get_configurer(self, app_config):
         # CloudMan2 can only be configured with ansible
         return RancherKubernetesAnsibleAppConfigurer()
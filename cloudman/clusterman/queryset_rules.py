@@ -0,0 +1,62 @@
+"""
+Queryset filters for django-rules permissions.
+
+Checking a permission on every row of a listing loads the whole table and
+evaluates the rule's predicates once per row. For the common rules (staff
+and autoscale user), the rows a user may see can instead be selected in
+SQL, by registering a filter for the permission alongside the rule with
+add_filter. Permissions without a registered filter fall back to checking
+each object.
+"""
+
+_filters = {}
+
+
+def add_filter(name, func):
+    """
+    Registers func(user, queryset) as the queryset filter for permission
+    name. It must return the subset of queryset for which the user has the
+    permission, or None to fall back to per object checks.
+    """
+    _filters[name] = func
+
+
+def remove_filter(name):
+    _filters.pop(name, None)
+
+
+def has_filter(name):
+    return name in _filters
+
+
+def filter_queryset(user, name, queryset):
+    """
+    Returns the subset of queryset for which user has permission name, as
+    a queryset, or None if there is no filter for the permission.
+    """
+    func = _filters.get(name)
+    if not func:
+        return None
+    return func(user, queryset)
+
+
+def filter_objects(user, name, queryset):
+    """
+    Returns the objects in queryset for which user has permission name,
+    filtering in the database when possible. Returns a queryset if a filter
+    is registered for the permission, and a list otherwise.
+    """
+    filtered = filter_queryset(user, name, queryset)
+    if filtered is not None:
+        return filtered
+    return [obj for obj in queryset if user.has_perm(name, obj)]
+
+
+def user_level(predicate):
+    """
+    Returns a filter for predicates which only depend on the user, such as
+    rules.is_staff, which allows either all or none of the queryset.
+    """
+    def filter_func(user, queryset):
+        return queryset if predicate.test(user, None) else queryset.none()
+    return filter_func
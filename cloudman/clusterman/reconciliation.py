@@ -0,0 +1,93 @@
+"""
+Comparison of the nodes CloudMan has on record for a cluster with the
+nodes rancher and kubernetes know about.
+
+The three inventories drift apart when launches fail half way, or nodes
+are removed by hand, and autoscalers then count nodes which no longer
+exist. Nodes are matched across inventories by IP address, and rancher
+nodes to kubernetes nodes by name as well. Each inventory is indexed once,
+so the comparison takes time linear in the number of nodes.
+"""
+
+# Kinds of drift, in the order they are reported
+MISSING = 'missing'
+NOT_IN_RANCHER = 'not_in_rancher'
+NOT_IN_KUBERNETES = 'not_in_kubernetes'
+RANCHER_ORPHANS = 'rancher_orphans'
+KUBERNETES_ORPHANS = 'kubernetes_orphans'
+UNMANAGED = 'unmanaged'
+DRIFT_KINDS = (MISSING, NOT_IN_RANCHER, NOT_IN_KUBERNETES, RANCHER_ORPHANS,
+               KUBERNETES_ORPHANS, UNMANAGED)
+
+
+def rancher_node_ips(node):
+    return {node.get(field) for field in ('ipAddress', 'externalIpAddress')
+            if node.get(field)}
+
+
+def kube_node_name(node):
+    return (node.get('metadata') or {}).get('name')
+
+
+def kube_node_ips(node):
+    return {address.get('address') for address in
+            (node.get('status') or {}).get('addresses') or []
+            if address.get('type') != 'Hostname' and address.get('address')}
+
+
+def _index(nodes, key, ips):
+    index = {}
+    for node in nodes:
+        for ip in ips(node):
+            index.setdefault(ip, key(node))
+    return index
+
+
+def diff(db_nodes, rancher_nodes, kube_nodes):
+    """
+    Compares the inventories of a cluster. db_nodes are dicts with the id,
+    ips and settled flag of each CMClusterNode, where nodes which are not
+    settled may still be launching, and are not reported as missing.
+    rancher_nodes are nodes as listed by the rancher api, and kube_nodes
+    as listed by kubectl.
+
+    Returns a dict with a list for each kind of drift:
+
+    - missing: ids of settled nodes known to neither rancher nor kubernetes
+    - not_in_rancher, not_in_kubernetes: ids of nodes known to only one
+    - rancher_orphans: ids of rancher nodes which are not on record, and
+      not in kubernetes
+    - kubernetes_orphans: names of kubernetes nodes which are not on
+      record, and not in rancher
+    - unmanaged: ids of rancher nodes, such as control plane nodes, which
+      are in kubernetes but not on record
+    """
+    rancher_by_ip = _index(rancher_nodes, lambda n: n['id'], rancher_node_ips)
+    kube_by_ip = _index(kube_nodes, kube_node_name, kube_node_ips)
+    kube_names = {kube_node_name(node) for node in kube_nodes}
+    report = {kind: [] for kind in DRIFT_KINDS}
+    seen_rancher = set()
+    seen_kube = set()
+    for node in db_nodes:
+        in_rancher = {rancher_by_ip[ip] for ip in node['ips']
+                      if ip in rancher_by_ip}
+        in_kube = {kube_by_ip[ip] for ip in node['ips'] if ip in kube_by_ip}
+        seen_rancher |= in_rancher
+        seen_kube |= in_kube
+        if in_rancher and not in_kube:
+            report[NOT_IN_KUBERNETES].append(node['id'])
+        elif in_kube and not in_rancher:
+            report[NOT_IN_RANCHER].append(node['id'])
+        elif not in_rancher and node['settled']:
+            report[MISSING].append(node['id'])
+    for node in rancher_nodes:
+        if node['id'] in seen_rancher:
+            continue
+        matches = {kube_by_ip[ip] for ip in rancher_node_ips(node)
+                   if ip in kube_by_ip}
+        if node.get('nodeName') in kube_names:
+            matches.add(node['nodeName'])
+        seen_kube |= matches
+        report[UNMANAGED if matches else RANCHER_ORPHANS].append(node['id'])
+    report[KUBERNETES_ORPHANS] = sorted(kube_names - seen_kube - {None})
+    return report
@@ -1,8 +1,15 @@
 import logging as log
+from datetime import timedelta
 
-from djcloudbridge import models as cb_models
+from django.db import transaction
+from django.utils import timezone
 
+from . import forecasting
+from . import models
+from . import scaling_policies
+from . import schedules
 from .cluster_templates import CMClusterTemplate
+from .exceptions import CMScaleRejectedException
 
 
 class Cluster(object):
@@ -64,39 +71,33 @@ class Cluster(object):
     def _get_default_scaler(self):
         return self.autoscalers.get_or_create_default()
 
-    def scaleup(self, zone_name=None):
-        if zone_name:
-            zone = cb_models.Zone.objects.get(name=zone_name)
-        else:
-            zone = None
-
+    def _scale(self, direction, zone_name=None, count=1, signal=None,
+               operation=None):
+        scalers = self.autoscalers.route(zone_name)
+        if not scalers:
+            scalers = [self._get_default_scaler()]
+        rejections = []
+        for scaler in scalers:
+            try:
+                scaler.scale(direction, count=count, signal=signal,
+                             operation=operation)
+            except CMScaleRejectedException as e:
+                rejections.append("{0}: {1}".format(scaler.name, e))
+        if rejections:
+            raise CMScaleRejectedException("; ".join(rejections))
+
+    def scaleup(self, zone_name=None, count=1, signal=None, operation=None):
         if self.autoscale:
-            matched = False
-            for scaler in self.autoscalers.list():
-                if scaler.match(zone=zone):
-                    matched = True
-                    scaler.scaleup()
-            if not matched:
-                scaler = self._get_default_scaler()
-                scaler.scaleup()
+            self._scale(scaling_policies.UP, zone_name=zone_name,
+                        count=count, signal=signal, operation=operation)
         else:
             log.debug("Autoscale up signal received but autoscaling is disabled.")
 
-    def scaledown(self, zone_name=None):
-        if zone_name:
-            zone = cb_models.Zone.objects.get(name=zone_name)
-        else:
-            zone = None
-
+    def scaledown(self, zone_name=None, count=1, signal=None,
+                  operation=None):
         if self.autoscale:
-            matched = False
-            for scaler in self.autoscalers.list():
-                if scaler.match(zone=zone):
-                    matched = True
-                    scaler.scaledown()
-            if not matched:
-                scaler = self._get_default_scaler()
-                scaler.scaledown()
+            self._scale(scaling_policies.DOWN, zone_name=zone_name,
+                        count=count, signal=signal, operation=operation)
         else:
             log.debug("Autoscale down signal received but autoscaling is disabled.")
 
@@ -106,6 +107,13 @@ class ClusterAutoScaler(object):
     This class represents an AutoScaler Group, and is
     analogous to a scaling group in AWS.
     """
+    # Fields updated, with the autoscaler's row locked, when scaling is
+    # allowed or rejected
+    SCALING_STATE_FIELDS = ['last_scale_up', 'last_scale_down',
+                            'rate_window_start', 'rate_window_nodes',
+                            'rejected_signals', 'last_rejection',
+                            'last_rejection_reason', 'node_count',
+                            'standby_count']
 
     def __init__(self, service, db_model):
         self.db_model = db_model
@@ -174,15 +182,464 @@ class ClusterAutoScaler(object):
         # matches a scaling signal.
         return zone == self.db_model.zone
 
-    def scaleup(self):
-        node_count = self.db_model.nodegroup.count()
-        if node_count < self.max_nodes:
+    @property
+    def scale_up_cooldown(self):
+        return self.db_model.scale_up_cooldown
+
+    @scale_up_cooldown.setter
+    def scale_up_cooldown(self, value):
+        self.db_model.scale_up_cooldown = max(int(value), 0)
+
+    @property
+    def scale_down_cooldown(self):
+        return self.db_model.scale_down_cooldown
+
+    @scale_down_cooldown.setter
+    def scale_down_cooldown(self, value):
+        self.db_model.scale_down_cooldown = max(int(value), 0)
+
+    @property
+    def max_nodes_per_minute(self):
+        return self.db_model.max_nodes_per_minute
+
+    @max_nodes_per_minute.setter
+    def max_nodes_per_minute(self, value):
+        self.db_model.max_nodes_per_minute = (
+            max(int(value), 1) if value is not None else None)
+
+    @property
+    def last_scale_up(self):
+        return self.db_model.last_scale_up
+
+    @property
+    def last_scale_down(self):
+        return self.db_model.last_scale_down
+
+    @property
+    def rejected_signals(self):
+        return self.db_model.rejected_signals
+
+    @property
+    def last_rejection(self):
+        return self.db_model.last_rejection
+
+    @property
+    def last_rejection_reason(self):
+        return self.db_model.last_rejection_reason
+
+    @property
+    def policy(self):
+        return self.db_model.policy
+
+    @policy.setter
+    def policy(self, value):
+        # raises a KeyError for unknown policies
+        scaling_policies.get_policy(value)
+        self.db_model.policy = value
+
+    @property
+    def forecast_period(self):
+        return self.db_model.forecast_period
+
+    @forecast_period.setter
+    def forecast_period(self, value):
+        if value not in forecasting.PERIODS:
+            raise KeyError(value)
+        self.db_model.forecast_period = value
+
+    @property
+    def predictive_dry_run(self):
+        return self.db_model.predictive_dry_run
+
+    @predictive_dry_run.setter
+    def predictive_dry_run(self, value):
+        self.db_model.predictive_dry_run = bool(value)
+
+    @property
+    def node_count(self):
+        return self.db_model.node_count
+
+    @property
+    def standby_nodes(self):
+        return self.db_model.standby_nodes
+
+    @standby_nodes.setter
+    def standby_nodes(self, value):
+        self.db_model.standby_nodes = max(int(value), 0)
+
+    @property
+    def standby_count(self):
+        return self.db_model.standby_count
+
+    def get_desired_nodes(self, direction, count=1, signal=None,
+                          current=None):
+        """
+        Returns the current and desired number of nodes in response to a
+        signal, as computed by this autoscaler's scaling policy. The
+        current count defaults to node_count, which includes nodes still
+        being launched. Policies which use forecasts are given this
+        autoscaler's forecast, unless the signal carries one already or
+        the autoscaler is in dry run mode. The desired count is kept within
+        the node limits in effect, see get_node_limits, and never moves
+        against the direction of the signal.
+        """
+        if current is None:
+            current = self.node_count
+        policy = scaling_policies.get_policy(self.policy)
+        if (policy.uses_forecast and not self.predictive_dry_run and
+                scaling_policies.get_signal_value(
+                    signal, 'forecast_nodes') is None):
+            forecast = self.forecast(current=current)
+            if forecast is not None:
+                signal = self._forecast_signal(forecast, signal)
+        desired = policy.desired_nodes(current, direction, signal,
+                                       count=count)
+        min_nodes, max_nodes = self.get_node_limits()
+        desired = min(max(desired, min_nodes), max_nodes)
+        if direction == scaling_policies.UP:
+            return current, max(desired, current)
+        else:
+            return current, min(desired, current)
+
+    def get_node_limits(self, now=None):
+        """
+        Returns the min and max nodes in effect at now, which are min_nodes
+        and max_nodes unless overridden by an enabled schedule whose window
+        includes now. See schedules.get_limits.
+        """
+        return schedules.get_limits(
+            self.db_model.schedules.filter(enabled=True), self.min_nodes,
+            self.max_nodes, now or timezone.now())
+
+    def converge(self, now=None):
+        """
+        Scales straight to the node limits in effect at now, if the node
+        count is outside them, such as when a scheduled window opens or
+        closes. Cooldowns and rate limits apply as they do to signals, so
+        it may take several calls to get there. Returns the limits.
+        """
+        min_nodes, max_nodes = self.get_node_limits(now)
+        source = models.CMScaleEvent.SOURCE_SCHEDULE
+        if self.node_count < min_nodes:
+            self.scale(scaling_policies.UP, count=0, target=min_nodes,
+                       source=source)
+        elif self.node_count > max_nodes:
+            self.scale(scaling_policies.DOWN, count=0, target=max_nodes,
+                       source=source)
+        return min_nodes, max_nodes
+
+    def forecast(self, now=None, current=None):
+        """
+        Returns the number of nodes forecast to be needed shortly after
+        now, from this autoscaler's history of scale events, or None if
+        there is not enough history. Every event counts towards the node
+        count, but only the events of scaling signals count as demand, so
+        that scaling ahead of a forecast does not feed into the next one.
+        See forecasting.forecast_nodes.
+        """
+        now = now or timezone.now()
+        period = self.forecast_period
+        events = models.CMScaleEvent.objects.filter(
+            autoscaler=self.db_model,
+            outcome=models.CMScaleEvent.OUTCOME_SUCCEEDED,
+            requested__gte=now - forecasting.LOOKBACK[period] *
+            forecasting.PERIODS[period]).values_list(
+                'requested', 'direction', 'nodes', 'source')
+        return forecasting.forecast_nodes(
+            self.node_count if current is None else current,
+            [(requested, direction, nodes,
+              source == models.CMScaleEvent.SOURCE_SIGNAL)
+             for requested, direction, nodes, source in events],
+            now, period=period)
+
+    @staticmethod
+    def _forecast_signal(forecast, signal=None):
+        signal = dict(signal or {})
+        signal['commonAnnotations'] = dict(
+            signal.get('commonAnnotations') or {}, forecast_nodes=forecast)
+        return signal
+
+    def prescale(self, now=None):
+        """
+        Scales up ahead of the demand forecast for shortly after now, if
+        that is more than the current number of nodes. In dry run mode, a
+        CMScaleEvent with the dry_run outcome records the scaling instead,
+        if there would be any. Returns the forecast, or None if there is
+        not enough history.
+        """
+        forecast = self.forecast(now=now)
+        if forecast is None or forecast <= self.node_count:
+            return forecast
+        signal = self._forecast_signal(forecast)
+        if not self.predictive_dry_run:
+            self.scale(scaling_policies.UP, count=0, signal=signal,
+                       source=models.CMScaleEvent.SOURCE_PREDICTIVE)
+            return forecast
+        current, desired = self.get_desired_nodes(
+            scaling_policies.UP, count=0, signal=signal)
+        if desired == current:
+            return forecast
+        now = timezone.now()
+        models.CMScaleEvent.objects.create(
+            cluster=self.cluster.db_model, autoscaler=self.db_model,
+            direction=scaling_policies.UP,
+            source=models.CMScaleEvent.SOURCE_PREDICTIVE,
+            signal_digest=models.CMScaleEvent.digest(signal),
+            requested=now, started=now, completed=now,
+            outcome=models.CMScaleEvent.OUTCOME_DRY_RUN,
+            nodes=desired - current,
+            message="Would scale up from {0} to {1} nodes, for a forecast "
+                    "of {2}".format(current, desired, forecast))
+        return forecast
+
+    def _reserve(self, scaler, direction, nodes):
+        """
+        Checks the cooldown and rate limit of the locked autoscaler row
+        for scaling by the given number of nodes, and records the scaling
+        if allowed. Returns the number of nodes that may be added or
+        removed, which the rate limit may reduce, and the reason for
+        rejecting the scaling, if any.
+        """
+        now = timezone.now()
+        up = direction == scaling_policies.UP
+        cooldown = (scaler.scale_up_cooldown if up
+                    else scaler.scale_down_cooldown)
+        last_scaled = scaler.last_scale_up if up else scaler.last_scale_down
+        if (scaler.rate_window_start is None or
+                now - scaler.rate_window_start >= timedelta(minutes=1)):
+            scaler.rate_window_start = now
+            scaler.rate_window_nodes = 0
+        reason = None
+        if (cooldown and last_scaled and
+                now < last_scaled + timedelta(seconds=cooldown)):
+            reason = "Scale {0} cooldown of {1}s has not expired".format(
+                direction, cooldown)
+        elif scaler.max_nodes_per_minute:
+            nodes = min(nodes, scaler.max_nodes_per_minute -
+                        scaler.rate_window_nodes)
+            if nodes <= 0:
+                reason = "Rate limit of {0} nodes per minute reached".format(
+                    scaler.max_nodes_per_minute)
+        if reason:
+            scaler.rejected_signals += 1
+            scaler.last_rejection = now
+            scaler.last_rejection_reason = reason
+        else:
+            if up:
+                scaler.last_scale_up = now
+            else:
+                scaler.last_scale_down = now
+            scaler.rate_window_nodes += nodes
+        return nodes, reason
+
+    def _claim(self, direction, count, signal, target=None):
+        """
+        Decides how many nodes to add or remove, with the autoscaler's row
+        locked, so that concurrent signals are sized against each other's
+        pending changes instead of overshooting max_nodes or min_nodes.
+        Nodes to add are counted in node_count straight away, before they
+        are launched, and are taken from the standby nodes first. Nodes to
+        remove are detached from the group, so that no other signal picks
+        them too. A target node count, if given, is used instead of the
+        one computed by the scaling policy. Returns the number of nodes to
+        launch, the ids of the nodes to remove and the standby nodes to
+        bring into service, or raises a CMScaleRejectedException.
+        """
+        victims = []
+        promoted = []
+        with transaction.atomic():
+            scaler = models.CMAutoScaler.objects.select_for_update().get(
+                id=self.db_model.id)
+            if target is None:
+                current, desired = self.get_desired_nodes(
+                    direction, count=count, signal=signal,
+                    current=scaler.node_count)
+            else:
+                current = scaler.node_count
+                desired = (max(target, current)
+                           if direction == scaling_policies.UP
+                           else min(target, current))
+            nodes, reason = 0, None
+            if desired != current:
+                nodes, reason = self._reserve(
+                    scaler, direction, abs(desired - current))
+            if reason or not nodes:
+                nodes = 0
+            elif desired > current:
+                scaler.node_count += nodes
+                promoted = list(scaler.nodegroup.filter(
+                    standby=True).order_by('id')[:nodes])
+                models.CMClusterNode.objects.filter(
+                    id__in=[node.id for node in promoted]).update(
+                        standby=False)
+                scaler.standby_count -= len(promoted)
+                nodes -= len(promoted)
+            else:
+                victims = list(scaler.nodegroup.filter(
+                    standby=False).order_by('-id').values_list(
+                        'id', flat=True)[:nodes])
+                models.CMClusterNode.objects.filter(
+                    id__in=victims).update(autoscaler=None)
+                scaler.node_count -= len(victims)
+                nodes = 0
+            scaler.save(update_fields=self.SCALING_STATE_FIELDS)
+        self._sync_state(scaler)
+        if reason:
+            raise CMScaleRejectedException(reason)
+        return nodes, victims, promoted
+
+    def restore_standby(self, node_id):
+        """
+        Undoes the promotion of a standby node which never came into
+        service, so that it is counted as a standby node again instead of
+        in node_count. Returns False if the node has been scaled down or
+        restored already.
+        """
+        with transaction.atomic():
+            scaler = models.CMAutoScaler.objects.select_for_update().get(
+                id=self.db_model.id)
+            restored = models.CMClusterNode.objects.filter(
+                id=node_id, autoscaler=scaler, standby=False).update(
+                    standby=True)
+            if restored:
+                scaler.node_count -= 1
+                scaler.standby_count += 1
+                scaler.save(update_fields=self.SCALING_STATE_FIELDS)
+        self._sync_state(scaler)
+        return bool(restored)
+
+    def _sync_state(self, scaler):
+        # keep this instance in sync, so that later saves don't revert it
+        for field in self.SCALING_STATE_FIELDS:
+            setattr(self.db_model, field, getattr(scaler, field))
+
+    def _launch(self, nodes, standby=False):
+        if nodes == 1:
             self.cluster.nodes.create(
-                vm_type=self.vm_type, zone=self.zone, autoscaler=self)
-
-    def scaledown(self):
-        node_count = self.db_model.nodegroup.count()
-        if node_count > self.min_nodes:
-            last_node = self.db_model.nodegroup.last()
-            node = self.cluster.nodes.get(last_node.id)
-            node.delete()
+                vm_type=self.vm_type, zone=self.zone, autoscaler=self,
+                standby=standby)
+        elif nodes:
+            self.cluster.nodes.create_many(
+                nodes, vm_type=self.vm_type, zone=self.zone, autoscaler=self,
+                standby=standby)
+
+    def scale(self, direction, count=1, signal=None, operation=None,
+              target=None, source=models.CMScaleEvent.SOURCE_SIGNAL):
+        """
+        Scales in response to a signal, and records the action, with its
+        outcome and timing, as a CMScaleEvent. operation is the scale
+        operation which requested the action, if any. target is a node
+        count to scale to, instead of the one the scaling policy asks for.
+        source is what asked for the action, one of the CMScaleEvent
+        SOURCE_ constants.
+        """
+        now = timezone.now()
+        event = models.CMScaleEvent(
+            cluster=self.cluster.db_model, autoscaler=self.db_model,
+            operation=operation, direction=direction, source=source,
+            signal_digest=models.CMScaleEvent.digest(signal),
+            requested=operation.added if operation else now, started=now)
+        try:
+            event.nodes = self._scale(direction, count, signal,
+                                      target=target)
+            event.outcome = (models.CMScaleEvent.OUTCOME_SUCCEEDED
+                             if event.nodes else
+                             models.CMScaleEvent.OUTCOME_UNCHANGED)
+        except CMScaleRejectedException as e:
+            event.outcome = models.CMScaleEvent.OUTCOME_REJECTED
+            event.message = str(e)
+            raise
+        except Exception as e:
+            event.outcome = models.CMScaleEvent.OUTCOME_FAILED
+            event.message = str(e)
+            raise
+        finally:
+            event.completed = timezone.now()
+            event.save()
+
+    def _scale(self, direction, count, signal, target=None):
+        nodes, victims, promoted = self._claim(direction, count, signal,
+                                               target=target)
+        # Imported here, as the tasks module depends on this one
+        from . import tasks
+        user = self.service.context.user
+        for node in promoted:
+            tasks.activate_standby_node.delay(
+                node.id, user.id if user else None)
+        if promoted:
+            self.schedule_replenish()
+        self._launch(nodes)
+        self._remove(victims)
+        return nodes + len(promoted) + len(victims)
+
+    def _remove(self, node_ids, standby=False):
+        """
+        Removes nodes detached from the group by _claim or
+        replenish_standby. Several nodes are drained and removed together,
+        see CMClusterNodeService.delete_many. If that fails, the nodes
+        which are still on record are attached to the group again, and
+        counted in node_count, or standby_count for standby nodes, so that
+        they are not orphaned.
+        """
+        try:
+            self.cluster.nodes.delete_many(
+                [self.cluster.nodes.get(node_id) for node_id in node_ids])
+        except Exception:
+            self._reattach(node_ids, standby=standby)
+            raise
+
+    def _reattach(self, node_ids, standby=False):
+        field = 'standby_count' if standby else 'node_count'
+        with transaction.atomic():
+            scaler = models.CMAutoScaler.objects.select_for_update().get(
+                id=self.db_model.id)
+            reattached = models.CMClusterNode.objects.filter(
+                id__in=node_ids, autoscaler=None).update(autoscaler=scaler)
+            setattr(scaler, field, getattr(scaler, field) + reattached)
+            scaler.save(update_fields=self.SCALING_STATE_FIELDS)
+        self._sync_state(scaler)
+        log.warning("Could not remove %s nodes of autoscaler %s, which were "
+                    "attached to it again", reattached, self.id)
+
+    def schedule_replenish(self):
+        """
+        Launches or removes standby nodes in the background, so that there
+        are standby_nodes of them. The task is only queued once the current
+        transaction commits, so that the worker sees the autoscaler's row.
+        """
+        from . import tasks
+        user = self.service.context.user
+        transaction.on_commit(lambda: tasks.replenish_standby_nodes.delay(
+            self.id, user.id if user else None))
+
+    def replenish_standby(self):
+        """
+        Launches or removes standby nodes until there are standby_nodes of
+        them, counting the ones still being launched. The standby_count is
+        updated with the row locked, as in _claim, so that concurrent
+        replenishments do not launch the same nodes twice.
+        """
+        excess = []
+        with transaction.atomic():
+            scaler = models.CMAutoScaler.objects.select_for_update().get(
+                id=self.db_model.id)
+            missing = scaler.standby_nodes - scaler.standby_count
+            if missing > 0:
+                scaler.standby_count += missing
+            elif missing < 0:
+                excess = list(scaler.nodegroup.filter(
+                    standby=True).order_by('-id').values_list(
+                        'id', flat=True)[:-missing])
+                models.CMClusterNode.objects.filter(
+                    id__in=excess).update(autoscaler=None)
+                scaler.standby_count -= len(excess)
+            scaler.save(update_fields=['standby_count'])
+        self._sync_state(scaler)
+        self._launch(max(missing, 0), standby=True)
+        self._remove(excess, standby=True)
+
+    def scaleup(self, count=1, signal=None):
+        self.scale(scaling_policies.UP, count=count, signal=signal)
+
+    def scaledown(self, count=1, signal=None):
+        self.scale(scaling_policies.DOWN, count=count, signal=signal)
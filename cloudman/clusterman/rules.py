@@ -1,5 +1,7 @@
 import rules
 
+from . import queryset_rules
+
 # Delegate to keycloak in future iteration
 
 @rules.predicate
@@ -25,8 +27,12 @@ def has_autoscale_permissions(user, obj):
             user.has_perm('clusterman.delete_cmclusternode'))
 
 
+# Also decides which clusters are listed, see filter_viewable_clusters
+is_cluster_viewer = rules.is_staff | has_autoscale_permissions
+
+
 # Permissions
-rules.add_perm('clusters.view_cluster', rules.is_staff | has_autoscale_permissions)
+rules.add_perm('clusters.view_cluster', is_cluster_viewer)
 rules.add_perm('clusters.add_cluster', rules.is_staff)
 rules.add_perm('clusters.change_cluster', rules.is_staff)
 rules.add_perm('clusters.delete_cluster', rules.is_staff)
@@ -37,3 +43,23 @@ rules.add_perm('clusternodes.change_clusternode', is_node_owner | has_autoscale_
 rules.add_perm('clusternodes.delete_clusternode', is_node_owner | has_autoscale_permissions | rules.is_staff)
 
 rules.add_perm('autoscalers.can_autoscale', has_autoscale_permissions | rules.is_staff)
+
+
+# Queryset filters, so that listings are filtered in the database. They
+# are derived from the same predicates as the permissions above.
+filter_viewable_clusters = queryset_rules.user_level(is_cluster_viewer)
+
+
+def filter_viewable_nodes(user, queryset):
+    if is_cluster_viewer.test(user, None):
+        return queryset
+    # can_view_node delegates to the parent cluster
+    clusters = queryset.model._meta.get_field(
+        'cluster').related_model.objects.all()
+    return queryset.filter(
+        cluster__in=filter_viewable_clusters(user, clusters))
+
+
+queryset_rules.add_filter('clusters.view_cluster', filter_viewable_clusters)
+queryset_rules.add_filter('clusternodes.view_clusternode',
+                          filter_viewable_nodes)
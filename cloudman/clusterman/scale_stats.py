@@ -0,0 +1,105 @@
+"""
+Aggregation of scale events into statistics per time window, such as the
+latency percentiles of scale actions and how often autoscalers flap
+between scaling up and down.
+"""
+from datetime import timedelta
+
+PERCENTILES = (50, 90, 99)
+# Upper bound on the number of windows returned for a single query, past
+# which further windows are left out
+MAX_WINDOWS = 1000
+
+DIRECTIONS = ('up', 'down')
+OUTCOMES = ('succeeded', 'failed', 'rejected', 'unchanged', 'dry_run')
+
+
+def percentile(values, pct):
+    """
+    Returns the pct percentile of values, interpolating between the closest
+    ranks, or None if there are no values.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+class _Window(object):
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.directions = dict.fromkeys(DIRECTIONS, 0)
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self.reversals = 0
+        self.nodes = 0
+        self.latencies = []
+
+    def add(self, event, reversal):
+        self.directions[event['direction']] = (
+            self.directions.get(event['direction'], 0) + 1)
+        if event['outcome']:
+            self.outcomes[event['outcome']] = (
+                self.outcomes.get(event['outcome'], 0) + 1)
+        if reversal:
+            self.reversals += 1
+        self.nodes += event.get('nodes') or 0
+        if event['outcome'] == 'succeeded' and event['completed']:
+            self.latencies.append(
+                (event['completed'] - event['requested']).total_seconds())
+
+    def to_dict(self):
+        latency = {f"p{pct}": percentile(self.latencies, pct)
+                   for pct in PERCENTILES}
+        latency['max'] = max(self.latencies) if self.latencies else None
+        return {
+            'start': self.start,
+            'end': self.end,
+            'count': sum(self.directions.values()),
+            'directions': self.directions,
+            'outcomes': self.outcomes,
+            'nodes': self.nodes,
+            'reversals': self.reversals,
+            'latency': latency,
+        }
+
+
+def summarize(events, since, until, window):
+    """
+    Aggregates events into consecutive windows of window seconds, from
+    since until until. events are dicts with the autoscaler_id, direction,
+    outcome, nodes, requested and completed of each CMScaleEvent, ordered
+    by requested time. Latency is measured from request to completion of
+    successful actions. An event which scales an autoscaler in the opposite
+    direction to its previous one counts as a reversal, as a measure of
+    flapping. Returns the totals over the whole period, and per window.
+    """
+    step = timedelta(seconds=window)
+    windows = []
+    start = since
+    while start < until and len(windows) < MAX_WINDOWS:
+        windows.append(_Window(start, min(start + step, until)))
+        start += step
+    total = _Window(since, until)
+    last_direction = {}
+    for event in events:
+        index = int((event['requested'] - since).total_seconds() // window)
+        if not 0 <= index < len(windows):
+            continue
+        autoscaler_id = event['autoscaler_id']
+        previous = last_direction.get(autoscaler_id)
+        reversal = previous is not None and previous != event['direction']
+        last_direction[autoscaler_id] = event['direction']
+        windows[index].add(event, reversal)
+        total.add(event, reversal)
+    return {
+        'since': since,
+        'until': until,
+        'window': window,
+        'total': total.to_dict(),
+        'windows': [w.to_dict() for w in windows],
+    }
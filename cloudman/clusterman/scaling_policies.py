@@ -0,0 +1,174 @@
+"""
+Scaling policies, which decide how many nodes an autoscaler should have in
+response to a scaling signal.
+
+A policy computes a desired node count from the signal (the parsed
+Alertmanager webhook payload) and the autoscaler's current size. The
+autoscaler then converges to it, within its min_nodes and max_nodes, and
+never moves against the direction of the signal. Each CMAutoScaler selects
+a policy by name. New policies can be added with the register decorator:
+
+    @scaling_policies.register('my_policy')
+    class MyPolicy(scaling_policies.ScalingPolicy):
+        def desired_nodes(self, current, direction, signal, count=1):
+            ...
+"""
+import logging
+import math
+
+log = logging.getLogger(__name__)
+
+UP = 'up'
+DOWN = 'down'
+
+DEFAULT_POLICY = 'step'
+
+_policies = {}
+
+
+def register(name):
+    """Class decorator which registers a scaling policy under name."""
+    def decorator(cls):
+        cls.name = name
+        _policies[name] = cls
+        return cls
+    return decorator
+
+
+def get_policy(name):
+    """
+    Returns an instance of the policy registered under name. Raises
+    KeyError for unknown policies.
+    """
+    return _policies[name or DEFAULT_POLICY]()
+
+
+def policy_names():
+    return sorted(_policies)
+
+
+def _firing_alerts(signal):
+    return [alert for alert in (signal or {}).get('alerts') or []
+            if alert.get('status', 'firing') != 'resolved']
+
+
+def get_signal_value(signal, key, default=None):
+    """
+    Returns a numeric value from a signal's common annotations or labels,
+    or from the sum over its firing alerts' annotations or labels, such
+    as a pending pod count. Falls back to default if there is no such
+    value, or if it is not a number.
+    """
+    signal = signal or {}
+    try:
+        for section in ('commonAnnotations', 'commonLabels'):
+            value = (signal.get(section) or {}).get(key)
+            if value is not None:
+                return float(value)
+        values = []
+        for alert in _firing_alerts(signal):
+            value = ((alert.get('annotations') or {}).get(key) or
+                     (alert.get('labels') or {}).get(key))
+            if value is not None:
+                values.append(float(value))
+    except (TypeError, ValueError):
+        log.warning("Ignoring non-numeric %s value %r in scaling signal",
+                    key, value)
+        return default
+    return sum(values) if values else default
+
+
+class ScalingPolicy(object):
+
+    name = None
+    # Whether the autoscaler should pass its demand forecast to the policy,
+    # as a forecast_nodes annotation on the signal
+    uses_forecast = False
+
+    def desired_nodes(self, current, direction, signal, count=1):
+        """
+        Returns the number of nodes the autoscaler should have, given its
+        current node count, the direction of the signal (UP or DOWN) and
+        the signal payload. count is the number of nodes explicitly asked
+        for by the signal.
+        """
+        raise NotImplementedError()
+
+
+@register('step')
+class StepPolicy(ScalingPolicy):
+    """Moves by the number of nodes asked for, one by default."""
+
+    def desired_nodes(self, current, direction, signal, count=1):
+        return current + count if direction == UP else current - count
+
+
+@register('alerts')
+class AlertCountPolicy(ScalingPolicy):
+    """Moves by one node per firing alert in the signal."""
+
+    def desired_nodes(self, current, direction, signal, count=1):
+        step = max(len(_firing_alerts(signal)), 1)
+        return current + step if direction == UP else current - step
+
+
+@register('pending_pods')
+class PendingPodsPolicy(ScalingPolicy):
+    """
+    Adds enough nodes to schedule the pending pods reported by the signal
+    in a pending_pods annotation or label, at pods_per_node pods per node.
+    Scales down by one node at a time.
+    """
+    DEFAULT_PODS_PER_NODE = 10
+
+    def desired_nodes(self, current, direction, signal, count=1):
+        if direction == DOWN:
+            return current - 1
+        pending = get_signal_value(signal, 'pending_pods')
+        if pending is None:
+            return current + count
+        per_node = get_signal_value(signal, 'pods_per_node',
+                                    self.DEFAULT_PODS_PER_NODE)
+        return current + math.ceil(pending / max(per_node, 1))
+
+
+@register('cpu')
+class RequestedCPUPolicy(ScalingPolicy):
+    """
+    Sizes the autoscaler by the unschedulable cpu cores reported by the
+    signal in a requested_cpu annotation or label, at cpus_per_node cores
+    per node. On scale down, unused_cpu is used in the same way to decide
+    how many nodes can be released.
+    """
+    DEFAULT_CPUS_PER_NODE = 2
+
+    def desired_nodes(self, current, direction, signal, count=1):
+        per_node = max(get_signal_value(signal, 'cpus_per_node',
+                                        self.DEFAULT_CPUS_PER_NODE), 1)
+        if direction == UP:
+            requested = get_signal_value(signal, 'requested_cpu')
+            if requested is None:
+                return current + count
+            return current + math.ceil(requested / per_node)
+        unused = get_signal_value(signal, 'unused_cpu')
+        if unused is None:
+            return current - count
+        return current - math.floor(unused / per_node)
+
+
+@register('predictive')
+class PredictivePolicy(ScalingPolicy):
+    """
+    Moves by the number of nodes asked for, like the step policy, but keeps
+    at least the forecast_nodes forecast from the autoscaler's history of
+    scale events. Periodic predictive scaling sends signals with the
+    forecast ahead of expected demand, so that nodes are ready in time.
+    """
+    uses_forecast = True
+
+    def desired_nodes(self, current, direction, signal, count=1):
+        desired = current + count if direction == UP else current - count
+        forecast = get_signal_value(signal, 'forecast_nodes')
+        if forecast is None:
+            return desired
+        return max(desired, math.ceil(forecast))
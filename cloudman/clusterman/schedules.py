@@ -0,0 +1,93 @@
+"""
+Time windows for autoscaler schedules, which override an autoscaler's
+min_nodes and max_nodes at set times of the week.
+
+A window runs from its start time to its end time, in its time zone, on
+the days of the week given in cron's day of week syntax: ``*`` for every
+day, or a comma separated list of days and ranges of days, as numbers
+from 0 (Sunday) to 7 (Sunday again) or three letter names, such as
+``1-5`` or ``mon-fri,sun``. Windows which end at or before their start
+time run past midnight, and the day they start on is the one matched.
+"""
+from datetime import timedelta
+
+import pytz
+
+DAY_NAMES = ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+
+
+def _parse_day(value):
+    value = value.strip().lower()
+    if value in DAY_NAMES:
+        return DAY_NAMES.index(value)
+    day = int(value)
+    if not 0 <= day <= 7:
+        raise ValueError("Day of week out of range: %s" % value)
+    # 7 is kept as is, so that ranges such as 1-7 end on Sunday
+    return day
+
+
+def parse_days(spec):
+    """
+    Returns the days matched by a cron day of week spec, as a set of
+    python weekday numbers, with Monday being 0. Raises ValueError for
+    invalid specs.
+    """
+    spec = (spec or '*').strip()
+    if spec == '*':
+        return set(range(7))
+    days = set()
+    for part in spec.split(','):
+        if '-' in part:
+            first, last = (_parse_day(day) for day in part.split('-', 1))
+            if last < first:
+                last += 7
+            cron_days = range(first, last + 1)
+        else:
+            cron_days = [_parse_day(part)]
+        # cron counts from Sunday, python from Monday
+        days.update((day - 1) % 7 for day in cron_days)
+    return days
+
+
+def parse_timezone(name):
+    """Returns the tzinfo for name, raising ValueError if it is unknown."""
+    try:
+        return pytz.timezone(name or 'UTC')
+    except pytz.UnknownTimeZoneError:
+        raise ValueError("Unknown time zone: %s" % name)
+
+
+def is_active(schedule, now):
+    """
+    Returns whether the window of schedule, which has days, start_time,
+    end_time and timezone attributes, includes the aware datetime now.
+    """
+    local = now.astimezone(parse_timezone(schedule.timezone))
+    days = parse_days(schedule.days)
+    start, end = schedule.start_time, schedule.end_time
+    time = local.time()
+    if start < end:
+        return local.weekday() in days and start <= time < end
+    # the window runs past midnight
+    if time >= start:
+        return local.weekday() in days
+    yesterday = (local - timedelta(days=1)).weekday()
+    return time < end and yesterday in days
+
+
+def get_limits(schedules, min_nodes, max_nodes, now):
+    """
+    Returns the min and max nodes in effect at now, given the base limits
+    and the schedules which may override them. Where several windows are
+    active, the largest of their limits apply. max_nodes is raised to
+    min_nodes if a window sets a minimum above it.
+    """
+    active = [s for s in schedules if is_active(s, now)]
+    mins = [s.min_nodes for s in active if s.min_nodes is not None]
+    maxes = [s.max_nodes for s in active if s.max_nodes is not None]
+    if mins:
+        min_nodes = max(mins)
+    if maxes:
+        max_nodes = max(maxes)
+    return min_nodes, max(max_nodes, min_nodes)
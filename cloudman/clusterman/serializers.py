@@ -1,13 +1,15 @@
 """DRF serializers for the CloudMan Create API endpoints."""
 
 from rest_framework import serializers
-from rest_framework import status
 from rest_framework.exceptions import ValidationError
 
 from cloudlaunch import serializers as cl_serializers
 from djcloudbridge import models as cb_models
 from djcloudbridge.drf_helpers import CustomHyperlinkedIdentityField
 
+from . import forecasting
+from . import scaling_policies
+from . import schedules
 from .api import CloudManAPI
 from .exceptions import CMDuplicateNameException
 
@@ -48,6 +50,7 @@ class CMClusterNodeSerializer(serializers.Serializer):
     vm_type = serializers.CharField(write_only=True)
     deployment = cl_serializers.DeploymentSerializer(read_only=True)
     autoscaler = serializers.PrimaryKeyRelatedField(read_only=True)
+    standby = serializers.BooleanField(read_only=True)
 
     def create(self, valid_data):
         cluster_id = self.context['view'].kwargs.get("cluster_pk")
@@ -68,6 +71,24 @@ class CMClusterAutoScalerSerializer(serializers.Serializer):
                                          required=False)
     max_nodes = serializers.IntegerField(min_value=1, max_value=5000,
                                          allow_null=True, required=False)
+    policy = serializers.ChoiceField(
+        choices=scaling_policies.policy_names(), required=False)
+    forecast_period = serializers.ChoiceField(
+        choices=sorted(forecasting.PERIODS), required=False)
+    predictive_dry_run = serializers.BooleanField(required=False)
+    scale_up_cooldown = serializers.IntegerField(min_value=0, required=False)
+    scale_down_cooldown = serializers.IntegerField(min_value=0,
+                                                   required=False)
+    max_nodes_per_minute = serializers.IntegerField(
+        min_value=1, allow_null=True, required=False)
+    standby_nodes = serializers.IntegerField(min_value=0, required=False)
+    last_scale_up = serializers.DateTimeField(read_only=True)
+    last_scale_down = serializers.DateTimeField(read_only=True)
+    rejected_signals = serializers.IntegerField(read_only=True)
+    last_rejection = serializers.DateTimeField(read_only=True)
+    last_rejection_reason = serializers.CharField(read_only=True)
+    node_count = serializers.IntegerField(read_only=True)
+    standby_count = serializers.IntegerField(read_only=True)
 
     def create(self, valid_data):
         cluster_id = self.context['view'].kwargs.get("cluster_pk")
@@ -75,11 +96,19 @@ class CMClusterAutoScalerSerializer(serializers.Serializer):
         if not cluster:
             raise ValidationError("Specified cluster id: %s does not exist"
                                   % cluster_id)
-        return cluster.autoscalers.create(valid_data.get('vm_type'),
-                                          name=valid_data.get('name'),
-                                          zone=valid_data.get('zone'),
-                                          min_nodes=valid_data.get('min_nodes'),
-                                          max_nodes=valid_data.get('max_nodes'))
+        return cluster.autoscalers.create(
+            valid_data.get('vm_type'),
+            name=valid_data.get('name'),
+            zone=valid_data.get('zone'),
+            min_nodes=valid_data.get('min_nodes'),
+            max_nodes=valid_data.get('max_nodes'),
+            policy=valid_data.get('policy'),
+            scale_up_cooldown=valid_data.get('scale_up_cooldown'),
+            scale_down_cooldown=valid_data.get('scale_down_cooldown'),
+            max_nodes_per_minute=valid_data.get('max_nodes_per_minute'),
+            standby_nodes=valid_data.get('standby_nodes'),
+            forecast_period=valid_data.get('forecast_period'),
+            predictive_dry_run=valid_data.get('predictive_dry_run'))
 
     def update(self, instance, valid_data):
         cluster_id = self.context['view'].kwargs.get("cluster_pk")
@@ -91,9 +120,145 @@ class CMClusterAutoScalerSerializer(serializers.Serializer):
         instance.max_nodes = (instance.max_nodes if valid_data.get('max_nodes') is None
                               else valid_data.get('max_nodes'))
         instance.zone = valid_data.get('zone') or instance.zone
+        instance.policy = valid_data.get('policy') or instance.policy
+        instance.forecast_period = (valid_data.get('forecast_period') or
+                                    instance.forecast_period)
+        if valid_data.get('predictive_dry_run') is not None:
+            instance.predictive_dry_run = valid_data['predictive_dry_run']
+        for field in ('scale_up_cooldown', 'scale_down_cooldown',
+                      'standby_nodes'):
+            if valid_data.get(field) is not None:
+                setattr(instance, field, valid_data.get(field))
+        if 'max_nodes_per_minute' in valid_data:
+            instance.max_nodes_per_minute = valid_data['max_nodes_per_minute']
         return cluster.autoscalers.update(instance)
 
 
+class CMAutoScalerScheduleSerializer(serializers.Serializer):
+    id = serializers.CharField(read_only=True)
+    autoscaler = serializers.PrimaryKeyRelatedField(read_only=True)
+    name = serializers.CharField(max_length=60)
+    days = serializers.CharField(max_length=60, required=False)
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    timezone = serializers.CharField(max_length=60, required=False)
+    min_nodes = serializers.IntegerField(min_value=0, allow_null=True,
+                                         required=False)
+    max_nodes = serializers.IntegerField(min_value=0, max_value=5000,
+                                         allow_null=True, required=False)
+    enabled = serializers.BooleanField(required=False)
+
+    def validate_days(self, value):
+        try:
+            schedules.parse_days(value)
+        except ValueError:
+            raise ValidationError("Invalid days of the week: %s" % value)
+        return value
+
+    def validate_timezone(self, value):
+        try:
+            schedules.parse_timezone(value)
+        except ValueError as e:
+            raise ValidationError(str(e))
+        return value
+
+    def validate(self, data):
+        min_nodes = data.get('min_nodes', getattr(self.instance, 'min_nodes',
+                                                  None))
+        max_nodes = data.get('max_nodes', getattr(self.instance, 'max_nodes',
+                                                  None))
+        if (min_nodes is not None and max_nodes is not None and
+                min_nodes > max_nodes):
+            raise ValidationError("min_nodes must not exceed max_nodes")
+        return data
+
+    def _get_autoscaler(self):
+        kwargs = self.context['view'].kwargs
+        cmapi = CloudManAPI.from_request(self.context['request'])
+        cluster = cmapi.clusters.get(kwargs.get("cluster_pk"))
+        return cluster.autoscalers.get(kwargs.get("autoscaler_pk"))
+
+    def create(self, valid_data):
+        try:
+            return self._get_autoscaler().schedules.create(
+                valid_data.get('name'), valid_data.get('start_time'),
+                valid_data.get('end_time'),
+                days=valid_data.get('days') or '*',
+                timezone=valid_data.get('timezone') or 'UTC',
+                min_nodes=valid_data.get('min_nodes'),
+                max_nodes=valid_data.get('max_nodes'),
+                enabled=valid_data.get('enabled', True))
+        except CMDuplicateNameException as e:
+            raise ValidationError(detail=str(e))
+
+    def update(self, instance, valid_data):
+        for field, value in valid_data.items():
+            setattr(instance, field, value)
+        return self._get_autoscaler().schedules.update(instance)
+
+
+class CMScaleOperationSerializer(serializers.Serializer):
+    id = serializers.CharField(read_only=True)
+    cluster = serializers.PrimaryKeyRelatedField(read_only=True)
+    direction = serializers.CharField(read_only=True)
+    zone_name = serializers.CharField(read_only=True)
+    count = serializers.IntegerField(read_only=True)
+    status = serializers.CharField(read_only=True)
+    message = serializers.CharField(read_only=True)
+    added = serializers.DateTimeField(read_only=True)
+    started = serializers.DateTimeField(read_only=True)
+    finished = serializers.DateTimeField(read_only=True)
+    duration = serializers.FloatField(read_only=True)
+
+
+class CMScaleEventSerializer(serializers.Serializer):
+    id = serializers.CharField(read_only=True)
+    cluster = serializers.PrimaryKeyRelatedField(read_only=True)
+    autoscaler = serializers.PrimaryKeyRelatedField(read_only=True)
+    operation = serializers.PrimaryKeyRelatedField(read_only=True)
+    direction = serializers.CharField(read_only=True)
+    source = serializers.CharField(read_only=True)
+    signal_digest = serializers.CharField(read_only=True)
+    requested = serializers.DateTimeField(read_only=True)
+    started = serializers.DateTimeField(read_only=True)
+    completed = serializers.DateTimeField(read_only=True)
+    outcome = serializers.CharField(read_only=True)
+    nodes = serializers.IntegerField(read_only=True)
+    message = serializers.CharField(read_only=True)
+    latency = serializers.FloatField(read_only=True)
+
+
+class CMScaleStatsQuerySerializer(serializers.Serializer):
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    window = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, data):
+        since, until = data.get('since'), data.get('until')
+        if since and until and since >= until:
+            raise ValidationError("since must be earlier than until")
+        return data
+
+
+class CMReconcileReportSerializer(serializers.Serializer):
+    id = serializers.CharField(read_only=True)
+    cluster = serializers.PrimaryKeyRelatedField(read_only=True)
+    started = serializers.DateTimeField(read_only=True)
+    finished = serializers.DateTimeField(read_only=True)
+    db_nodes = serializers.IntegerField(read_only=True)
+    rancher_nodes = serializers.IntegerField(read_only=True)
+    kubernetes_nodes = serializers.IntegerField(read_only=True)
+    missing = serializers.IntegerField(read_only=True)
+    not_in_rancher = serializers.IntegerField(read_only=True)
+    not_in_kubernetes = serializers.IntegerField(read_only=True)
+    rancher_orphans = serializers.IntegerField(read_only=True)
+    kubernetes_orphans = serializers.IntegerField(read_only=True)
+    unmanaged = serializers.IntegerField(read_only=True)
+    repaired = serializers.IntegerField(read_only=True)
+    drift = serializers.IntegerField(read_only=True)
+    details = serializers.DictField(read_only=True)
+
+
 # xref: https://prometheus.io/docs/alerting/configuration/#webhook_config
 class PrometheusAlertSerializer(serializers.Serializer):
     status = serializers.CharField(allow_blank=True, required=False)
@@ -107,6 +272,7 @@ class PrometheusAlertSerializer(serializers.Serializer):
 # xref: https://prometheus.io/docs/alerting/configuration/#webhook_config
 class PrometheusWebHookSerializer(serializers.Serializer):
     version = serializers.CharField()
+    status = serializers.CharField(allow_blank=True, required=False)
     groupKey = serializers.CharField(allow_blank=True, required=False)
     receiver = serializers.CharField(allow_blank=True, required=False)
     groupLabels = serializers.DictField(required=False)
@@ -0,0 +1,171 @@
+"""Tasks to be executed asynchronously (via Celery)."""
+from celery.app import shared_task
+from celery.utils.log import get_task_logger
+
+from django.contrib.auth.models import User
+
+from . import models
+from .api import CloudManAPI
+from .api import CMServiceContext
+from .exceptions import CMScaleRejectedException
+
+log = get_task_logger(__name__)
+
+
+@shared_task
+def process_scale_operation(operation_id):
+    """
+    Carry out a queued scale operation as the user it was created for.
+    """
+    operation = models.CMScaleOperation.objects.select_related(
+        'user').get(id=operation_id)
+    log.debug("Processing scale %s operation %s for cluster %s",
+              operation.direction, operation.id, operation.cluster_id)
+    cmapi = CloudManAPI(CMServiceContext(user=operation.user))
+    cluster = cmapi.clusters.get(operation.cluster_id)
+    cluster.operations.run(operation)
+
+
+def _get_api(user_id):
+    user = User.objects.get(id=user_id) if user_id else None
+    return CloudManAPI(CMServiceContext(user=user))
+
+
+def _get_autoscale_api():
+    """
+    Returns an api acting as the user which autoscaling impersonates, as
+    signals do, for scaling which is not triggered by a signal.
+    """
+    user = (User.objects.filter(
+        username=models.GlobalSettings().settings.autoscale_impersonate).first()
+            or User.objects.filter(is_superuser=True).first())
+    return CloudManAPI(CMServiceContext(user=user))
+
+
+@shared_task
+def replenish_standby_nodes(autoscaler_id, user_id):
+    """
+    Launch or remove standby nodes of an autoscaler, so that its pool of
+    standby nodes is back to size.
+    """
+    autoscaler = models.CMAutoScaler.objects.get(id=autoscaler_id)
+    cluster = _get_api(user_id).clusters.get(autoscaler.cluster_id)
+    cluster.autoscalers.get(autoscaler_id).replenish_standby()
+
+
+# Seconds between attempts to bring a standby node into service, doubled
+# on every attempt up to the maximum, and the default for how long to keep
+# trying, which should cover the launch of a node
+STANDBY_ACTIVATION_DELAY = 10
+STANDBY_ACTIVATION_MAX_DELAY = 300
+STANDBY_ACTIVATION_TIMEOUT = 3600
+
+
+def _activation_delay(attempt):
+    return min(STANDBY_ACTIVATION_DELAY * 2 ** attempt,
+               STANDBY_ACTIVATION_MAX_DELAY)
+
+
+@shared_task(bind=True, max_retries=None)
+def activate_standby_node(self, node_id, user_id):
+    """
+    Bring a standby node, claimed by a scale up signal, into service. A
+    node which is still being launched is retried, with a growing delay,
+    until it registers with kubernetes. If it has not registered by the
+    standby_activation_timeout, it is returned to the standby pool.
+    """
+    node = models.CMClusterNode.objects.get(id=node_id)
+    cluster = _get_api(user_id).clusters.get(node.cluster_id)
+    if cluster.get_cluster_template().activate_node(node):
+        return
+    attempt = self.request.retries
+    delay = _activation_delay(attempt)
+    waited = sum(_activation_delay(i) for i in range(attempt))
+    timeout = models.GlobalSettings().settings.get(
+        'standby_activation_timeout', as_type=int,
+        default=STANDBY_ACTIVATION_TIMEOUT)
+    if waited + delay <= timeout:
+        log.debug("Standby node %s has not registered yet", node.name)
+        raise self.retry(countdown=delay)
+    log.error("Standby node %s did not register within %s seconds, "
+              "returning it to standby", node.name, waited)
+    if node.autoscaler_id:
+        autoscaler = cluster.autoscalers.get(node.autoscaler_id)
+        if autoscaler.restore_standby(node.id):
+            autoscaler.schedule_replenish()
+
+
+@shared_task
+def predictive_scaling():
+    """
+    Scale up autoscalers with the predictive policy ahead of their forecast
+    demand, or record what would be done for those in dry run mode. Runs
+    periodically, see cloudman.celery.
+    """
+    cmapi = _get_autoscale_api()
+    autoscalers = models.CMAutoScaler.objects.filter(
+        policy='predictive', cluster__autoscale=True)
+    for autoscaler_id, cluster_id in autoscalers.values_list(
+            'id', 'cluster_id'):
+        try:
+            autoscaler = cmapi.clusters.get(cluster_id).autoscalers.get(
+                autoscaler_id)
+            forecast = autoscaler.prescale()
+            log.debug("Forecast %s nodes for autoscaler %s", forecast,
+                      autoscaler_id)
+        except CMScaleRejectedException as e:
+            log.info("Predictive scaling of autoscaler %s rejected: %s",
+                     autoscaler_id, e)
+        except Exception:
+            log.exception("Predictive scaling of autoscaler %s failed",
+                          autoscaler_id)
+
+
+@shared_task
+def apply_autoscaler_schedules():
+    """
+    Scale autoscalers with enabled schedules to the node limits in effect,
+    so that capacity is added when a window opens and released when it
+    closes, without waiting for signals. Runs every minute, see
+    cloudman.celery.
+    """
+    cmapi = _get_autoscale_api()
+    autoscalers = models.CMAutoScaler.objects.filter(
+        schedules__enabled=True, cluster__autoscale=True).distinct()
+    for autoscaler_id, cluster_id in autoscalers.values_list(
+            'id', 'cluster_id'):
+        try:
+            autoscaler = cmapi.clusters.get(cluster_id).autoscalers.get(
+                autoscaler_id)
+            limits = autoscaler.converge()
+            log.debug("Autoscaler %s limited to %s-%s nodes", autoscaler_id,
+                      *limits)
+        except CMScaleRejectedException as e:
+            log.info("Scheduled scaling of autoscaler %s rejected: %s",
+                     autoscaler_id, e)
+        except Exception:
+            log.exception("Scheduled scaling of autoscaler %s failed",
+                          autoscaler_id)
+
+
+@shared_task
+def reconcile_clusters():
+    """
+    Compare the nodes on record for each cluster with those in rancher and
+    kubernetes, and record a report of the drift found. Nodes which have
+    gone missing are only removed if the reconcile_repair setting is on.
+    Runs periodically, see cloudman.celery.
+    """
+    cmapi = _get_autoscale_api()
+    settings = models.GlobalSettings().settings
+    repair = settings.get('reconcile_repair', as_type=bool, default=False)
+    grace_period = settings.get('reconcile_grace_period', as_type=int,
+                                default=None)
+    for cluster_id in models.CMCluster.objects.values_list('id', flat=True):
+        try:
+            report = cmapi.clusters.get(cluster_id).reconciliation.run(
+                repair=repair, grace_period=grace_period)
+            log.info("Cluster %s has drift of %s nodes, %s repaired",
+                     cluster_id, report.drift, report.repaired)
+        except Exception:
+            log.exception("Reconciliation of cluster %s failed", cluster_id)
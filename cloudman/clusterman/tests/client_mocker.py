@@ -1,3 +1,4 @@
+from io import StringIO
 from unittest.mock import patch
 
 from .mock_kubectl import MockKubeCtl
@@ -33,6 +34,8 @@ class ClientMocker(object):
     """ Mocks all calls to the helm and kubectl commands"""
     def __init__(self, testcase, mockers=None):
         self.mockers = mockers or [KubeMocker()]
+        # every command run, so tests can assert on commands issued
+        self.commands = []
         self.extra_patches = []
         for mocker in self.mockers:
             self.extra_patches += mocker.extra_patches()
@@ -40,11 +43,21 @@ class ClientMocker(object):
                             self.mock_run_command)
         self.patch1.start()
         testcase.addCleanup(self.patch1.stop)
+        self.patch2 = patch('clusterman.clients.helpers.stream_command',
+                            self.mock_stream_command)
+        self.patch2.start()
+        testcase.addCleanup(self.patch2.stop)
         for each in self.extra_patches:
             each.start()
             testcase.addCleanup(each.stop)
 
     def mock_run_command(self, command, shell=False):
+        self.commands.append(command)
         for mocker in self.mockers:
             if mocker.can_parse(command):
                 return mocker.run_command(command)
+
+    def mock_stream_command(self, command, shell=False):
+        output = self.mock_run_command(command, shell=shell)
+        for line in StringIO(output or ""):
+            yield line
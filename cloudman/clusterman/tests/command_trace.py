@@ -0,0 +1,176 @@
+"""
+Record and replay the commands CloudMan runs through clusterman.clients.helpers.
+
+A CommandRecorder wraps the real run_command/stream_command and appends every
+command's argv, stdout and latency to a trace file, one json object per line.
+For example, to capture a trace against a live cluster from a django shell:
+
+    recorder = CommandRecorder('/tmp/large_cluster.jsonl')
+    recorder.start()
+    ... exercise the API ...
+    recorder.stop()
+
+A ReplayMocker serves those recorded outputs back through ClientMocker, with
+optional simulated latency, so that API endpoints can be benchmarked offline
+against realistic outputs, and the number of commands issued per request can
+be asserted on.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from collections import defaultdict
+from unittest.mock import patch
+
+from clusterman.clients import helpers
+from clusterman.exceptions import CMRunCommandException
+
+
+def command_key(command):
+    """
+    Returns a hashable key identifying a command. Arguments which differ
+    between otherwise identical runs, such as the temporary values file
+    passed to helm, are normalised.
+    """
+    if isinstance(command, str):
+        return command
+    key = []
+    skip_next = False
+    for arg in command:
+        if skip_next:
+            key.append("<file>")
+            skip_next = False
+        else:
+            key.append(arg)
+            skip_next = arg in ("-f", "--values")
+    return tuple(key)
+
+
+class CommandRecorder(object):
+    """
+    Records every command run via helpers.run_command or
+    helpers.stream_command to a trace file while started.
+    """
+
+    def __init__(self, trace_file):
+        self.trace_file = trace_file
+        self._lock = threading.Lock()
+        self._run_command = helpers.run_command
+        self._stream_command = helpers.stream_command
+        self._patches = [
+            patch('clusterman.clients.helpers.run_command', self.run_command),
+            patch('clusterman.clients.helpers.stream_command',
+                  self.stream_command)
+        ]
+
+    def start(self):
+        for each in self._patches:
+            each.start()
+
+    def stop(self):
+        for each in self._patches:
+            each.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _record(self, command, output, start, error=None):
+        entry = {
+            'argv': command,
+            'stdout': output,
+            'latency': time.perf_counter() - start,
+            'error': error
+        }
+        with self._lock:
+            with open(self.trace_file, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def run_command(self, command, shell=False):
+        start = time.perf_counter()
+        try:
+            output = self._run_command(command, shell=shell)
+        except CMRunCommandException as e:
+            self._record(command, None, start, error=str(e))
+            raise
+        self._record(command, output, start)
+        return output
+
+    def stream_command(self, command, shell=False):
+        start = time.perf_counter()
+        lines = []
+        try:
+            for line in self._stream_command(command, shell=shell):
+                lines.append(line)
+                yield line
+        except CMRunCommandException as e:
+            self._record(command, "".join(lines), start, error=str(e))
+            raise
+        self._record(command, "".join(lines), start)
+
+
+class ReplayMocker(object):
+    """
+    A mocker for use with ClientMocker, which replays the outputs in a trace
+    file written by CommandRecorder. Repeated runs of the same command are
+    served in recorded order, with the last recording reused once exhausted.
+
+    latency_factor scales the recorded latency of each command, so 0 replays
+    instantly and 1.0 replays at the recorded speed.
+    """
+
+    def __init__(self, trace_file, latency_factor=0.0):
+        self.latency_factor = latency_factor
+        self.recordings = defaultdict(list)
+        self.calls = []
+        self._positions = Counter()
+        self._lock = threading.Lock()
+        with open(trace_file) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.recordings[command_key(entry['argv'])].append(entry)
+
+    def can_parse(self, command):
+        return command_key(command) in self.recordings
+
+    @staticmethod
+    def extra_patches():
+        return [
+            patch('clusterman.clients.kube_client.KubeClient.'
+                  '_check_environment', return_value=True),
+            patch('helmsman.clients.helm_client.HelmClient._check_environment',
+                  return_value=True)
+        ]
+
+    @property
+    def call_count(self):
+        return len(self.calls)
+
+    def count_calls(self, prog=None):
+        """
+        Returns the number of commands replayed so far, optionally only
+        those of a given program, such as kubectl or helm.
+        """
+        return len([c for c in self.calls
+                    if not prog or (not isinstance(c, str) and c[0] == prog)])
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls = []
+
+    def run_command(self, command):
+        key = command_key(command)
+        with self._lock:
+            entries = self.recordings[key]
+            entry = entries[min(self._positions[key], len(entries) - 1)]
+            self._positions[key] += 1
+            self.calls.append(command)
+        if self.latency_factor:
+            time.sleep(entry['latency'] * self.latency_factor)
+        if entry.get('error'):
+            raise CMRunCommandException(entry['error'])
+        return entry['stdout']
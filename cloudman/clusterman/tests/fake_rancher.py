@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients giving up on slow responses is expected in tests
+        pass
+
+
+class FakeRancher(object):
+    """
+    A minimal fake of the rancher v3 api, served over http from a background
+    thread, to test RancherClient against a real socket. Supports listing
+    (with filters and pagination), deleting nodes and creating cluster
+    registration tokens. Failures and slowness can be injected with
+    fail_requests, delay and stop(). Deleted nodes stay listed, in the
+    removing state, for removal_lag further node listings.
+    """
+
+    def __init__(self, nodes=None, page_size=100, removal_lag=0):
+        self.nodes = list(nodes or [])
+        self.page_size = page_size
+        self.removal_lag = removal_lag
+        # node id to the number of listings it will still appear in
+        self.removing = {}
+        # number of upcoming requests to answer with a 503
+        self.fail_requests = 0
+        # seconds to wait before answering each request
+        self.delay = 0
+        # (method, path) of every request received
+        self.requests = []
+        self._lock = threading.Lock()
+        self.server = _ThreadingHTTPServer(('127.0.0.1', 0),
+                                           self._create_handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _create_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self, method):
+                if self.headers.get('Content-Length'):
+                    self.rfile.read(int(self.headers['Content-Length']))
+                with fake._lock:
+                    fake.requests.append((method, self.path))
+                    failing = fake.fail_requests > 0
+                    if failing:
+                        fake.fail_requests -= 1
+                if fake.delay:
+                    time.sleep(fake.delay)
+                if failing:
+                    return self._send(503, {'message': 'unavailable'})
+                status, body = fake.dispatch(method, self.path)
+                self._send(status, body)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_DELETE(self):
+                self._handle("DELETE")
+
+        return Handler
+
+    def dispatch(self, method, path):
+        parts = urlsplit(path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        if method == "GET" and parts.path.rstrip('/') == "/v3/nodes":
+            return 200, self._list_nodes(query)
+        if method == "DELETE" and parts.path.startswith("/v3/nodes/"):
+            node_id = parts.path[len("/v3/nodes/"):]
+            with self._lock:
+                if not any(n['id'] == node_id for n in self.nodes):
+                    return 404, {'message': 'not found'}
+                for node in self.nodes:
+                    if node['id'] == node_id:
+                        node['state'] = 'removing'
+                self.removing[node_id] = self.removal_lag
+                self._expire_removed_nodes()
+            return 200, {'id': node_id, 'state': 'removing'}
+        if method == "POST" and parts.path == "/v3/clusterregistrationtoken":
+            return 201, {'nodeCommand': 'docker run rancher/rancher-agent'}
+        return 404, {'message': 'not found'}
+
+    def _expire_removed_nodes(self):
+        gone = {node_id for node_id, lag in self.removing.items() if lag <= 0}
+        self.nodes = [n for n in self.nodes if n['id'] not in gone]
+        for node_id in gone:
+            del self.removing[node_id]
+
+    def _list_nodes(self, query):
+        marker = int(query.pop('marker', 0))
+        with self._lock:
+            if not marker:
+                for node_id in self.removing:
+                    self.removing[node_id] -= 1
+            nodes = [n for n in self.nodes
+                     if all(str(n.get(k)) == v for k, v in query.items())]
+            self._expire_removed_nodes()
+        page = nodes[marker:marker + self.page_size]
+        body = {'type': 'collection', 'data': page, 'pagination': {}}
+        if marker + self.page_size < len(nodes):
+            query['marker'] = marker + self.page_size
+            body['pagination']['next'] = (
+                self.url + "/v3/nodes?" +
+                "&".join(f"{k}={v}" for k, v in query.items()))
+        return body
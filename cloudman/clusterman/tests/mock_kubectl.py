@@ -116,6 +116,7 @@ class MockKubeCtl(object):
         # kubectl get nodes
         parser_list_nodes = subparsers_get.add_parser(
             'nodes', help='List Nodes')
+        parser_list_nodes.add_argument('-l', '--selector', type=str)
         parser_list_nodes.add_argument('-o', choices=['yaml'], default="yaml")
         parser_list_nodes.set_defaults(func=self._kubectl_get_nodes)
         # kubectl get pods
@@ -158,6 +159,22 @@ class MockKubeCtl(object):
             'node_name', type=str, help='node to cordon')
         parser_cordon.set_defaults(func=self._kubectl_cordon)
 
+        # kubectl uncordon
+        parser_uncordon = subparsers.add_parser('uncordon',
+                                                help='uncordon node')
+        parser_uncordon.add_argument(
+            'node_name', type=str, help='node to uncordon')
+        parser_uncordon.set_defaults(func=self._kubectl_uncordon)
+
+        # kubectl taint nodes
+        parser_taint = subparsers.add_parser('taint', help='taint node')
+        parser_taint.add_argument('resource', choices=['nodes'])
+        parser_taint.add_argument(
+            'node_name', type=str, help='node to taint')
+        parser_taint.add_argument(
+            'taint', type=str, help='taint to add, or key- to remove')
+        parser_taint.set_defaults(func=self._kubectl_taint)
+
         def str2bool(v):
             if isinstance(v, bool):
                 return v
@@ -221,6 +238,11 @@ class MockKubeCtl(object):
         response = dict(self.list_template)
         # add node to template
         response['items'] = self.nodes
+        if args.selector:
+            key, _, value = args.selector.partition('=')
+            response['items'] = [
+                node for node in self.nodes
+                if node['metadata'].get('labels', {}).get(key) == value]
         with StringIO() as output:
             yaml.dump(response, stream=output, default_flow_style=False)
             return output.getvalue()
@@ -243,6 +265,36 @@ class MockKubeCtl(object):
             output.write(f"node/{args.node_name} cordoned")
             return output.getvalue()
 
+    def _find_node(self, name):
+        for node in self.nodes:
+            if node['metadata']['name'] == name:
+                return node
+        raise Exception(f'Error from server (NotFound): nodes "{name}" '
+                        'not found')
+
+    def _kubectl_uncordon(self, args):
+        node = self._find_node(args.node_name)
+        node['spec'].pop('unschedulable', None)
+        with StringIO() as output:
+            output.write(f"node/{args.node_name} uncordoned")
+            return output.getvalue()
+
+    def _kubectl_taint(self, args):
+        node = self._find_node(args.node_name)
+        taints = node['spec'].setdefault('taints', [])
+        if args.taint.endswith('-'):
+            key = args.taint[:-1].split(':')[0]
+            node['spec']['taints'] = [t for t in taints if t['key'] != key]
+            action = "untainted"
+        else:
+            key, _, rest = args.taint.partition('=')
+            value, _, effect = rest.partition(':')
+            taints.append({'key': key, 'value': value, 'effect': effect})
+            action = "tainted"
+        with StringIO() as output:
+            output.write(f"node/{args.node_name} {action}")
+            return output.getvalue()
+
     def _kubectl_drain(self, args):
         with StringIO() as output:
             output.write(f"node/{args.node_name} drained")
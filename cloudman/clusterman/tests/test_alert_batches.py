@@ -0,0 +1,66 @@
+from django.test import SimpleTestCase
+
+from clusterman import alert_batches
+
+
+class AlertBatchesTests(SimpleTestCase):
+
+    @staticmethod
+    def _alert(cluster=None, zone=None, status='firing', **annotations):
+        labels = {'alertname': 'PendingPods'}
+        if cluster:
+            labels['cluster'] = cluster
+        if zone:
+            labels['availability_zone'] = zone
+        return {'status': status, 'labels': labels,
+                'annotations': annotations}
+
+    def test_group_alerts(self):
+        signal = {
+            'version': '4',
+            'groupKey': '{}:{alertname="PendingPods"}',
+            'commonLabels': {'alertname': 'PendingPods'},
+            'alerts': [
+                self._alert('a', 'zone1', pending_pods='4', summary='x'),
+                self._alert('b', 'zone1'),
+                self._alert('a', 'zone1', pending_pods='4', summary='y'),
+                self._alert('a'),
+                self._alert('a', 'zone2', status='resolved'),
+                self._alert(zone='zone1'),
+            ]
+        }
+        groups, unlabelled = alert_batches.group_alerts(signal)
+        self.assertEqual(unlabelled, 1)
+        self.assertEqual(list(groups),
+                         [('a', 'zone1'), ('b', 'zone1'), ('a', None)])
+        group = groups[('a', 'zone1')]
+        self.assertEqual(len(group['alerts']), 2)
+        self.assertEqual(group['commonLabels'], {
+            'alertname': 'PendingPods', 'cluster': 'a',
+            'availability_zone': 'zone1'})
+        # only the annotations the alerts agree on are common
+        self.assertEqual(group['commonAnnotations'], {'pending_pods': '4'})
+        self.assertEqual(group['groupKey'],
+                         '{}:{alertname="PendingPods"}:a/zone1')
+        self.assertEqual(groups[('a', None)]['groupKey'],
+                         '{}:{alertname="PendingPods"}:a/')
+
+    def test_common_cluster_label(self):
+        signal = {'commonLabels': {'kube_cluster': 'a'},
+                  'alerts': [self._alert(zone='zone1'),
+                             self._alert(zone='zone2')]}
+        groups, unlabelled = alert_batches.group_alerts(
+            signal, cluster_label='kube_cluster')
+        self.assertEqual(unlabelled, 0)
+        self.assertEqual(list(groups), [('a', 'zone1'), ('a', 'zone2')])
+        self.assertEqual(groups[('a', 'zone2')]['commonLabels']['kube_cluster'],
+                         'a')
+
+    def test_no_group_key(self):
+        signal = {'alerts': [self._alert('a', 'zone1'),
+                             self._alert('b', 'zone1')]}
+        groups, _ = alert_batches.group_alerts(signal)
+        # signals without a groupKey are never coalesced, so their groups
+        # don't get one either
+        self.assertEqual([group['groupKey'] for group in groups.values()],
+                         [None, None])
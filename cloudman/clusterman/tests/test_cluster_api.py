@@ -1,20 +1,36 @@
+import json
 import os
+import re
 import yaml
 
+from datetime import timedelta
+
 from unittest.mock import patch
 from unittest.mock import PropertyMock
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.management import call_command
 from django.core.servers.basehttp import WSGIServer
 from django.test.testcases import LiveServerThread, QuietWSGIRequestHandler
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APITestCase, APILiveServerTestCase
 
 import responses
 
+from cloudlaunch.models import ApplicationDeploymentTask
+
+from clusterman import tasks
+from clusterman.clients.rancher import CircuitBreaker
+from clusterman.clients.rancher import RancherClient
+from clusterman.models import autoscaler_routes_cache_key
+from clusterman.models import CMAutoScaler
+from clusterman.models import CMScaleEvent
+from clusterman.models import GlobalSettings
+
 from .client_mocker import ClientMocker
 
 
@@ -226,7 +242,8 @@ class CMClusterNodeTestBase(CMClusterServiceTestBase, LiveServerSingleThreadedTe
         responses.add_passthru('http://localhost')
         responses.add(responses.POST, 'https://127.0.0.1:4430/v3/clusterregistrationtoken',
                       json={'nodeCommand': 'docker run rancher --worker'}, status=200)
-        responses.add(responses.GET, 'https://127.0.0.1:4430/v3/nodes/?clusterId=c-abcd1',
+        responses.add(responses.GET, re.compile(
+                          r'https://127.0.0.1:4430/v3/nodes/\?clusterId=c-abcd1.*'),
                       json=
                       {'data': [
                           {'id': 'c-ph9ck:m-01606aca4649',
@@ -280,7 +297,8 @@ class CMClusterNodeServiceTests(CMClusterNodeTestBase):
         return response.data['id']
 
     def _delete_cluster_node(self, cluster_id, node_id):
-        responses.add(responses.GET, 'https://127.0.0.1:4430/v3/nodes/?clusterId=c-abcd1',
+        responses.add(responses.GET, re.compile(
+                          r'https://127.0.0.1:4430/v3/nodes/\?clusterId=c-abcd1.*'),
                       json=
                       {'data': [
                           {'id': 'c-ph9ck:m-01606aca4649',
@@ -350,6 +368,67 @@ class CMClusterNodeServiceTests(CMClusterNodeTestBase):
         assert node_id_now  # should still exist
         assert node_id_then == node_id_now  # should be the same node
 
+    @responses.activate
+    def test_reconcile_nodes(self):
+        cluster_id = self._create_cluster()
+        self._create_cluster_node(cluster_id)
+        node_id = self._list_cluster_node(cluster_id)
+        # the node came up at an address neither rancher nor kubernetes
+        # know, as if it had been removed by hand
+        ApplicationDeploymentTask.objects.filter(
+            deployment__cm_cluster_node__id=node_id).update(
+                celery_id=None,
+                _result=json.dumps({'cloudLaunch': {'publicIP': '10.2.2.2'}}))
+
+        # recently launched nodes are given time to register
+        tasks.reconcile_clusters()
+        url = reverse('clusterman:reconcilereport-list', args=[cluster_id])
+        report = self.client.get(url).data['results'][0]
+        self.assertEqual((report['db_nodes'], report['rancher_nodes'],
+                          report['kubernetes_nodes']), (1, 1, 1))
+        self.assertEqual((report['missing'], report['drift']), (0, 0))
+        # the node in rancher and kubernetes is not one of cloudman's
+        self.assertEqual(report['unmanaged'], 1)
+        self.assertEqual(report['details']['unmanaged'],
+                         ['c-ph9ck:m-01606aca4649'])
+
+        # missing nodes are only reported by default
+        GlobalSettings().settings.reconcile_grace_period = 0
+        tasks.reconcile_clusters()
+        report = self.client.get(url).data['results'][0]
+        self.assertEqual((report['missing'], report['repaired'],
+                          report['drift']), (1, 0, 1))
+        self._check_cluster_node_exists(cluster_id, node_id)
+
+        GlobalSettings().settings.reconcile_repair = True
+        tasks.reconcile_clusters()
+        report = self.client.get(url).data['results'][0]
+        self.assertEqual((report['missing'], report['repaired'],
+                          report['drift']), (1, 1, 1))
+        self.assertEqual(report['details']['missing'], [int(node_id)])
+        self._check_no_cluster_nodes_exist(cluster_id)
+
+
+class RancherCircuitTests(CMClusterServiceTestBase):
+
+    def test_circuit_states(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.record_failure()
+        url = reverse('clusterman:ranchercircuit-list')
+        with patch.dict(RancherClient._breakers,
+                        {'https://127.0.0.1:4430': breaker}, clear=True):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK,
+                         response.data)
+        self.assertEqual(response.data['https://127.0.0.1:4430']['state'],
+                         CircuitBreaker.OPEN)
+
+        self.client.force_login(User.objects.get_or_create(
+            username='notaclusteradmin', is_staff=False)[0])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN,
+                         response.data)
+
 
 class CMClusterAutoScalerTests(CMClusterServiceTestBase):
 
@@ -467,6 +546,25 @@ class CMClusterAutoScalerTests(CMClusterServiceTestBase):
         assert autoscaler_id_now  # should still exist
         assert autoscaler_id_then == autoscaler_id_now  # should be the same autoscaler
 
+    @responses.activate
+    def test_standby_replenished_on_commit(self):
+        cluster_id = self._create_cluster()
+        url = reverse('clusterman:autoscaler-list', args=[cluster_id])
+        with patch('django.db.transaction.on_commit') as on_commit, \
+                patch('clusterman.tasks.replenish_standby_nodes.delay') \
+                as replenish:
+            response = self.client.post(
+                url, dict(self.AUTOSCALER_DATA, standby_nodes=1),
+                format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED,
+                             response.data)
+            # not queued before the autoscaler is committed
+            replenish.assert_not_called()
+            on_commit.call_args[0][0]()
+        replenish.assert_called_once_with(
+            int(response.data['id']),
+            User.objects.get(username='clusteradmin').id)
+
 
 class CMClusterScaleSignalTests(CMClusterNodeTestBase):
 
@@ -492,10 +590,10 @@ class CMClusterScaleSignalTests(CMClusterNodeTestBase):
 
     SCALE_SIGNAL_DATA = {
         "receiver": "cloudman",
-        "status": "resolved",
+        "status": "firing",
         "alerts": [
             {
-                "status": "resolved",
+                "status": "firing",
                 "labels": {
                     "alertname": "KubeCPUOvercommit",
                     "hostname": "testhostname",
@@ -534,10 +632,10 @@ class CMClusterScaleSignalTests(CMClusterNodeTestBase):
 
     SCALE_SIGNAL_DATA_SECOND_ZONE = {
         "receiver": "cloudman",
-        "status": "resolved",
+        "status": "firing",
         "alerts": [
             {
-                "status": "resolved",
+                "status": "firing",
                 "labels": {
                     "alertname": "KubeCPUOvercommit",
                     "availability_zone": "us-east-1c"
@@ -557,6 +655,19 @@ class CMClusterScaleSignalTests(CMClusterNodeTestBase):
 
     fixtures = ['initial_test_data.json']
 
+    def setUp(self):
+        super().setUp()
+        # Most tests send repeated signals, so don't coalesce them by default
+        GlobalSettings().settings.autoscale_coalesce_window = 0
+        # Cluster ids are reused between tests, so drop cached routes
+        cache.clear()
+        # Tests run in a transaction which is never committed, so queue
+        # operations straight away
+        patcher_on_commit = patch('django.db.transaction.on_commit',
+                                  side_effect=lambda func: func())
+        patcher_on_commit.start()
+        self.addCleanup(patcher_on_commit.stop)
+
     def _create_cluster_raw(self):
         url = reverse('clusterman:clusters-list')
         return self.client.post(url, self.CLUSTER_DATA, format='json')
@@ -705,6 +816,278 @@ class CMClusterScaleSignalTests(CMClusterNodeTestBase):
         count = self._count_cluster_nodes(cluster_id)
         self.assertEqual(count, 1)
 
+    @responses.activate
+    def test_scale_up_multiple_nodes(self):
+        # create the parent cluster
+        cluster_id = self._create_cluster()
+
+        # ask for three nodes in a single signal
+        signal = dict(self.SCALE_SIGNAL_DATA)
+        signal['commonAnnotations'] = dict(
+            signal['commonAnnotations'], node_count="3")
+        self._signal_scaleup(cluster_id, data=signal)
+
+        # Ensure that all three nodes were created
+        count = self._count_cluster_nodes(cluster_id)
+        self.assertEqual(count, 3)
+
+        # the default scaler's max_nodes of 5 must not be exceeded
+        signal['commonAnnotations']['node_count'] = "10"
+        self._signal_scaleup(cluster_id, data=signal)
+        count = self._count_cluster_nodes(cluster_id)
+        self.assertEqual(count, 5)
+
+    def _list_operations(self, cluster_id):
+        url = reverse('clusterman:operation-list', args=[cluster_id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data['results']
+
+    @responses.activate
+    def test_scale_signal_operations(self):
+        # create the parent cluster
+        cluster_id = self._create_cluster()
+
+        # the signal is accepted and an operation returned
+        response = self._signal_scaleup(cluster_id)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        operation_id = response.data['id']
+        self.assertEqual(response.data['direction'], 'up')
+
+        # the operation has run, and its status and timing are recorded
+        url = reverse('clusterman:operation-detail',
+                      args=[cluster_id, operation_id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['status'], 'succeeded', response.data)
+        self.assertIsNotNone(response.data['started'])
+        self.assertIsNotNone(response.data['duration'])
+
+        response = self._signal_scaledown(cluster_id)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        operations = self._list_operations(cluster_id)
+        self.assertEqual([op['direction'] for op in operations],
+                         ['down', 'up'])
+
+    @responses.activate
+    def test_scale_events(self):
+        cluster_id = self._create_cluster()
+        response = self._signal_scaleup(cluster_id)
+        operation_id = response.data['id']
+        self._signal_scaledown(cluster_id)
+        self._signal_scaledown(cluster_id)
+
+        # every scale action is recorded, with its outcome and timing
+        url = reverse('clusterman:scaleevent-list', args=[cluster_id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        events = response.data['results']
+        self.assertEqual([(e['direction'], e['outcome'], e['nodes'])
+                          for e in events],
+                         [('down', 'unchanged', 0), ('down', 'succeeded', 1),
+                          ('up', 'succeeded', 1)])
+        self.assertEqual(int(events[-1]['operation']), int(operation_id))
+        self.assertIsNotNone(events[-1]['latency'])
+        self.assertIsNotNone(events[-1]['signal_digest'])
+
+        url = reverse('clusterman:scalestats-list', args=[cluster_id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        total = response.data['total']
+        self.assertEqual(total['count'], 3)
+        self.assertEqual(total['directions'], {'up': 1, 'down': 2})
+        self.assertEqual(total['reversals'], 1)
+        self.assertIsNotNone(total['latency']['p90'])
+        self.assertEqual(len(response.data['windows']), 24)
+
+        response = self.client.get(url, {'window': 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @responses.activate
+    def test_predictive_scaling(self):
+        cluster_id = self._create_cluster()
+        autoscaler_id = self._create_autoscaler(
+            cluster_id, data=dict(self.AUTOSCALER_DATA_SECOND_ZONE,
+                                  policy='predictive',
+                                  predictive_dry_run=True))
+        # the autoscaler was scaled to two nodes shortly after this time of
+        # day on each day of the last week
+        now = timezone.now()
+        for days_ago in range(1, 8):
+            burst = now - timedelta(days=days_ago, minutes=-20)
+            for direction, offset in (('up', 0), ('down', 30)):
+                requested = burst + timedelta(minutes=offset)
+                CMScaleEvent.objects.create(
+                    cluster_id=cluster_id, autoscaler_id=autoscaler_id,
+                    direction=direction, requested=requested,
+                    started=requested, completed=requested,
+                    outcome='succeeded', nodes=2)
+
+        # in dry run mode, the scaling is only recorded
+        tasks.predictive_scaling()
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 0)
+        events_url = reverse('clusterman:scaleevent-list', args=[cluster_id])
+        event = self.client.get(events_url).data['results'][0]
+        self.assertEqual((event['outcome'], event['nodes'], event['source']),
+                         ('dry_run', 2, 'predictive'))
+
+        url = reverse('clusterman:autoscaler-detail',
+                      args=[cluster_id, autoscaler_id])
+        response = self.client.patch(url, {'predictive_dry_run': False},
+                                     format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK,
+                         response.data)
+        tasks.predictive_scaling()
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 2)
+        event = self.client.get(events_url).data['results'][0]
+        self.assertEqual((event['outcome'], event['source']),
+                         ('succeeded', 'predictive'))
+        # the nodes added ahead of demand don't inflate the next forecast
+        tasks.predictive_scaling()
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 2)
+
+    @responses.activate
+    def test_autoscaler_schedules(self):
+        cluster_id = self._create_cluster()
+        autoscaler_id = self._create_autoscaler(
+            cluster_id, data=self.AUTOSCALER_DATA_SECOND_ZONE)
+        url = reverse('clusterman:schedule-list',
+                      args=[cluster_id, autoscaler_id])
+        now = timezone.now()
+        schedule = {
+            'name': 'working-hours',
+            'start_time': (now - timedelta(hours=1)).strftime('%H:%M'),
+            'end_time': (now + timedelta(hours=1)).strftime('%H:%M'),
+            'min_nodes': 2,
+        }
+        response = self.client.post(url, dict(schedule, days='mon-funday'),
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, schedule, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED,
+                         response.data)
+        schedule_id = response.data['id']
+
+        # the window is open, so capacity is added without a signal
+        tasks.apply_autoscaler_schedules()
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 2)
+
+        # and released once the window's limits go down
+        url = reverse('clusterman:schedule-detail',
+                      args=[cluster_id, autoscaler_id, schedule_id])
+        response = self.client.patch(url, {'min_nodes': 0, 'max_nodes': 1},
+                                     format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK,
+                         response.data)
+        tasks.apply_autoscaler_schedules()
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 1)
+
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    @responses.activate
+    def test_batch_signals(self):
+        cluster_id = self._create_cluster()
+        autoscaler_default_id = self._create_autoscaler(cluster_id)
+        autoscaler_secondary_id = self._create_autoscaler(
+            cluster_id, data=self.AUTOSCALER_DATA_SECOND_ZONE)
+        cluster_name = self.CLUSTER_DATA['name']
+
+        def alert(zone=None, **labels):
+            if zone:
+                labels['availability_zone'] = zone
+            return {'status': 'firing',
+                    'labels': dict(labels, alertname='KubeCPUOvercommit')}
+
+        signal = dict(self.SCALE_SIGNAL_DATA, commonLabels={}, alerts=[
+            alert('us-east-1b', cluster=cluster_name),
+            alert('us-east-1b', cluster=cluster_name),
+            alert('us-east-1c', cluster=cluster_name),
+            alert('us-east-1c', cluster='unknown'),
+            alert('us-east-1c'),
+        ])
+        url = reverse('clusterman:batchscaleupsignal-list')
+        response = self.client.post(url, signal, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED,
+                         response.data)
+        # one operation per cluster and zone
+        self.assertEqual(
+            [op['zone_name'] for op in response.data['operations']],
+            ['us-east-1b', 'us-east-1c'])
+        self.assertEqual(response.data['skipped'], {
+            'unlabelled': 1, 'unknown_clusters': ['unknown']})
+        self.assertEqual(self._count_nodes_in_scale_group(
+            cluster_id, autoscaler_default_id), 1)
+        self.assertEqual(self._count_nodes_in_scale_group(
+            cluster_id, autoscaler_secondary_id), 1)
+
+        url = reverse('clusterman:batchscaledownsignal-list')
+        response = self.client.post(url, signal, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED,
+                         response.data)
+        # the default autoscaler is at its min_nodes
+        self.assertEqual(self._count_nodes_in_scale_group(
+            cluster_id, autoscaler_default_id), 1)
+        self.assertEqual(self._count_nodes_in_scale_group(
+            cluster_id, autoscaler_secondary_id), 0)
+
+    @responses.activate
+    def test_repeated_signals_coalesced(self):
+        GlobalSettings().settings.autoscale_coalesce_window = 60
+        cluster_id = self._create_cluster()
+
+        response = self._signal_scaleup(cluster_id)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        operation_id = response.data['id']
+
+        # a re-sent alert group is folded into the first operation
+        response = self._signal_scaleup(cluster_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['id'], operation_id)
+        self.assertEqual(self._count_cluster_nodes(cluster_id), 1)
+
+        # but a different alert group is not
+        signal = dict(self.SCALE_SIGNAL_DATA, groupKey='{}:{alertname="Other"}')
+        response = self._signal_scaleup(cluster_id, data=signal)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        self.assertEqual(self._count_cluster_nodes(cluster_id), 2)
+        self.assertEqual(len(self._list_operations(cluster_id)), 2)
+
+        # and signals without a group are never coalesced
+        signal = dict(self.SCALE_SIGNAL_DATA)
+        signal.pop('groupKey')
+        for _ in range(2):
+            response = self._signal_scaleup(cluster_id, data=signal)
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED,
+                             response.data)
+        self.assertEqual(len(self._list_operations(cluster_id)), 4)
+
+    @responses.activate
+    def test_resolved_signals_ignored(self):
+        cluster_id = self._create_cluster()
+        signal = dict(self.SCALE_SIGNAL_DATA, status='resolved')
+        signal['alerts'] = [dict(alert, status='resolved')
+                            for alert in signal['alerts']]
+        response = self._signal_scaleup(cluster_id, data=signal)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(self._count_cluster_nodes(cluster_id), 0)
+        self.assertEqual(self._list_operations(cluster_id), [])
+
+    @responses.activate
+    def test_operations_unauthorized(self):
+        cluster_id = self._create_cluster()
+        self._signal_scaleup(cluster_id)
+        self.client.force_login(
+            User.objects.get_or_create(username='notaclusteradmin', is_staff=False)[0])
+        url = reverse('clusterman:operation-list', args=[cluster_id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN, response.data)
+
     @responses.activate
     def test_scaling_with_manual_nodes(self):
         # create the parent cluster
@@ -731,6 +1114,255 @@ class CMClusterScaleSignalTests(CMClusterNodeTestBase):
         count = self._count_cluster_nodes(cluster_id)
         self.assertEqual(count, 1)
 
+    @responses.activate
+    def test_scaling_policy(self):
+        cluster_id = self._create_cluster()
+        autoscaler_id = self._create_autoscaler(
+            cluster_id, data=dict(self.AUTOSCALER_DATA_SECOND_ZONE,
+                                  max_nodes='5', policy='pending_pods'))
+
+        # 25 pending pods at the default 10 pods per node need 3 nodes
+        signal = dict(self.SCALE_SIGNAL_DATA_SECOND_ZONE,
+                      commonAnnotations={'pending_pods': '25'})
+        self._signal_scaleup(cluster_id, data=signal)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 3)
+
+        # max_nodes is still respected
+        self._signal_scaleup(cluster_id, data=signal)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 5)
+
+        self._signal_scaledown(cluster_id, data=signal)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 4)
+
+    def _get_autoscaler(self, cluster_id, autoscaler_id):
+        url = reverse('clusterman:autoscaler-detail',
+                      args=[cluster_id, autoscaler_id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data
+
+    @responses.activate
+    def test_scaling_cooldown(self):
+        cluster_id = self._create_cluster()
+        autoscaler_id = self._create_autoscaler(
+            cluster_id, data=dict(self.AUTOSCALER_DATA_SECOND_ZONE,
+                                  scale_up_cooldown=300))
+        signal = self.SCALE_SIGNAL_DATA_SECOND_ZONE
+
+        self._signal_scaleup(cluster_id, data=signal)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 1)
+
+        # a second scale up within the cooldown is rejected and recorded
+        response = self._signal_scaleup(cluster_id, data=signal)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 1)
+        self.assertEqual(self._list_operations(cluster_id)[0]['status'],
+                         'rejected')
+        autoscaler = self._get_autoscaler(cluster_id, autoscaler_id)
+        self.assertEqual(autoscaler['rejected_signals'], 1)
+        self.assertIn('cooldown', autoscaler['last_rejection_reason'])
+
+        # scaling down has its own cooldown
+        self._signal_scaledown(cluster_id, data=signal)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 0)
+
+    @responses.activate
+    def test_scaling_rate_limit(self):
+        cluster_id = self._create_cluster()
+        autoscaler_id = self._create_autoscaler(
+            cluster_id, data=dict(self.AUTOSCALER_DATA_SECOND_ZONE,
+                                  max_nodes='5', max_nodes_per_minute=2))
+        signal = dict(self.SCALE_SIGNAL_DATA_SECOND_ZONE,
+                      commonAnnotations={'node_count': '3'})
+
+        # only as many nodes as the rate allows are added
+        self._signal_scaleup(cluster_id, data=signal)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 2)
+
+        self._signal_scaleup(cluster_id, data=signal)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 2)
+        autoscaler = self._get_autoscaler(cluster_id, autoscaler_id)
+        self.assertEqual(autoscaler['rejected_signals'], 1)
+
+    @responses.activate
+    def test_autoscaler_node_count(self):
+        cluster_id = self._create_cluster()
+        autoscaler_id = self._create_autoscaler(
+            cluster_id, data=self.AUTOSCALER_DATA_SECOND_ZONE)
+        signal = dict(self.SCALE_SIGNAL_DATA_SECOND_ZONE,
+                      commonAnnotations={'node_count': '3'})
+
+        # the node count follows scaling, without counting the nodes
+        self._signal_scaleup(cluster_id, data=signal)
+        autoscaler = self._get_autoscaler(cluster_id, autoscaler_id)
+        self.assertEqual(autoscaler['node_count'], 3)
+        self._signal_scaledown(cluster_id,
+                               data=self.SCALE_SIGNAL_DATA_SECOND_ZONE)
+        autoscaler = self._get_autoscaler(cluster_id, autoscaler_id)
+        self.assertEqual(autoscaler['node_count'], 2)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 2)
+
+        # and nodes deleted directly
+        response = self.client.get(
+            reverse('clusterman:node-list', args=[cluster_id]))
+        node_id = next(n['id'] for n in response.data['results']
+                       if n['autoscaler'] == int(autoscaler_id))
+        url = reverse('clusterman:node-detail', args=[cluster_id, node_id])
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT,
+                         response.data)
+        autoscaler = self._get_autoscaler(cluster_id, autoscaler_id)
+        self.assertEqual(autoscaler['node_count'], 1)
+
+    @responses.activate
+    def test_failed_scale_down_keeps_nodes(self):
+        cluster_id = self._create_cluster()
+        autoscaler_id = self._create_autoscaler(
+            cluster_id, data=self.AUTOSCALER_DATA_SECOND_ZONE)
+        signal = dict(self.SCALE_SIGNAL_DATA_SECOND_ZONE,
+                      commonAnnotations={'node_count': '2'})
+        self._signal_scaleup(cluster_id, data=signal)
+
+        # the nodes are still counted in the group if they can't be removed
+        with patch('clusterman.cluster_templates.CMRancherTemplate.'
+                   'remove_node', side_effect=Exception("cloudlaunch down")):
+            self._signal_scaledown(cluster_id, data=signal)
+        autoscaler = self._get_autoscaler(cluster_id, autoscaler_id)
+        self.assertEqual(autoscaler['node_count'], 2)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 2)
+
+        # and can be removed later
+        self._signal_scaledown(cluster_id, data=signal)
+        autoscaler = self._get_autoscaler(cluster_id, autoscaler_id)
+        self.assertEqual(autoscaler['node_count'], 1)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 1)
+
+    def _list_nodes(self, cluster_id):
+        url = reverse('clusterman:node-list', args=[cluster_id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data['results']
+
+    @responses.activate
+    def test_standby_nodes(self):
+        cluster_id = self._create_cluster()
+        autoscaler_id = self._create_autoscaler(
+            cluster_id, data=dict(self.AUTOSCALER_DATA_SECOND_ZONE,
+                                  standby_nodes=1))
+
+        # a standby node is launched ahead of demand
+        autoscaler = self._get_autoscaler(cluster_id, autoscaler_id)
+        self.assertEqual(autoscaler['standby_count'], 1)
+        self.assertEqual(autoscaler['node_count'], 0)
+        standby = [n for n in self._list_nodes(cluster_id) if n['standby']]
+        self.assertEqual(len(standby), 1)
+        kubectl = self.mock_client.mockers[0].mock_kubectl
+        kubectl.nodes.append({
+            'metadata': {
+                'name': 'standby-node',
+                'labels': {'cloudman.org/node-name': standby[0]['name']}},
+            'spec': {
+                'unschedulable': True,
+                'taints': [{'key': 'cloudman.org/standby', 'value': 'true',
+                            'effect': 'NoSchedule'}]},
+            'status': {'addresses': []}
+        })
+
+        # scaling up brings it into service, and launches a replacement
+        self._signal_scaleup(cluster_id,
+                             data=self.SCALE_SIGNAL_DATA_SECOND_ZONE)
+        autoscaler = self._get_autoscaler(cluster_id, autoscaler_id)
+        self.assertEqual(autoscaler['node_count'], 1)
+        self.assertEqual(autoscaler['standby_count'], 1)
+        nodes = {n['id']: n for n in self._list_nodes(cluster_id)}
+        self.assertEqual(len(nodes), 2)
+        self.assertFalse(nodes[standby[0]['id']]['standby'])
+        self.assertEqual(kubectl.nodes[-1]['spec'], {'taints': []})
+
+        # standby nodes are not scaled down
+        self._signal_scaledown(cluster_id,
+                               data=self.SCALE_SIGNAL_DATA_SECOND_ZONE)
+        nodes = self._list_nodes(cluster_id)
+        self.assertEqual(len(nodes), 1)
+        self.assertTrue(nodes[0]['standby'])
+
+    @responses.activate
+    def test_standby_node_not_registered(self):
+        GlobalSettings().settings.standby_activation_timeout = 0
+        cluster_id = self._create_cluster()
+        autoscaler_id = self._create_autoscaler(
+            cluster_id, data=dict(self.AUTOSCALER_DATA_SECOND_ZONE,
+                                  standby_nodes=1))
+        standby = [n for n in self._list_nodes(cluster_id) if n['standby']]
+
+        # a standby node which never registers goes back to the pool
+        self._signal_scaleup(cluster_id,
+                             data=self.SCALE_SIGNAL_DATA_SECOND_ZONE)
+        autoscaler = self._get_autoscaler(cluster_id, autoscaler_id)
+        self.assertEqual(autoscaler['node_count'], 0)
+        self.assertEqual(autoscaler['standby_count'], 1)
+        nodes = self._list_nodes(cluster_id)
+        self.assertEqual([n['id'] for n in nodes], [standby[0]['id']])
+        self.assertTrue(nodes[0]['standby'])
+
+    @responses.activate
+    def test_scaling_routes_follow_autoscaler_changes(self):
+        cluster_id = self._create_cluster()
+        autoscaler_id = self._create_autoscaler(
+            cluster_id, data=self.AUTOSCALER_DATA_SECOND_ZONE)
+        self._signal_scaleup(cluster_id,
+                             data=self.SCALE_SIGNAL_DATA_SECOND_ZONE)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 1)
+
+        # once moved to another zone, the autoscaler no longer matches
+        url = reverse('clusterman:autoscaler-detail',
+                      args=[cluster_id, autoscaler_id])
+        response = self.client.patch(url, {'zone': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK,
+                         response.data)
+        self._signal_scaleup(cluster_id,
+                             data=self.SCALE_SIGNAL_DATA_SECOND_ZONE)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 1)
+        self.assertEqual(self._count_cluster_nodes(cluster_id), 2)
+
+    @responses.activate
+    def test_scaling_routes_survive_stale_cache(self):
+        cluster_id = self._create_cluster()
+        autoscaler_id = self._create_autoscaler(
+            cluster_id, data=self.AUTOSCALER_DATA_SECOND_ZONE)
+        self._signal_scaleup(cluster_id,
+                             data=self.SCALE_SIGNAL_DATA_SECOND_ZONE)
+        zone_id = CMAutoScaler.objects.get(id=autoscaler_id).zone_id
+
+        # a move made by another process leaves this process's cache as is
+        CMAutoScaler.objects.filter(id=autoscaler_id).update(zone=2)
+        self._signal_scaleup(cluster_id,
+                             data=self.SCALE_SIGNAL_DATA_SECOND_ZONE)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 1)
+
+        # and so does a move into a zone the cached table has not seen
+        CMAutoScaler.objects.filter(id=autoscaler_id).update(
+            zone=zone_id)
+        cache.set(autoscaler_routes_cache_key(cluster_id), {})
+        self._signal_scaleup(cluster_id,
+                             data=self.SCALE_SIGNAL_DATA_SECOND_ZONE)
+        self.assertEqual(
+            self._count_nodes_in_scale_group(cluster_id, autoscaler_id), 2)
+
     @responses.activate
     def test_scaling_within_zone_group(self):
         # create the parent cluster
@@ -811,7 +1443,7 @@ class CMClusterScaleSignalTests(CMClusterNodeTestBase):
         count = self._count_cluster_nodes(cluster_id)
         self.assertEqual(count, 0)
         response = self._signal_scaleup(cluster_id)
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
         count = self._count_cluster_nodes(cluster_id)
         self.assertEqual(count, 1)
 
@@ -824,7 +1456,7 @@ class CMClusterScaleSignalTests(CMClusterNodeTestBase):
         count = self._count_cluster_nodes(cluster_id)
         self.assertEqual(count, 1)
         response = self._signal_scaledown(cluster_id)
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
         count = self._count_cluster_nodes(cluster_id)
         self.assertEqual(count, 0)
 
@@ -869,7 +1501,7 @@ class CMClusterScaleSignalTests(CMClusterNodeTestBase):
         count = self._count_cluster_nodes(cluster_id)
         self.assertEqual(count, 0)
         response = self._signal_scaleup(cluster_id)
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.data)
         count = self._count_cluster_nodes(cluster_id)
         self.assertEqual(count, 1)
 
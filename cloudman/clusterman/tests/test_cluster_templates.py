@@ -0,0 +1,92 @@
+from unittest.mock import Mock
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from clusterman.cluster_templates import CMRancherTemplate
+from clusterman.clients.rancher import RancherClient
+from clusterman.exceptions import CMBatchCommandException
+
+from .fake_rancher import FakeRancher
+
+
+class CMRancherTemplateRemoveNodesTests(SimpleTestCase):
+
+    def setUp(self):
+        for cache in (RancherClient._sessions, RancherClient._node_indexes,
+                      RancherClient._breakers):
+            patcher = patch.dict(cache, clear=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.rancher = FakeRancher(nodes=[
+            {'id': f'c-abcd1:m-{i}', 'clusterId': 'c-abcd1',
+             'ipAddress': f'10.0.0.{i}'} for i in range(4)]).start()
+        self.addCleanup(self.rancher.stop)
+        cluster = Mock(id=1, connection_settings={'rancher_config': {
+            'rancher_url': self.rancher.url,
+            'rancher_api_key': 'token-bf4j5:sometoken',
+            'rancher_cluster_id': 'c-abcd1',
+            'rancher_project_id': 'c-abcd1:p-7zr5p'}})
+        self.context = Mock()
+        self.template = CMRancherTemplate(self.context, cluster)
+        self.nodes = [Mock(id=i) for i in range(3)]
+        patcher = patch.object(
+            CMRancherTemplate, '_get_node_ips',
+            side_effect=lambda node: {f'10.0.0.{node.id}'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.kube_client = Mock()
+        self.kube_client.nodes.list.return_value = [
+            {'metadata': {'name': f'node-{i}'},
+             'status': {'addresses': [{'type': 'InternalIP',
+                                       'address': f'10.0.0.{i}'}]}}
+            for i in range(4)]
+        patcher = patch('clusterman.cluster_templates.KubeClient',
+                        return_value=self.kube_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _count_requests(self, method):
+        return len([r for r in self.rancher.requests if r[0] == method])
+
+    def test_remove_nodes(self):
+        deletes_while_draining = []
+        self.kube_client.nodes.drain.side_effect = (
+            lambda node, timeout: deletes_while_draining.append(
+                self._count_requests("DELETE")))
+        self.template.remove_nodes(self.nodes)
+        # every node is drained before any is deleted from rancher
+        self.assertEqual(deletes_while_draining, [0, 0, 0])
+        self.assertEqual(
+            sorted(c[0][0]['metadata']['name']
+                   for c in self.kube_client.nodes.drain.call_args_list),
+            ['node-0', 'node-1', 'node-2'])
+        self.assertEqual(self._count_requests("DELETE"), 3)
+        # one listing to find the nodes, and one to see them gone
+        self.assertEqual(self._count_requests("GET"), 2)
+        self.assertEqual([n['id'] for n in self.rancher.nodes],
+                         ['c-abcd1:m-3'])
+        self.assertEqual(
+            self.context.cloudlaunch_client.deployments.tasks.create
+            .call_count, 3)
+
+    def test_remove_nodes_after_drain_failure(self):
+        self.kube_client.nodes.drain.side_effect = Exception("timed out")
+        self.template.remove_nodes(self.nodes)
+        self.assertEqual(self._count_requests("DELETE"), 3)
+        self.assertEqual(
+            self.context.cloudlaunch_client.deployments.tasks.create
+            .call_count, 3)
+
+    def test_remove_nodes_deployment_failure(self):
+        def create(action, deployment_pk):
+            if deployment_pk == self.nodes[1].deployment.pk:
+                raise Exception("cloudlaunch down")
+            return deployment_pk
+
+        self.context.cloudlaunch_client.deployments.tasks.create.side_effect \
+            = create
+        with self.assertRaises(CMBatchCommandException) as context:
+            self.template.remove_nodes(self.nodes)
+        self.assertEqual([item for _, item, _ in context.exception.failures],
+                         [self.nodes[1]])
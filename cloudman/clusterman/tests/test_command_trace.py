@@ -0,0 +1,67 @@
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from clusterman.clients import helpers
+from clusterman.exceptions import CMRunCommandException
+
+from .client_mocker import ClientMocker
+from .command_trace import CommandRecorder
+from .command_trace import ReplayMocker
+
+
+class CommandTraceTests(SimpleTestCase):
+
+    COMMANDS = [
+        [sys.executable, "-c", "print('NAME\\tSTATUS\\nns1\\tActive')"],
+        [sys.executable, "-c", "print('items: []')"],
+    ]
+    FAILING_COMMAND = [sys.executable, "-c", "import sys; sys.exit('fail')"]
+
+    def setUp(self):
+        fd, self.trace_file = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self.addCleanup(os.remove, self.trace_file)
+
+    def _record(self):
+        with CommandRecorder(self.trace_file):
+            list_output = helpers.run_list_command(self.COMMANDS[0])
+            yaml_output = list(helpers.iter_yaml_command(self.COMMANDS[1]))
+            with self.assertRaises(CMRunCommandException):
+                helpers.run_command(self.FAILING_COMMAND)
+        return list_output, yaml_output
+
+    def test_record_and_replay(self):
+        list_output, yaml_output = self._record()
+        replay = ReplayMocker(self.trace_file)
+        ClientMocker(self, mockers=[replay])
+        self.assertEqual(helpers.run_list_command(self.COMMANDS[0]),
+                         list_output)
+        self.assertEqual(list(helpers.iter_yaml_command(self.COMMANDS[1])),
+                         yaml_output)
+        with self.assertRaisesRegex(CMRunCommandException, "fail"):
+            helpers.run_command(self.FAILING_COMMAND)
+        self.assertEqual(replay.call_count, 3)
+        self.assertEqual(replay.count_calls(prog=sys.executable), 3)
+
+    def test_replay_with_latency(self):
+        self._record()
+        replay = ReplayMocker(self.trace_file, latency_factor=0.5)
+        ClientMocker(self, mockers=[replay])
+        entry = replay.recordings[tuple(self.COMMANDS[0])][0]
+        self.assertGreater(entry['latency'], 0)
+        with patch('clusterman.tests.command_trace.time.sleep') as sleep:
+            helpers.run_command(self.COMMANDS[0])
+        sleep.assert_called_once_with(entry['latency'] * 0.5)
+        self.assertEqual(replay.call_count, 1)
+
+    def test_replay_without_latency(self):
+        self._record()
+        replay = ReplayMocker(self.trace_file)
+        ClientMocker(self, mockers=[replay])
+        with patch('clusterman.tests.command_trace.time.sleep') as sleep:
+            helpers.run_command(self.COMMANDS[0])
+        sleep.assert_not_called()
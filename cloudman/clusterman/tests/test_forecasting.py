@@ -0,0 +1,85 @@
+from datetime import datetime
+from datetime import timedelta
+
+from django.test import SimpleTestCase
+
+from clusterman import forecasting
+
+
+class ForecastingTests(SimpleTestCase):
+
+    NOW = datetime(2020, 1, 8, 8, 45)
+
+    def _workshop(self, days_ago, nodes=4, start_hour=9, end_hour=12):
+        day = self.NOW - timedelta(days=days_ago)
+        return [
+            (day.replace(hour=start_hour, minute=0), 'up', nodes, True),
+            (day.replace(hour=end_hour, minute=0), 'down', nodes, True),
+        ]
+
+    def test_node_history(self):
+        events = self._workshop(1) + [(self.NOW - timedelta(minutes=5),
+                                       'up', 1, False)]
+        initial, history = forecasting.node_history(3, events)
+        self.assertEqual(initial, 2)
+        self.assertEqual([count for _, count, _ in history], [6, 2, 3])
+        # the last event was not a response to demand
+        self.assertEqual([demand for _, _, demand in history], [6, 2, 2])
+
+    def test_peak_demand(self):
+        initial, history = forecasting.node_history(0, self._workshop(1))
+        start = self.NOW - timedelta(days=1)
+        self.assertEqual(forecasting.peak_demand(
+            initial, history, start, start + timedelta(hours=1)), 4)
+        self.assertEqual(forecasting.peak_demand(
+            initial, history, start - timedelta(hours=2),
+            start - timedelta(hours=1)), 0)
+        # already running at the start of the window
+        self.assertEqual(forecasting.peak_demand(
+            initial, history, start + timedelta(hours=1),
+            start + timedelta(hours=2)), 4)
+
+    def test_daily_forecast(self):
+        events = []
+        for days_ago in range(1, 8):
+            events += self._workshop(days_ago)
+        self.assertEqual(forecasting.forecast_nodes(0, events, self.NOW), 4)
+        # nothing happens in the afternoon
+        self.assertEqual(forecasting.forecast_nodes(
+            0, events, self.NOW + timedelta(hours=5)), 0)
+
+    def test_one_off_bursts_ignored(self):
+        events = self._workshop(1) + self._workshop(2)
+        self.assertEqual(forecasting.forecast_nodes(0, events, self.NOW), 0)
+
+    def test_weekly_forecast(self):
+        events = []
+        for weeks_ago in range(1, 5):
+            events += self._workshop(7 * weeks_ago, nodes=10)
+        self.assertEqual(forecasting.forecast_nodes(
+            0, events, self.NOW, period=forecasting.WEEKLY), 10)
+        self.assertEqual(forecasting.forecast_nodes(
+            0, events, self.NOW + timedelta(days=1),
+            period=forecasting.WEEKLY), 0)
+
+    def test_no_history(self):
+        self.assertIsNone(forecasting.forecast_nodes(2, [], self.NOW))
+        self.assertIsNone(forecasting.forecast_nodes(
+            2, [(self.NOW, 'up', 2, False)], self.NOW))
+
+    def test_other_events_count_towards_history(self):
+        events = []
+        for days_ago in range(1, 8):
+            day = self.NOW - timedelta(days=days_ago)
+            events += [
+                (day.replace(hour=9, minute=0), 'up', 4, True),
+                (day.replace(hour=9, minute=20), 'down', 4, True),
+                # scaled ahead of a forecast, between signals
+                (day.replace(hour=9, minute=30), 'up', 6, False),
+                (day.replace(hour=9, minute=40), 'down', 6, False),
+                (day.replace(hour=9, minute=50), 'up', 2, True),
+                (day.replace(hour=10, minute=30), 'down', 2, True),
+            ]
+        # nodes still running after scaling ahead of this morning's demand
+        events.append((self.NOW - timedelta(minutes=10), 'up', 3, False))
+        self.assertEqual(forecasting.forecast_nodes(3, events, self.NOW), 4)
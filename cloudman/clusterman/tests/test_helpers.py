@@ -0,0 +1,96 @@
+import sys
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from clusterman.clients import helpers
+from clusterman.exceptions import CMBatchCommandException
+from clusterman.exceptions import CMRunCommandException
+
+
+def python_command(script):
+    return [sys.executable, "-c", script]
+
+
+class StreamingCommandTests(SimpleTestCase):
+
+    LIST_SCRIPT = ("print('NAME\\tSTATUS')\n"
+                   "for i in range(3):\n"
+                   "    print(f'ns{i}\\tActive')")
+
+    YAML_SCRIPT = ("print('a: 1')\n"
+                   "print('---')\n"
+                   "print('b: [1, 2]')")
+
+    def test_stream_command(self):
+        lines = list(helpers.stream_command(python_command("print('x\\ny')")))
+        self.assertEqual(lines, ["x\n", "y\n"])
+
+    def test_stream_command_error(self):
+        command = python_command(
+            "import sys; sys.stderr.write('boom'); sys.exit(1)")
+        with self.assertRaisesRegex(CMRunCommandException, "boom"):
+            list(helpers.stream_command(command))
+
+    def test_stream_command_stopped_early(self):
+        command = python_command("while True: print('line')")
+        stream = helpers.stream_command(command)
+        self.assertEqual(next(stream), "line\n")
+        # closing the generator must kill the child rather than hang
+        stream.close()
+
+    def test_iter_list_command(self):
+        rows = helpers.iter_list_command(python_command(self.LIST_SCRIPT))
+        self.assertEqual(next(rows), {'NAME': 'ns0', 'STATUS': 'Active'})
+        self.assertEqual(len(list(rows)), 2)
+
+    def test_iter_list_command_matches_run_list_command(self):
+        command = python_command(self.LIST_SCRIPT)
+        self.assertEqual(list(helpers.iter_list_command(command)),
+                         helpers.run_list_command(command))
+
+    def test_iter_yaml_command(self):
+        docs = list(helpers.iter_yaml_command(
+            python_command(self.YAML_SCRIPT)))
+        self.assertEqual(docs, [{'a': 1}, {'b': [1, 2]}])
+
+
+class BatchCommandTests(SimpleTestCase):
+
+    def test_run_batch_command_preserves_order(self):
+        commands = [python_command(
+            f"import time; time.sleep({0.05 * (3 - i)}); print({i})")
+            for i in range(4)]
+        self.assertEqual(helpers.run_batch_command(commands, parser=int),
+                         [0, 1, 2, 3])
+
+    def test_run_batch_command_aggregates_failures(self):
+        commands = [python_command("print('ok')"),
+                    python_command("import sys; sys.exit('first')"),
+                    python_command("import sys; sys.exit('second')")]
+        with self.assertRaises(CMBatchCommandException) as context:
+            helpers.run_batch_command(commands)
+        e = context.exception
+        self.assertEqual([index for index, _, _ in e.failures], [1, 2])
+        self.assertEqual(e.results, ["ok\n", None, None])
+        self.assertIn("second", str(e))
+
+    def test_run_batch_bounded_workers(self):
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def double(x):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return x * 2
+
+        results = helpers.run_batch(double, range(20), max_workers=3)
+        self.assertEqual(results, [x * 2 for x in range(20)])
+        self.assertLessEqual(peak[0], 3)
+        self.assertGreater(peak[0], 1)
@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from clusterman import models
+from clusterman import yaml_codec
+
+from .test_cluster_api import load_cluster_data
+
+
+class CMClusterModelTests(TestCase):
+
+    SETTINGS = {'app_config': {'config_cloudlaunch': {'vmType': 'm1.small'}}}
+
+    def _create_cluster(self):
+        cluster = models.CMCluster(name='testcluster',
+                                   cluster_type='KUBE_RANCHER')
+        cluster.connection_settings = self.SETTINGS
+        return cluster
+
+    def test_connection_settings_parsed_once(self):
+        cluster = self._create_cluster()
+        with patch('clusterman.yaml_codec.safe_load',
+                   wraps=yaml_codec.safe_load) as safe_load:
+            self.assertEqual(cluster.connection_settings, self.SETTINGS)
+            self.assertEqual(cluster.default_vm_type, 'm1.small')
+            self.assertEqual(cluster.connection_settings, self.SETTINGS)
+        self.assertEqual(safe_load.call_count, 1)
+
+    def test_connection_settings_setter_invalidates_cache(self):
+        cluster = self._create_cluster()
+        self.assertEqual(cluster.default_vm_type, 'm1.small')
+        cluster.connection_settings = {
+            'app_config': {'config_cloudlaunch': {'vmType': 'm1.large'}}}
+        self.assertEqual(cluster.default_vm_type, 'm1.large')
+
+    def test_refresh_from_db_invalidates_cache(self):
+        cluster = self._create_cluster()
+        cluster.save()
+        self.assertEqual(cluster.default_vm_type, 'm1.small')
+        other = models.CMCluster.objects.get(id=cluster.id)
+        other.connection_settings = {}
+        other.save()
+        cluster.refresh_from_db()
+        self.assertEqual(cluster.connection_settings, {})
+
+
+class CMClusterDefaultZoneTests(TestCase):
+
+    fixtures = ['initial_test_data.json']
+
+    def setUp(self):
+        self.cluster = models.CMCluster.objects.create(
+            name='testcluster', cluster_type='KUBE_RANCHER',
+            connection_settings=load_cluster_data())
+
+    def test_default_zone_stored_on_save(self):
+        self.assertIsNotNone(self.cluster._default_zone_id)
+        self.assertEqual(self.cluster.default_zone,
+                         self.cluster._resolve_default_zone())
+
+    def test_default_zone_select_related(self):
+        cluster = models.CMCluster.objects.select_related(
+            '_default_zone__region__cloud').get(id=self.cluster.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(cluster.default_zone.region.cloud.id,
+                             self.cluster.default_zone.region.cloud.id)
+
+    def test_default_zone_resynced_on_settings_change(self):
+        settings = load_cluster_data()
+        settings['cloud_config']['target']['target_zone']['zone_id'] = 'none'
+        self.cluster.connection_settings = settings
+        self.cluster.save()
+        self.assertIsNone(self.cluster._default_zone_id)
+        with self.assertRaises(models.cb_models.Zone.DoesNotExist):
+            self.cluster.default_zone
+
+    def test_default_zone_not_resolved_when_settings_unchanged(self):
+        cluster = models.CMCluster.objects.get(id=self.cluster.id)
+        with patch.object(models.CMCluster, '_resolve_default_zone') as resolve:
+            cluster.autoscale = False
+            cluster.save()
+        resolve.assert_not_called()
+
+    def test_default_zone_with_malformed_settings(self):
+        self.cluster.connection_settings = {'cloud_config': {'target': 'x'}}
+        self.cluster.save()
+        self.assertIsNone(self.cluster._default_zone_id)
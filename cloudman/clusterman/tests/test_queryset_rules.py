@@ -0,0 +1,148 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from django.test import SimpleTestCase
+
+import rules
+
+from clusterman import queryset_rules
+from clusterman import rules as cluster_rules  # noqa: F401 registers filters
+from projman import rules as project_rules  # noqa: F401 registers filters
+
+
+class FakeUser(object):
+
+    def __init__(self, is_staff=False, is_authenticated=True, perms=()):
+        self.is_staff = is_staff
+        self.is_active = True
+        self.is_authenticated = is_authenticated
+        self.perms = set(perms)
+
+    def has_perm(self, perm, obj=None):
+        # model permissions, then rules, as with the configured backends
+        return perm in self.perms or rules.has_perm(perm, self, obj)
+
+
+class FakeQuerySet(list):
+    """
+    A list which supports the queryset methods the filters use, so that
+    their results can be compared with per object checks.
+    """
+
+    def __init__(self, objects, model=None):
+        super().__init__(objects)
+        self.model = model
+
+    def all(self):
+        return self
+
+    def none(self):
+        return FakeQuerySet([], self.model)
+
+    def filter(self, **lookups):
+        def matches(obj):
+            for lookup, value in lookups.items():
+                if lookup.endswith('__in'):
+                    if getattr(obj, lookup[:-len('__in')]) not in value:
+                        return False
+                elif getattr(obj, lookup) != value:
+                    return False
+            return True
+        return FakeQuerySet(filter(matches, self), self.model)
+
+
+class QuerysetRulesTests(SimpleTestCase):
+
+    AUTOSCALE_PERMS = ('clusterman.view_cmcluster',
+                       'clusterman.add_cmclusternode',
+                       'clusterman.delete_cmclusternode')
+
+    def setUp(self):
+        self.queryset = MagicMock()
+
+    def _filter(self, user, name):
+        return queryset_rules.filter_queryset(user, name, self.queryset)
+
+    def test_staff_sees_all_clusters(self):
+        result = self._filter(FakeUser(is_staff=True), 'clusters.view_cluster')
+        self.assertIs(result, self.queryset)
+
+    def test_autoscale_user_sees_all_clusters(self):
+        result = self._filter(FakeUser(perms=self.AUTOSCALE_PERMS),
+                              'clusters.view_cluster')
+        self.assertIs(result, self.queryset)
+
+    def test_other_users_see_no_clusters(self):
+        result = self._filter(FakeUser(perms=self.AUTOSCALE_PERMS[:2]),
+                              'clusters.view_cluster')
+        self.assertIs(result, self.queryset.none.return_value)
+
+    def test_other_users_see_no_nodes(self):
+        result = self._filter(FakeUser(), 'clusternodes.view_clusternode')
+        self.assertIs(result, self.queryset.filter.return_value)
+        # nodes are limited to viewable clusters, of which there are none
+        clusters = self.queryset.filter.call_args[1]['cluster__in']
+        self.assertIs(clusters, self.queryset.model._meta.get_field()
+                      .related_model.objects.all().none())
+
+    def test_anonymous_users_see_no_projects(self):
+        user = FakeUser(is_authenticated=False)
+        self.assertIs(self._filter(user, 'projman.view_project'),
+                      self.queryset.none.return_value)
+
+    def test_fallback_to_object_checks(self):
+        user = MagicMock()
+        user.has_perm.side_effect = lambda perm, obj: obj % 2 == 0
+        self.assertFalse(queryset_rules.has_filter('test.custom'))
+        self.assertEqual(
+            queryset_rules.filter_objects(user, 'test.custom', range(5)),
+            [0, 2, 4])
+
+    def test_add_filter(self):
+        queryset_rules.add_filter('test.custom', lambda user, qs: qs[:1])
+        self.addCleanup(queryset_rules.remove_filter, 'test.custom')
+        self.assertEqual(
+            queryset_rules.filter_objects(None, 'test.custom', [1, 2]), [1])
+
+
+class QuerysetRulesConsistencyTests(SimpleTestCase):
+    """
+    Checks that each registered filter selects exactly the objects which
+    the permission's rule allows, for the same users and objects.
+    """
+
+    def setUp(self):
+        owner = FakeUser()
+        self.users = [
+            FakeUser(is_staff=True),
+            FakeUser(perms=QuerysetRulesTests.AUTOSCALE_PERMS),
+            FakeUser(perms=QuerysetRulesTests.AUTOSCALE_PERMS[:2]),
+            owner,
+            FakeUser(is_authenticated=False),
+        ]
+        clusters = FakeQuerySet(
+            [SimpleNamespace(id=i) for i in range(2)])
+        node_model = SimpleNamespace(_meta=SimpleNamespace(
+            get_field=lambda name: SimpleNamespace(
+                related_model=SimpleNamespace(objects=clusters))))
+        nodes = FakeQuerySet(
+            [SimpleNamespace(id=i, cluster=clusters[i % 2])
+             for i in range(4)], model=node_model)
+        projects = FakeQuerySet(
+            [SimpleNamespace(id=i, owner=owner if i else FakeUser())
+             for i in range(3)])
+        self.querysets = {
+            'clusters.view_cluster': clusters,
+            'clusternodes.view_clusternode': nodes,
+            'projman.view_project': projects,
+        }
+
+    def test_filters_match_rules(self):
+        for perm, queryset in self.querysets.items():
+            self.assertTrue(queryset_rules.has_filter(perm), perm)
+            for user in self.users:
+                with self.subTest(perm=perm, user=vars(user)):
+                    self.assertEqual(
+                        queryset_rules.filter_queryset(user, perm, queryset),
+                        [obj for obj in queryset
+                         if rules.has_perm(perm, user, obj)])
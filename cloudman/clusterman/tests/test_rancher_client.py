@@ -0,0 +1,391 @@
+import re
+import threading
+import time
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+import responses
+
+import tenacity
+
+from clusterman.clients.rancher import CircuitBreaker
+from clusterman.clients.rancher import RancherClient
+from clusterman.exceptions import CMBatchCommandException
+from clusterman.exceptions import CMRancherCircuitOpenException
+from clusterman.exceptions import CMRancherUnavailableException
+
+from .fake_rancher import FakeRancher
+
+
+class RancherClientTestBase(SimpleTestCase):
+
+    RANCHER_URL = 'https://127.0.0.1:4430'
+
+    def setUp(self):
+        # Don't share pooled sessions or cached tokens between tests
+        for cache in (RancherClient._sessions,
+                      RancherClient._registration_commands,
+                      RancherClient._registration_locks,
+                      RancherClient._node_indexes,
+                      RancherClient._node_index_locks,
+                      RancherClient._breakers):
+            patcher = patch.dict(cache, clear=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _create_client(self, **kwargs):
+        return RancherClient(self.RANCHER_URL, 'token-bf4j5:sometoken',
+                             'c-abcd1', 'c-abcd1:p-7zr5p', **kwargs)
+
+
+class RancherSessionTests(RancherClientTestBase):
+
+    def test_session_shared_per_endpoint(self):
+        client1 = self._create_client()
+        client2 = self._create_client()
+        self.assertIs(client1.session, client2.session)
+        other = RancherClient('https://10.0.0.1', 'token-other:key',
+                              'c-abcd1', 'c-abcd1:p-7zr5p')
+        self.assertIsNot(client1.session, other.session)
+
+    def test_pool_size(self):
+        client = self._create_client(pool_size=3)
+        adapter = client.session.get_adapter(self.RANCHER_URL)
+        self.assertEqual(adapter._pool_maxsize, 3)
+
+    def test_session_per_pool_size(self):
+        small = self._create_client(pool_size=3)
+        large = self._create_client(pool_size=20)
+        self.assertIsNot(small.session, large.session)
+        self.assertIs(small.session, self._create_client(pool_size=3).session)
+        for client, size in ((small, 3), (large, 20)):
+            adapter = client.session.get_adapter(self.RANCHER_URL)
+            self.assertEqual(adapter._pool_maxsize, size)
+
+    @responses.activate
+    def test_api_calls_use_session_and_timeout(self):
+        responses.add(responses.POST,
+                      f'{self.RANCHER_URL}/v3/clusterregistrationtoken',
+                      json={'nodeCommand': 'docker run rancher'}, status=200)
+        client = self._create_client(timeout=[2, 10])
+        with patch.object(client.session, 'request',
+                          wraps=client.session.request) as request:
+            self.assertEqual(client.get_cluster_registration_command(),
+                             'docker run rancher')
+        self.assertEqual(request.call_args[1]['timeout'], (2, 10))
+        self.assertEqual(responses.calls[0].request.headers['authorization'],
+                         'Bearer token-bf4j5:sometoken')
+
+
+class RancherRegistrationCommandTests(RancherClientTestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.token_url = f'{self.RANCHER_URL}/v3/clusterregistrationtoken'
+
+    def _add_token_response(self, command):
+        responses.add(responses.POST, self.token_url,
+                      json={'nodeCommand': command}, status=200)
+
+    @responses.activate
+    def test_command_is_cached(self):
+        self._add_token_response('docker run rancher --token 1')
+        commands = [self._create_client().get_cluster_registration_command()
+                    for _ in range(10)]
+        self.assertEqual(set(commands), {'docker run rancher --token 1'})
+        self.assertEqual(len(responses.calls), 1)
+
+    @responses.activate
+    def test_refresh_and_invalidate(self):
+        self._add_token_response('docker run rancher --token 1')
+        client = self._create_client()
+        client.get_cluster_registration_command()
+        client.get_cluster_registration_command(refresh=True)
+        self.assertEqual(len(responses.calls), 2)
+        client.invalidate_registration_command()
+        client.get_cluster_registration_command()
+        self.assertEqual(len(responses.calls), 3)
+
+    @responses.activate
+    def test_command_expires(self):
+        self._add_token_response('docker run rancher --token 1')
+        client = self._create_client(registration_ttl=60)
+        with patch('clusterman.clients.rancher.time.monotonic',
+                   return_value=1000):
+            client.get_cluster_registration_command()
+            client.get_cluster_registration_command()
+        self.assertEqual(len(responses.calls), 1)
+        with patch('clusterman.clients.rancher.time.monotonic',
+                   return_value=1061):
+            client.get_cluster_registration_command()
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_caching_disabled(self):
+        self._add_token_response('docker run rancher --token 1')
+        client = self._create_client(registration_ttl=0)
+        client.get_cluster_registration_command()
+        client.get_cluster_registration_command()
+        self.assertEqual(len(responses.calls), 2)
+
+    def test_clusters_do_not_block_each_other(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def api_post(client, url, data):
+            if data['clusterId'] == 'c-abcd1':
+                started.set()
+                release.wait(5)
+            return {'nodeCommand': f"docker run {data['clusterId']}"}
+
+        slow = self._create_client()
+        fast = RancherClient(self.RANCHER_URL, 'token-bf4j5:sometoken',
+                             'c-efgh2', 'c-efgh2:p-7zr5p')
+        with patch.object(RancherClient, '_api_post', autospec=True,
+                          side_effect=api_post):
+            thread = threading.Thread(
+                target=slow.get_cluster_registration_command)
+            thread.start()
+            self.addCleanup(thread.join)
+            self.addCleanup(release.set)
+            self.assertTrue(started.wait(5))
+            # served while the other cluster's request is still in flight
+            self.assertEqual(fast.get_cluster_registration_command(),
+                             'docker run c-efgh2')
+            release.set()
+            thread.join()
+
+
+class RancherNodeLookupTests(RancherClientTestBase):
+
+    NODES_URL = 'https://127.0.0.1:4430/v3/nodes/?clusterId=c-abcd1'
+
+    def _node(self, index, external=False):
+        return {'id': f'c-abcd1:m-{index}',
+                'ipAddress': f'10.0.0.{index}',
+                'externalIpAddress': f'54.0.0.{index}' if external else None}
+
+    def _add_pages(self, nodes, page_size):
+        pages = [nodes[i:i + page_size]
+                 for i in range(0, len(nodes), page_size)]
+        for number, page in enumerate(pages):
+            body = {'data': page, 'pagination': {}}
+            if number + 1 < len(pages):
+                body['pagination']['next'] = (
+                    f'{self.RANCHER_URL}/v3/nodes?marker={number + 1}')
+            url = (self.NODES_URL if number == 0 else
+                   f'{self.RANCHER_URL}/v3/nodes?marker={number}')
+            responses.add(responses.GET, url, json=body, status=200)
+
+    @responses.activate
+    def test_get_nodes_follows_pagination(self):
+        nodes = [self._node(i) for i in range(7)]
+        self._add_pages(nodes, page_size=3)
+        self.assertEqual(list(self._create_client().get_nodes()), nodes)
+        self.assertEqual(len(responses.calls), 3)
+
+    @responses.activate
+    def test_find_node_uses_filters(self):
+        node = self._node(5, external=True)
+        responses.add(responses.GET, f'{self.NODES_URL}&ipAddress=54.0.0.5',
+                      json={'data': []}, status=200)
+        responses.add(responses.GET,
+                      f'{self.NODES_URL}&externalIpAddress=54.0.0.5',
+                      json={'data': [node]}, status=200)
+        self.assertEqual(self._create_client().find_node('54.0.0.5'),
+                         node['id'])
+
+    @responses.activate
+    def test_find_node_ignores_unfiltered_results(self):
+        responses.add(responses.GET, re.compile(r'.*/v3/nodes/.*'),
+                      json={'data': [self._node(1)]}, status=200)
+        self.assertIsNone(self._create_client().find_node('10.0.0.9'))
+
+    @responses.activate
+    def test_find_nodes_uses_index(self):
+        nodes = [self._node(i, external=True) for i in range(5)]
+        self._add_pages(nodes, page_size=2)
+        client = self._create_client()
+        self.assertEqual(client.find_nodes(['10.0.0.1', '54.0.0.3']),
+                         {'10.0.0.1': 'c-abcd1:m-1',
+                          '54.0.0.3': 'c-abcd1:m-3'})
+        self.assertEqual(len(responses.calls), 3)
+        # served from the index without another listing
+        self.assertEqual(client.find_nodes(['10.0.0.4']),
+                         {'10.0.0.4': 'c-abcd1:m-4'})
+        self.assertEqual(len(responses.calls), 3)
+        # unknown IPs are served from the index too, until it expires
+        self.assertEqual(client.find_nodes(['10.0.0.9']), {'10.0.0.9': None})
+        self.assertEqual(len(responses.calls), 3)
+        with patch('clusterman.clients.rancher.time.monotonic',
+                   return_value=time.monotonic() + client.NODE_INDEX_TTL):
+            self.assertEqual(client.find_nodes(['10.0.0.9']),
+                             {'10.0.0.9': None})
+        self.assertEqual(len(responses.calls), 6)
+
+    def test_clusters_do_not_block_each_other(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def build_node_index(client):
+            if client.cluster_id == 'c-abcd1':
+                started.set()
+                release.wait(5)
+            return {'10.0.0.1': f'{client.cluster_id}:m-1'}
+
+        slow = self._create_client()
+        fast = RancherClient(self.RANCHER_URL, 'token-bf4j5:sometoken',
+                             'c-efgh2', 'c-efgh2:p-7zr5p')
+        with patch.object(RancherClient, '_build_node_index', autospec=True,
+                          side_effect=build_node_index):
+            thread = threading.Thread(target=slow.find_nodes,
+                                      args=(['10.0.0.1'],))
+            thread.start()
+            self.addCleanup(thread.join)
+            self.addCleanup(release.set)
+            self.assertTrue(started.wait(5))
+            # served while the other cluster's nodes are still being listed
+            self.assertEqual(fast.find_nodes(['10.0.0.1']),
+                             {'10.0.0.1': 'c-efgh2:m-1'})
+            release.set()
+            thread.join()
+
+
+class RancherResilienceTests(RancherClientTestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.rancher = FakeRancher(nodes=[
+            {'id': f'c-abcd1:m-{i}', 'clusterId': 'c-abcd1',
+             'ipAddress': f'10.0.0.{i}'} for i in range(3)]).start()
+        self.addCleanup(self.rancher.stop)
+        self.RANCHER_URL = self.rancher.url
+
+    def _create_client(self, **kwargs):
+        kwargs.setdefault('backoff', 0.01)
+        return super()._create_client(**kwargs)
+
+    def test_idempotent_calls_are_retried(self):
+        self.rancher.fail_requests = 2
+        self.assertEqual(self._create_client().find_node('10.0.0.1'),
+                         'c-abcd1:m-1')
+        self.assertEqual(len(self.rancher.requests), 3)
+
+    def test_retries_are_bounded(self):
+        self.rancher.fail_requests = 10
+        with self.assertRaises(CMRancherUnavailableException):
+            list(self._create_client(retries=2).get_nodes())
+        self.assertEqual(len(self.rancher.requests), 3)
+
+    def test_non_idempotent_calls_are_not_retried(self):
+        self.rancher.fail_requests = 1
+        with self.assertRaises(CMRancherUnavailableException):
+            self._create_client().get_cluster_registration_command()
+        self.assertEqual(len(self.rancher.requests), 1)
+
+    def test_timeout(self):
+        self.rancher.delay = 0.5
+        client = self._create_client(timeout=(1, 0.1), retries=0)
+        with self.assertRaises(CMRancherUnavailableException):
+            client.find_node('10.0.0.1')
+
+    def test_circuit_breaker(self):
+        client = self._create_client(retries=0)
+        self.rancher.fail_requests = RancherClient.FAILURE_THRESHOLD
+        for _ in range(RancherClient.FAILURE_THRESHOLD):
+            with self.assertRaises(CMRancherUnavailableException):
+                client.find_node('10.0.0.1')
+        self.assertEqual(client.circuit_breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(
+            RancherClient.circuit_states()[self.rancher.url]['state'],
+            CircuitBreaker.OPEN)
+        # fails fast without reaching rancher
+        requests_made = len(self.rancher.requests)
+        with self.assertRaises(CMRancherCircuitOpenException):
+            client.find_node('10.0.0.1')
+        self.assertEqual(len(self.rancher.requests), requests_made)
+        # after the reset timeout, a successful call closes the circuit
+        client.circuit_breaker.reset_timeout = 0
+        self.assertEqual(client.circuit_breaker.state,
+                         CircuitBreaker.HALF_OPEN)
+        self.assertEqual(client.find_node('10.0.0.1'), 'c-abcd1:m-1')
+        self.assertEqual(client.circuit_breaker.state, CircuitBreaker.CLOSED)
+
+    def test_circuit_reopens_on_half_open_failure(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        breaker.before_call()
+        breaker.reset_timeout = 60
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_circuit_allows_single_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.reset_timeout = 60
+        # other calls fail fast while the trial is in progress
+        with self.assertRaises(CMRancherCircuitOpenException):
+            breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.before_call()
+
+    def test_rancher_down(self):
+        self.rancher.stop()
+        with self.assertRaises(CMRancherUnavailableException):
+            self._create_client(retries=1).find_node('10.0.0.1')
+
+
+class RancherBulkDeleteTests(RancherClientTestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.rancher = FakeRancher(nodes=[
+            {'id': f'c-abcd1:m-{i}', 'clusterId': 'c-abcd1',
+             'ipAddress': f'10.0.0.{i}'} for i in range(8)],
+            removal_lag=2).start()
+        self.addCleanup(self.rancher.stop)
+        self.RANCHER_URL = self.rancher.url
+        self.node_ids = [f'c-abcd1:m-{i}' for i in range(6)]
+
+    def _count_requests(self, method):
+        return len([r for r in self.rancher.requests if r[0] == method])
+
+    def test_delete_nodes(self):
+        client = self._create_client()
+        client.delete_nodes(self.node_ids, poll_interval=0.01)
+        self.assertEqual(self._count_requests("DELETE"), 6)
+        # one listing per poll, no matter how many nodes are being removed:
+        # two while the nodes are still being removed, then one without them
+        self.assertEqual(self._count_requests("GET"), 3)
+        self.assertEqual([n['id'] for n in client.get_nodes()],
+                         ['c-abcd1:m-6', 'c-abcd1:m-7'])
+
+    def test_delete_nodes_concurrently(self):
+        self.rancher.delay = 0.2
+        start = time.monotonic()
+        self._create_client().delete_nodes(self.node_ids, wait=False)
+        self.assertLess(time.monotonic() - start, 0.2 * len(self.node_ids))
+        self.assertEqual(self._count_requests("DELETE"), 6)
+        self.assertEqual(self._count_requests("GET"), 0)
+
+    def test_delete_nodes_failure(self):
+        self.rancher.fail_requests = 1
+        client = self._create_client(retries=0)
+        with self.assertRaises(CMBatchCommandException) as context:
+            client.delete_nodes(self.node_ids)
+        self.assertEqual(len(context.exception.failures), 1)
+        self.assertEqual(self._count_requests("DELETE"), 6)
+
+    def test_delete_nodes_timeout(self):
+        self.rancher.removal_lag = 1000
+        with self.assertRaises(tenacity.RetryError):
+            self._create_client().delete_nodes(
+                self.node_ids, timeout=0.1, poll_interval=0.01)
+
+    def test_delete_no_nodes(self):
+        self._create_client().delete_nodes([])
+        self.assertEqual(self.rancher.requests, [])
@@ -0,0 +1,68 @@
+from django.test import SimpleTestCase
+
+from clusterman import reconciliation
+
+
+class ReconciliationTests(SimpleTestCase):
+
+    @staticmethod
+    def _db_node(node_id, *ips, settled=True):
+        return {'id': node_id, 'ips': set(ips), 'settled': settled}
+
+    @staticmethod
+    def _rancher_node(node_id, ip, name=None):
+        return {'id': node_id, 'ipAddress': ip, 'externalIpAddress': None,
+                'nodeName': name}
+
+    @staticmethod
+    def _kube_node(name, ip):
+        return {'metadata': {'name': name},
+                'status': {'addresses': [
+                    {'type': 'InternalIP', 'address': ip},
+                    {'type': 'Hostname', 'address': name}]}}
+
+    def test_in_sync(self):
+        report = reconciliation.diff(
+            [self._db_node(1, '1.1.1.1', '10.0.0.1')],
+            [self._rancher_node('r1', '10.0.0.1')],
+            [self._kube_node('k1', '10.0.0.1')])
+        self.assertEqual(report, {kind: []
+                                  for kind in reconciliation.DRIFT_KINDS})
+
+    def test_drift(self):
+        db_nodes = [
+            self._db_node(1, '10.0.0.1'),
+            self._db_node(2, '10.0.0.2'),
+            self._db_node(3, '10.0.0.3'),
+            # gone from both
+            self._db_node(4, '10.0.0.4'),
+            # still launching
+            self._db_node(5, settled=False),
+        ]
+        rancher_nodes = [
+            self._rancher_node('r1', '10.0.0.1'),
+            self._rancher_node('r2', '10.0.0.2'),
+            self._rancher_node('r6', '10.0.0.6'),
+            # matched by name, e.g. a control plane node
+            self._rancher_node('r7', '192.168.0.7', name='master'),
+        ]
+        kube_nodes = [
+            self._kube_node('k1', '10.0.0.1'),
+            self._kube_node('k3', '10.0.0.3'),
+            self._kube_node('k8', '10.0.0.8'),
+            self._kube_node('master', '10.0.0.7'),
+        ]
+        report = reconciliation.diff(db_nodes, rancher_nodes, kube_nodes)
+        self.assertEqual(report, {
+            'missing': [4],
+            'not_in_rancher': [3],
+            'not_in_kubernetes': [2],
+            'rancher_orphans': ['r6'],
+            'kubernetes_orphans': ['k8'],
+            'unmanaged': ['r7'],
+        })
+
+    def test_unsettled_nodes_not_missing(self):
+        report = reconciliation.diff(
+            [self._db_node(1, '10.0.0.1', settled=False)], [], [])
+        self.assertEqual(report['missing'], [])
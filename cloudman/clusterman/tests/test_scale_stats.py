@@ -0,0 +1,56 @@
+from datetime import datetime
+from datetime import timedelta
+
+from django.test import SimpleTestCase
+
+from clusterman import scale_stats
+
+
+class ScaleStatsTests(SimpleTestCase):
+
+    SINCE = datetime(2020, 1, 1)
+
+    def _event(self, minute, direction='up', outcome='succeeded', latency=10,
+               autoscaler_id=1, nodes=1):
+        requested = self.SINCE + timedelta(minutes=minute)
+        return {'autoscaler_id': autoscaler_id, 'direction': direction,
+                'outcome': outcome, 'nodes': nodes, 'requested': requested,
+                'completed': requested + timedelta(seconds=latency)}
+
+    def _summarize(self, events, minutes=120, window=3600):
+        return scale_stats.summarize(
+            events, self.SINCE, self.SINCE + timedelta(minutes=minutes),
+            window)
+
+    def test_percentile(self):
+        self.assertIsNone(scale_stats.percentile([], 50))
+        self.assertEqual(scale_stats.percentile([3, 1, 2], 50), 2)
+        self.assertEqual(scale_stats.percentile([1, 2, 3, 4], 50), 2.5)
+        self.assertEqual(scale_stats.percentile([1, 2, 3, 4], 100), 4)
+        self.assertEqual(scale_stats.percentile([5], 99), 5)
+
+    def test_events_grouped_by_window(self):
+        stats = self._summarize([
+            self._event(1, latency=10), self._event(2, latency=30),
+            self._event(70, direction='down', outcome='rejected')])
+        self.assertEqual(len(stats['windows']), 2)
+        first, second = stats['windows']
+        self.assertEqual(first['count'], 2)
+        self.assertEqual(first['directions'], {'up': 2, 'down': 0})
+        self.assertEqual(first['latency']['p50'], 20)
+        self.assertEqual(first['latency']['max'], 30)
+        self.assertEqual(second['outcomes']['rejected'], 1)
+        # only successful actions count towards latency
+        self.assertIsNone(second['latency']['p50'])
+        self.assertEqual(stats['total']['count'], 3)
+
+    def test_reversals_counted_per_autoscaler(self):
+        stats = self._summarize([
+            self._event(1), self._event(2, autoscaler_id=2, direction='down'),
+            self._event(3, direction='down'), self._event(4, direction='up'),
+            self._event(5, autoscaler_id=2, direction='down')])
+        self.assertEqual(stats['total']['reversals'], 2)
+
+    def test_windows_are_capped(self):
+        stats = self._summarize([], minutes=60 * 24 * 30, window=1)
+        self.assertEqual(len(stats['windows']), scale_stats.MAX_WINDOWS)
@@ -0,0 +1,85 @@
+from django.test import SimpleTestCase
+
+from clusterman import scaling_policies
+from clusterman.scaling_policies import DOWN
+from clusterman.scaling_policies import UP
+
+
+def make_signal(alerts=1, annotations=None, **common_annotations):
+    return {
+        'status': 'firing',
+        'alerts': [{'status': 'firing', 'labels': {},
+                    'annotations': dict(annotations or {})}
+                   for _ in range(alerts)],
+        'commonAnnotations': common_annotations
+    }
+
+
+class ScalingPolicyTests(SimpleTestCase):
+
+    def _desired(self, policy, current, direction, signal, count=1):
+        return scaling_policies.get_policy(policy).desired_nodes(
+            current, direction, signal, count=count)
+
+    def test_registry(self):
+        self.assertIn('step', scaling_policies.policy_names())
+        self.assertIsInstance(scaling_policies.get_policy(None),
+                              scaling_policies.StepPolicy)
+        with self.assertRaises(KeyError):
+            scaling_policies.get_policy('nonexistent')
+
+    def test_register(self):
+        @scaling_policies.register('test_double')
+        class DoublePolicy(scaling_policies.ScalingPolicy):
+            def desired_nodes(self, current, direction, signal, count=1):
+                return current * 2
+        self.addCleanup(scaling_policies._policies.pop, 'test_double')
+        self.assertEqual(self._desired('test_double', 3, UP, None), 6)
+
+    def test_step(self):
+        self.assertEqual(self._desired('step', 2, UP, make_signal()), 3)
+        self.assertEqual(self._desired('step', 2, UP, make_signal(), 4), 6)
+        self.assertEqual(self._desired('step', 2, DOWN, make_signal()), 1)
+
+    def test_alert_count(self):
+        self.assertEqual(self._desired('alerts', 2, UP, make_signal(3)), 5)
+        self.assertEqual(self._desired('alerts', 2, DOWN, make_signal(2)), 0)
+        self.assertEqual(self._desired('alerts', 2, UP, None), 3)
+
+    def test_pending_pods(self):
+        signal = make_signal(pending_pods="25")
+        self.assertEqual(self._desired('pending_pods', 1, UP, signal), 4)
+        signal = make_signal(pending_pods="25", pods_per_node="50")
+        self.assertEqual(self._desired('pending_pods', 1, UP, signal), 2)
+        # summed over alerts when not a common annotation
+        signal = make_signal(2, annotations={'pending_pods': "15"})
+        self.assertEqual(self._desired('pending_pods', 1, UP, signal), 4)
+        self.assertEqual(self._desired('pending_pods', 1, UP, make_signal()), 2)
+        self.assertEqual(self._desired('pending_pods', 3, DOWN, signal), 2)
+
+    def test_non_numeric_signal_value(self):
+        # templated annotations which did not render fall back to defaults
+        signal = make_signal(pending_pods="{{ $value }}")
+        with self.assertLogs('clusterman.scaling_policies', 'WARNING'):
+            self.assertEqual(
+                self._desired('pending_pods', 1, UP, signal), 2)
+        signal = make_signal(2, annotations={'pending_pods': "many"})
+        self.assertIsNone(
+            scaling_policies.get_signal_value(signal, 'pending_pods'))
+
+    def test_requested_cpu(self):
+        signal = make_signal(requested_cpu="5", cpus_per_node="4")
+        self.assertEqual(self._desired('cpu', 1, UP, signal), 3)
+        signal = make_signal(unused_cpu="9", cpus_per_node="4")
+        self.assertEqual(self._desired('cpu', 5, DOWN, signal), 3)
+        self.assertEqual(self._desired('cpu', 5, DOWN, make_signal()), 4)
+
+    def test_predictive(self):
+        self.assertEqual(self._desired('predictive', 2, UP, make_signal()), 3)
+        signal = make_signal(forecast_nodes="6")
+        self.assertEqual(self._desired('predictive', 2, UP, signal), 6)
+        self.assertEqual(self._desired('predictive', 2, UP, signal, 0), 6)
+        # does not scale down below the forecast
+        self.assertEqual(self._desired('predictive', 7, DOWN, signal), 6)
+        self.assertEqual(self._desired('predictive', 5, DOWN, signal), 6)
+        self.assertTrue(scaling_policies.get_policy('predictive').uses_forecast)
@@ -0,0 +1,77 @@
+from collections import namedtuple
+from datetime import datetime
+from datetime import time
+
+import pytz
+
+from django.test import SimpleTestCase
+
+from clusterman import schedules
+
+
+Schedule = namedtuple('Schedule', ['days', 'start_time', 'end_time',
+                                   'timezone', 'min_nodes', 'max_nodes'])
+
+
+class SchedulesTests(SimpleTestCase):
+
+    # A Wednesday
+    NOW = datetime(2020, 1, 8, 8, 30, tzinfo=pytz.utc)
+
+    def _schedule(self, start, end, days='*', tz='UTC', min_nodes=None,
+                  max_nodes=None):
+        return Schedule(days, time(*start), time(*end), tz, min_nodes,
+                        max_nodes)
+
+    def test_parse_days(self):
+        self.assertEqual(schedules.parse_days('*'), set(range(7)))
+        self.assertEqual(schedules.parse_days('1-5'), {0, 1, 2, 3, 4})
+        self.assertEqual(schedules.parse_days('mon-fri'), {0, 1, 2, 3, 4})
+        self.assertEqual(schedules.parse_days('0,7'), {6})
+        self.assertEqual(schedules.parse_days('sat,Sun'), {5, 6})
+        self.assertEqual(schedules.parse_days('fri-mon'), {4, 5, 6, 0})
+        self.assertEqual(schedules.parse_days('0-7'), set(range(7)))
+        self.assertEqual(schedules.parse_days('1-7'), set(range(7)))
+        self.assertEqual(schedules.parse_days('sat-7'), {5, 6})
+        self.assertEqual(schedules.parse_days('7-mon'), {6, 0})
+        for spec in ('8', 'mon-funday', '1-'):
+            with self.assertRaises(ValueError):
+                schedules.parse_days(spec)
+
+    def test_is_active(self):
+        self.assertTrue(schedules.is_active(
+            self._schedule((8, 0), (17, 0), days='mon-fri'), self.NOW))
+        self.assertFalse(schedules.is_active(
+            self._schedule((8, 0), (17, 0), days='sat,sun'), self.NOW))
+        self.assertFalse(schedules.is_active(
+            self._schedule((9, 0), (17, 0)), self.NOW))
+
+    def test_is_active_past_midnight(self):
+        # a window which started on Tuesday evening
+        self.assertTrue(schedules.is_active(
+            self._schedule((20, 0), (9, 0), days='tue'), self.NOW))
+        self.assertFalse(schedules.is_active(
+            self._schedule((20, 0), (9, 0), days='wed'), self.NOW))
+
+    def test_is_active_timezone(self):
+        # 8:30 UTC is 3:30 in New York
+        schedule = self._schedule((8, 0), (17, 0), tz='America/New_York')
+        self.assertFalse(schedules.is_active(schedule, self.NOW))
+        schedule = self._schedule((3, 0), (4, 0), tz='America/New_York')
+        self.assertTrue(schedules.is_active(schedule, self.NOW))
+        with self.assertRaises(ValueError):
+            schedules.parse_timezone('Mars/Olympus_Mons')
+
+    def test_get_limits(self):
+        windows = [
+            self._schedule((8, 0), (17, 0), min_nodes=3),
+            self._schedule((6, 0), (10, 0), min_nodes=5, max_nodes=4),
+            self._schedule((12, 0), (13, 0), min_nodes=10),
+        ]
+        self.assertEqual(schedules.get_limits([], 0, 10, self.NOW), (0, 10))
+        # the largest limits of the open windows apply, and max_nodes is
+        # raised to min_nodes
+        self.assertEqual(schedules.get_limits(windows, 0, 10, self.NOW),
+                         (5, 5))
+        self.assertEqual(schedules.get_limits(windows[:1], 0, 10, self.NOW),
+                         (3, 10))
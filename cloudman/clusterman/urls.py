@@ -11,6 +11,12 @@ from djcloudbridge.drf_routers import HybridNestedRouter
 router = HybridDefaultRouter()
 router.register(r'clusters', views.ClusterViewSet,
                 basename='clusters')
+router.register(r'signals/scaleup', views.ScaleUpSignalBatchViewSet,
+                basename='batchscaleupsignal')
+router.register(r'signals/scaledown', views.ScaleDownSignalBatchViewSet,
+                basename='batchscaledownsignal')
+router.register(r'rancher-circuits', views.RancherCircuitViewSet,
+                basename='ranchercircuit')
 
 cluster_router = HybridNestedRouter(router, r'clusters',
                                     lookup='cluster')
@@ -22,6 +28,21 @@ cluster_router.register(r'signals/scaleup', views.ClusterScaleUpSignalViewSet,
                         basename='scaleupsignal')
 cluster_router.register(r'signals/scaledown', views.ClusterScaleDownSignalViewSet,
                         basename='scaledownsignal')
+cluster_router.register(r'operations', views.ClusterScaleOperationViewSet,
+                        basename='operation')
+cluster_router.register(r'scale-events', views.ClusterScaleEventViewSet,
+                        basename='scaleevent')
+cluster_router.register(r'scale-stats', views.ClusterScaleStatsViewSet,
+                        basename='scalestats')
+cluster_router.register(r'reconcile-reports',
+                        views.ClusterReconcileReportViewSet,
+                        basename='reconcilereport')
+
+autoscaler_router = HybridNestedRouter(cluster_router, r'autoscalers',
+                                       lookup='autoscaler')
+autoscaler_router.register(r'schedules',
+                           views.ClusterAutoScalerScheduleViewSet,
+                           basename='schedule')
 
 
 app_name = "clusterman"
@@ -29,5 +50,6 @@ app_name = "clusterman"
 cluster_regex_pattern = r'^'
 urlpatterns = [
     url(r'^', include(router.urls)),
-    url(cluster_regex_pattern, include(cluster_router.urls))
+    url(cluster_regex_pattern, include(cluster_router.urls)),
+    url(cluster_regex_pattern, include(autoscaler_router.urls))
 ]
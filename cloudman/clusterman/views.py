@@ -1,14 +1,22 @@
 """CloudMan Create views."""
 from django.contrib.auth.models import User
+from django.db import transaction
 
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
+from rest_framework.permissions import IsAdminUser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import viewsets, mixins
+from rest_framework import status
+from rest_framework.response import Response
 
 from djcloudbridge import drf_helpers
+from . import alert_batches
 from . import serializers
+from . import tasks
 from .api import CloudManAPI
 from .api import CMServiceContext
+from .clients.rancher import RancherClient
+from .models import CMScaleOperation
 from .models import GlobalSettings
 
 
@@ -79,65 +87,305 @@ class ClusterAutoScalerViewSet(drf_helpers.CustomModelViewSet):
             return None
 
 
+class ClusterAutoScalerScheduleViewSet(drf_helpers.CustomModelViewSet):
+    """
+    Returns the time windows in which an autoscaler's min_nodes and
+    max_nodes are overridden.
+    """
+    permission_classes = (IsAuthenticated,)
+    # Required for the Browsable API renderer to have a nice form.
+    serializer_class = serializers.CMAutoScalerScheduleSerializer
+
+    def _get_autoscaler(self):
+        cluster = CloudManAPI.from_request(self.request).clusters.get(
+            self.kwargs["cluster_pk"])
+        if cluster:
+            return cluster.autoscalers.get(self.kwargs["autoscaler_pk"])
+        else:
+            return None
+
+    def list_objects(self):
+        autoscaler = self._get_autoscaler()
+        if autoscaler:
+            return autoscaler.schedules.list()
+        else:
+            return []
+
+    def get_object(self):
+        autoscaler = self._get_autoscaler()
+        if autoscaler:
+            return autoscaler.schedules.get(self.kwargs["pk"])
+        else:
+            return None
+
+
 class CustomCreateOnlyModelViewSet(drf_helpers.CustomNonModelObjectMixin,
                                    mixins.CreateModelMixin,
                                    viewsets.GenericViewSet):
     pass
 
 
-class ClusterScaleUpSignalViewSet(CustomCreateOnlyModelViewSet):
+class CustomReadOnlyModelViewSet(drf_helpers.CustomNonModelObjectMixin,
+                                 mixins.ListModelMixin,
+                                 mixins.RetrieveModelMixin,
+                                 viewsets.GenericViewSet):
+    pass
+
+
+class ClusterScaleSignalViewSet(CustomCreateOnlyModelViewSet):
     """
-    Reads and updates AutoScaler fields
-    Accepts GET, PUT, PATCH methods.
+    Accepts a Prometheus Alertmanager webhook, and queues a scale operation
+    in response, returning 202 with the operation's details. Subclasses
+    set the direction to scale in.
     """
     serializer_class = serializers.PrometheusWebHookSerializer
     permission_classes = (IsAuthenticated,)
     authentication_classes = [SessionAuthentication, BasicAuthentication]
+    direction = None
 
-    def perform_create(self, serializer):
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if self.is_resolved(serializer.validated_data):
+            return Response({'detail': "Ignoring resolved alerts."},
+                            status=status.HTTP_200_OK)
+        operation, created = self.perform_create(serializer)
+        data = serializers.CMScaleOperationSerializer(
+            operation, context=self.get_serializer_context()).data
+        # A signal coalesced into an earlier operation queues nothing new
+        return Response(data, status=(status.HTTP_202_ACCEPTED if created
+                                      else status.HTTP_200_OK))
+
+    @staticmethod
+    def is_resolved(data):
+        if data.get('status') == 'resolved':
+            return True
+        alerts = data.get('alerts')
+        return bool(alerts) and all(
+            alert.get('status') == 'resolved' for alert in alerts)
+
+    def get_count(self, data):
+        return 1
+
+    def get_autoscale_api(self):
         # first, check whether the current user has permissions to
         # autoscale
         cmapi = CloudManAPI.from_request(self.request)
         cmapi.check_permissions('autoscalers.can_autoscale')
         # If so, the remaining actions must be carried out as an impersonated user
         # whose profile contains the relevant cloud credentials, usually an admin
-        zone_name = serializer.validated_data.get(
-            'commonLabels', {}).get('availability_zone')
         impersonate = (User.objects.filter(
             username=GlobalSettings().settings.autoscale_impersonate).first()
                        or User.objects.filter(is_superuser=True).first())
-        cmapi = CloudManAPI(CMServiceContext(user=impersonate))
+        return CloudManAPI(CMServiceContext(user=impersonate))
+
+    def queue_operation(self, cluster, data, zone_name=None):
+        """
+        Queues a scale operation for a cluster in response to the webhook
+        payload data. Returns the operation, and whether it was created.
+        """
+        # Alertmanager re-sends the same alert group until it resolves, so
+        # repeats within the coalescing window share a single operation
+        operation, created = cluster.operations.get_or_create(
+            self.direction, zone_name=zone_name, count=self.get_count(data),
+            group_key=data.get('groupKey'), signal=data,
+            window=GlobalSettings().settings.get(
+                'autoscale_coalesce_window', as_type=int, default=60))
+        if created:
+            # Only queue the operation once it is visible to the workers
+            transaction.on_commit(
+                lambda: tasks.process_scale_operation.delay(operation.id))
+            operation.refresh_from_db()
+        return operation, created
+
+    def perform_create(self, serializer):
+        cmapi = self.get_autoscale_api()
+        zone_name = serializer.validated_data.get(
+            'commonLabels', {}).get('availability_zone')
+        # Permissions are checked up front, so that the caller gets a 403
+        # instead of a failed operation
         cluster = cmapi.clusters.get(self.kwargs["cluster_pk"])
+        return self.queue_operation(cluster, serializer.data,
+                                    zone_name=zone_name)
+
+
+class ClusterScaleUpSignalViewSet(ClusterScaleSignalViewSet):
+    direction = CMScaleOperation.DIRECTION_UP
+
+    def get_count(self, data):
+        # Alerts may ask for several nodes at once, e.g. through a templated
+        # annotation such as node_count: "{{ $value }}"
+        try:
+            return max(int((data.get('commonAnnotations') or {}).get(
+                'node_count', 1)), 1)
+        except (TypeError, ValueError):
+            return 1
+
+
+class ClusterScaleDownSignalViewSet(ClusterScaleSignalViewSet):
+    direction = CMScaleOperation.DIRECTION_DOWN
+
+
+class ScaleSignalBatchViewSet(ClusterScaleSignalViewSet):
+    """
+    Accepts a Prometheus Alertmanager webhook whose alerts may be for any
+    cluster, named by their cluster label, and queues one scale operation
+    per cluster and zone, returning 202 with the operations' details.
+    Alerts without a cluster label, and for clusters which do not exist,
+    are skipped. Subclasses set the direction to scale in.
+    """
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if self.is_resolved(serializer.validated_data):
+            return Response({'detail': "Ignoring resolved alerts."},
+                            status=status.HTTP_200_OK)
+        operations, created, skipped = self.perform_create(serializer)
+        data = {
+            'operations': serializers.CMScaleOperationSerializer(
+                operations, many=True,
+                context=self.get_serializer_context()).data,
+            'skipped': skipped,
+        }
+        return Response(data, status=(status.HTTP_202_ACCEPTED if created
+                                      else status.HTTP_200_OK))
+
+    def perform_create(self, serializer):
+        cmapi = self.get_autoscale_api()
+        groups, unlabelled = alert_batches.group_alerts(
+            serializer.data, cluster_label=GlobalSettings().settings.get(
+                'autoscale_cluster_label',
+                default=alert_batches.DEFAULT_CLUSTER_LABEL))
+        clusters = cmapi.clusters.find_by_names(
+            {cluster_name for cluster_name, _ in groups})
+        operations = []
+        any_created = False
+        skipped = {'unlabelled': unlabelled, 'unknown_clusters': []}
+        for (cluster_name, zone_name), data in groups.items():
+            cluster = clusters.get(cluster_name)
+            if not cluster:
+                if cluster_name not in skipped['unknown_clusters']:
+                    skipped['unknown_clusters'].append(cluster_name)
+                continue
+            operation, created = self.queue_operation(
+                cluster, data, zone_name=zone_name)
+            operations.append(operation)
+            any_created = any_created or created
+        return operations, any_created, skipped
+
+
+class ScaleUpSignalBatchViewSet(ScaleSignalBatchViewSet,
+                                ClusterScaleUpSignalViewSet):
+    pass
+
+
+class ScaleDownSignalBatchViewSet(ScaleSignalBatchViewSet,
+                                  ClusterScaleDownSignalViewSet):
+    pass
+
+
+class ClusterScaleOperationViewSet(CustomReadOnlyModelViewSet):
+    """
+    Returns the scale operations queued for a cluster, with their status
+    and timing.
+    """
+    permission_classes = (IsAuthenticated,)
+    serializer_class = serializers.CMScaleOperationSerializer
+
+    def list_objects(self):
+        cluster = CloudManAPI.from_request(self.request).clusters.get(
+            self.kwargs["cluster_pk"])
         if cluster:
-            return cluster.scaleup(zone_name=zone_name)
+            return cluster.operations.list()
+        else:
+            return []
+
+    def get_object(self):
+        cluster = CloudManAPI.from_request(self.request).clusters.get(
+            self.kwargs["cluster_pk"])
+        if cluster:
+            return cluster.operations.get(self.kwargs["pk"])
         else:
             return None
 
 
-class ClusterScaleDownSignalViewSet(CustomCreateOnlyModelViewSet):
+class ClusterScaleEventViewSet(CustomReadOnlyModelViewSet):
     """
-    Reads and updates AutoScaler fields
-    Accepts GET, PUT, PATCH methods.
+    Returns the scale actions carried out by a cluster's autoscalers, with
+    their outcome and timing.
     """
-    serializer_class = serializers.PrometheusWebHookSerializer
     permission_classes = (IsAuthenticated,)
-    authentication_classes = [SessionAuthentication, BasicAuthentication]
+    serializer_class = serializers.CMScaleEventSerializer
 
-    def perform_create(self, serializer):
-        # first, check whether the current user has permissions to
-        # autoscale
-        cmapi = CloudManAPI.from_request(self.request)
-        cmapi.check_permissions('autoscalers.can_autoscale')
-        # If so, the remaining actions must be carried out as an impersonated user
-        # whose profile contains the relevant cloud credentials, usually an admin
-        zone_name = serializer.validated_data.get(
-            'commonLabels', {}).get('availability_zone')
-        impersonate = (User.objects.filter(
-            username=GlobalSettings().settings.autoscale_impersonate).first()
-                       or User.objects.filter(is_superuser=True).first())
-        cmapi = CloudManAPI(CMServiceContext(user=impersonate))
-        cluster = cmapi.clusters.get(self.kwargs["cluster_pk"])
+    def list_objects(self):
+        cluster = CloudManAPI.from_request(self.request).clusters.get(
+            self.kwargs["cluster_pk"])
+        if cluster:
+            return cluster.events.list()
+        else:
+            return []
+
+    def get_object(self):
+        cluster = CloudManAPI.from_request(self.request).clusters.get(
+            self.kwargs["cluster_pk"])
         if cluster:
-            return cluster.scaledown(zone_name=zone_name)
+            return cluster.events.get(self.kwargs["pk"])
         else:
             return None
+
+
+class ClusterReconcileReportViewSet(CustomReadOnlyModelViewSet):
+    """
+    Returns the results of comparing the nodes on record for a cluster with
+    those in rancher and kubernetes, latest first, with counts of each kind
+    of drift found.
+    """
+    permission_classes = (IsAuthenticated,)
+    serializer_class = serializers.CMReconcileReportSerializer
+
+    def list_objects(self):
+        cluster = CloudManAPI.from_request(self.request).clusters.get(
+            self.kwargs["cluster_pk"])
+        if cluster:
+            return cluster.reconciliation.list()
+        else:
+            return []
+
+    def get_object(self):
+        cluster = CloudManAPI.from_request(self.request).clusters.get(
+            self.kwargs["cluster_pk"])
+        if cluster:
+            return cluster.reconciliation.get(self.kwargs["pk"])
+        else:
+            return None
+
+
+class ClusterScaleStatsViewSet(viewsets.ViewSet):
+    """
+    Returns counts and latency percentiles of a cluster's scale actions,
+    per time window. Accepts since, until and window (in seconds) query
+    parameters, and covers the last day, by the hour, by default.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def list(self, request, cluster_pk=None):
+        cluster = CloudManAPI.from_request(request).clusters.get(cluster_pk)
+        if not cluster:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        query = serializers.CMScaleStatsQuerySerializer(
+            data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(cluster.events.stats(**query.validated_data))
+
+
+class RancherCircuitViewSet(viewsets.ViewSet):
+    """
+    Returns the circuit breaker state of each rancher endpoint this process
+    has called, keyed by rancher url, for monitoring. Breakers are kept per
+    process, so this shows what the web server has seen. Staff only.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def list(self, request):
+        return Response(RancherClient.circuit_states())
@@ -0,0 +1,41 @@
+"""
+Central yaml load/dump functions for CloudMan.
+
+Uses the libyaml backed CSafeLoader/CSafeDumper when PyYAML was built with
+libyaml support, which is many times faster than the pure python
+implementation, and falls back to SafeLoader/SafeDumper otherwise. Only the
+safe loaders and dumpers are ever used.
+"""
+import yaml
+
+try:
+    from yaml import CSafeDumper as SafeDumper
+    from yaml import CSafeLoader as SafeLoader
+    LIBYAML_AVAILABLE = True
+except ImportError:
+    from yaml import SafeDumper
+    from yaml import SafeLoader
+    LIBYAML_AVAILABLE = False
+
+
+def safe_load(stream):
+    """
+    Parses the first yaml document in a string or stream.
+    """
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def safe_load_all(stream):
+    """
+    Lazily parses all yaml documents in a string or stream.
+    """
+    return yaml.load_all(stream, Loader=SafeLoader)
+
+
+def safe_dump(data, stream=None, default_flow_style=False, **kwargs):
+    """
+    Serializes data as block style yaml. Returns a string if no stream is
+    given, in the same way as yaml.dump.
+    """
+    return yaml.dump(data, stream=stream, Dumper=SafeDumper,
+                     default_flow_style=default_flow_style, **kwargs)
@@ -166,6 +166,9 @@ class HMChartService(HelmsManService):
     def list(self, namespace=None):
         client = HelmClient()
         releases = client.releases.list(namespace)
+        values = client.releases.get_values_batch(
+            [(release.get("NAMESPACE"), release.get("NAME"))
+             for release in releases], get_all=True)
         charts = (
             HelmChart(
                 self,
@@ -177,10 +180,9 @@ class HMChartService(HelmsManService):
                 app_version=release.get("APP VERSION"),
                 state=release.get("STATUS"),
                 updated=release.get("UPDATED"),
-                values=HelmClient().releases.get_values(
-                    release.get("NAMESPACE"), release.get("NAME"), get_all=True)
+                values=release_values
             )
-            for release in releases
+            for release, release_values in zip(releases, values)
         )
         return [c for c in charts if self.has_permissions('helmsman.view_chart', c)]
 
@@ -1,7 +1,7 @@
 """A wrapper around the helm commandline client"""
 import shutil
 import tempfile
-import yaml
+from clusterman import yaml_codec
 from clusterman.clients import helpers
 from enum import Enum
 
@@ -74,7 +74,7 @@ class HelmReleaseService(HelmService):
         can't handle.
         """
         with tempfile.NamedTemporaryFile(mode="w", prefix="helmsman") as f:
-            yaml.dump(values, stream=f, default_flow_style=False)
+            yaml_codec.safe_dump(values, stream=f)
             cmd += ["-f", f.name]
             return helpers.run_command(cmd)
 
@@ -134,10 +134,26 @@ class HelmReleaseService(HelmService):
         get_all=True will also dump chart default values.
         get_all=False will only return user overridden values.
         """
+        return yaml_codec.safe_load(helpers.run_command(
+            self._get_values_cmd(namespace, release_name, get_all)))
+
+    def get_values_batch(self, releases, get_all=True):
+        """
+        Fetches values for many releases concurrently. releases is a list of
+        (namespace, release_name) tuples, and the values are returned in the
+        same order.
+        """
+        return helpers.run_batch_command(
+            [self._get_values_cmd(namespace, release_name, get_all)
+             for namespace, release_name in releases],
+            parser=yaml_codec.safe_load)
+
+    @staticmethod
+    def _get_values_cmd(namespace, release_name, get_all):
         cmd = ["helm", "get", "values", "--namespace", namespace, release_name]
         if get_all:
             cmd += ["--all"]
-        return yaml.safe_load(helpers.run_command(cmd))
+        return cmd
 
     @staticmethod
     def parse_chart_name(name):
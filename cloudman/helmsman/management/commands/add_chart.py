@@ -1,8 +1,8 @@
-import yaml
-
 from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
 
+from clusterman import yaml_codec
+
 from ...api import HelmsManAPI, HMServiceContext
 from ...api import ChartExistsException, NamespaceNotFoundException
 
@@ -46,7 +46,7 @@ class Command(BaseCommand):
         values = None
         if values_file:
             with open(values_file, 'r') as f:
-                values = yaml.safe_load(f)
+                values = yaml_codec.safe_load(f)
         if not client.namespaces.get(namespace):
             print(f"Namespace '{namespace}' not found.")
             if create_namespace:
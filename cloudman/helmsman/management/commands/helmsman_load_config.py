@@ -1,10 +1,11 @@
 import argparse
 import tempfile
-import yaml
 
 from django.core.management import call_command
 from django.core.management.base import BaseCommand
 
+from clusterman import yaml_codec
+
 
 class Command(BaseCommand):
     help = 'Loads helmsman config data from a yaml file'
@@ -13,7 +14,7 @@ class Command(BaseCommand):
         parser.add_argument('config_file', type=argparse.FileType('r'))
 
     def handle(self, *args, **options):
-        settings = yaml.safe_load(options['config_file'].read())
+        settings = yaml_codec.safe_load(options['config_file'].read())
         self.process_settings(settings)
 
     @staticmethod
@@ -31,7 +32,7 @@ class Command(BaseCommand):
             if chart.get('values'):
                 values = chart.get('values')
                 with tempfile.NamedTemporaryFile(mode="w", prefix="helmsman") as f:
-                    yaml.dump(values, stream=f, default_flow_style=False)
+                    yaml_codec.safe_dump(values, stream=f)
                     extra_args["values_file"] = f.name
                     call_command("add_chart", chart.get('name'), **extra_args)
             else:
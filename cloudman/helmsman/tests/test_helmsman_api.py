@@ -1,8 +1,14 @@
+import os
+import tempfile
+
 from django.contrib.auth.models import User
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from clusterman.tests.command_trace import CommandRecorder
+from clusterman.tests.command_trace import ReplayMocker
+
 from .client_mocker import ClientMocker
 
 from helmsman.api import ChartExistsException
@@ -236,3 +242,27 @@ class NamespaceServiceTests(HelmsManServiceTestBase):
         response = self._delete_namespace(ns_id_now)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT, response.data)
         self._check_no_extra_namespaces_exist()
+
+
+class NamespaceCommandTraceTests(HelmsManServiceTestBase):
+
+    def setUp(self):
+        super().setUp()
+        fd, self.trace_file = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self.addCleanup(os.remove, self.trace_file)
+
+    def test_list_namespaces_command_count(self):
+        url = reverse('helmsman:namespaces-list')
+        with CommandRecorder(self.trace_file):
+            recorded = self.client.get(url)
+        self.assertEqual(recorded.status_code, status.HTTP_200_OK,
+                         recorded.data)
+
+        replay = ReplayMocker(self.trace_file)
+        ClientMocker(self, mockers=[replay])
+        response = self.client.get(url)
+        self.assertEqual(response.data, recorded.data)
+        # a listing is served by a single kubectl call
+        self.assertEqual(replay.count_calls(prog='kubectl'), 1)
+        self.assertEqual(replay.call_count, 1)
@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from django.template.defaultfilters import slugify
 
 from . import models
+from clusterman import queryset_rules
 from helmsman.api import HelmsManAPI, HMServiceContext
 from helmsman.api import NamespaceExistsException
 from rest_framework.exceptions import PermissionDenied
@@ -45,6 +46,14 @@ class PMService(object):
             scope = [scopes]
         return self.context.user.has_perms(scope, obj)
 
+    def filter_permitted(self, scope, queryset):
+        """
+        Returns the objects in queryset which the user has permission scope
+        on, filtering in the database where the rule allows it.
+        """
+        return queryset_rules.filter_objects(self.context.user, scope,
+                                             queryset)
+
     def check_permissions(self, scopes, obj=None):
         if not self.has_permissions(scopes, obj):
             self.raise_no_permissions(scopes)
@@ -91,8 +100,8 @@ class PMProjectService(PMService):
     def list(self):
         return list(map(
             self.to_api_object,
-            (proj for proj in models.CMProject.objects.all()
-             if self.has_permissions('projman.view_project', proj))))
+            self.filter_permitted('projman.view_project',
+                                  models.CMProject.objects.all())))
 
     def get(self, project_id):
         obj = models.CMProject.objects.get(id=project_id)
@@ -128,14 +137,12 @@ class PMProjectService(PMService):
             self.raise_no_permissions('projman.delete_project')
 
     def find(self, name):
-        try:
-            obj = models.CMProject.objects.get(name=name)
-            if self.has_permissions('projman.view_project', obj):
-                return self.to_api_object(obj)
-            else:
-                return None
-        except models.CMProject.DoesNotExist:
-            return None
+        objs = self.filter_permitted(
+            'projman.view_project',
+            models.CMProject.objects.filter(name=name))
+        for obj in objs:
+            return self.to_api_object(obj)
+        return None
 
 
 class PMProjectChartService(PMService):
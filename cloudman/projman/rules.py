@@ -1,5 +1,7 @@
 import rules
 
+from clusterman import queryset_rules
+
 # Delegate to keycloak in future iteration
 
 # Predicates
@@ -28,3 +30,8 @@ rules.add_perm('projman.view_chart', rules.is_authenticated)
 rules.add_perm('projman.add_chart', is_chart_owner | rules.is_staff)
 rules.add_perm('projman.change_chart', is_chart_owner | rules.is_staff)
 rules.add_perm('projman.delete_chart', is_chart_owner | rules.is_staff)
+
+
+# Queryset filters, so that listings are filtered in the database
+queryset_rules.add_filter('projman.view_project',
+                          queryset_rules.user_level(rules.is_authenticated))
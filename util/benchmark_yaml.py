@@ -0,0 +1,139 @@
+"""
+Micro-benchmark comparing the pure python and libyaml backed yaml codecs on
+payloads shaped like the ones CloudMan parses on its hot paths: the output
+of ``kubectl get nodes -o yaml`` and ``helm get values --all``.
+
+Usage: python util/benchmark_yaml.py [--nodes 200] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'cloudman'))
+
+from clusterman import yaml_codec  # noqa: E402
+
+
+def make_node(index):
+    name = f"ip-10-0-{index // 250}-{index % 250}.ec2.internal"
+    ip_address = f"10.0.{index // 250}.{index % 250}"
+    return {
+        "apiVersion": "v1",
+        "kind": "Node",
+        "metadata": {
+            "annotations": {
+                "flannel.alpha.coreos.com/public-ip": ip_address,
+                "node.alpha.kubernetes.io/ttl": "0",
+                "rke.cattle.io/internal-ip": ip_address,
+                "volumes.kubernetes.io/controller-managed-attach-detach":
+                    "true",
+            },
+            "creationTimestamp": "2020-03-29T09:56:06Z",
+            "labels": {
+                "beta.kubernetes.io/arch": "amd64",
+                "beta.kubernetes.io/instance-type": "m5.2xlarge",
+                "beta.kubernetes.io/os": "linux",
+                "failure-domain.beta.kubernetes.io/region": "us-east-1",
+                "failure-domain.beta.kubernetes.io/zone": "us-east-1b",
+                "kubernetes.io/hostname": name,
+                "node-role.kubernetes.io/worker": "true",
+            },
+            "name": name,
+            "resourceVersion": str(3932510 + index),
+            "selfLink": f"/api/v1/nodes/{name}",
+            "uid": f"166c6e35-76b7-4f28-a1a0-{index:012d}",
+        },
+        "spec": {"podCIDR": f"10.42.{index % 256}.0/24",
+                 "providerID": f"aws:///us-east-1b/i-{index:017x}"},
+        "status": {
+            "addresses": [
+                {"address": f"10.0.{index // 250}.{index % 250}",
+                 "type": "InternalIP"},
+                {"address": name, "type": "Hostname"},
+            ],
+            "allocatable": {"cpu": "8", "ephemeral-storage": "96625420948",
+                            "memory": "32010788Ki", "pods": "110"},
+            "capacity": {"cpu": "8", "ephemeral-storage": "104845292Ki",
+                         "memory": "32113188Ki", "pods": "110"},
+            "conditions": [
+                {"lastHeartbeatTime": "2020-04-01T10:00:00Z",
+                 "lastTransitionTime": "2020-03-29T09:56:06Z",
+                 "message": f"kubelet has sufficient {kind} available",
+                 "reason": f"KubeletHasSufficient{kind.title()}",
+                 "status": "False", "type": f"{kind.title()}Pressure"}
+                for kind in ("memory", "disk", "pid")
+            ],
+            "images": [
+                {"names": [f"docker.io/cloudve/image-{i}@sha256:{i:064x}",
+                           f"docker.io/cloudve/image-{i}:latest"],
+                 "sizeBytes": 100000000 + i}
+                for i in range(10)
+            ],
+            "nodeInfo": {"architecture": "amd64",
+                         "containerRuntimeVersion": "docker://19.3.8",
+                         "kernelVersion": "4.15.0-1063-aws",
+                         "kubeletVersion": "v1.17.4",
+                         "operatingSystem": "linux",
+                         "osImage": "Ubuntu 18.04.4 LTS"},
+        },
+    }
+
+
+def make_values(sections):
+    return {
+        f"section{i}": {
+            "enabled": True,
+            "image": {"repository": f"cloudve/component-{i}", "tag": "20.05",
+                      "pullPolicy": "IfNotPresent"},
+            "resources": {"requests": {"cpu": "100m", "memory": "1G"},
+                          "limits": {"cpu": "2", "memory": "4G"}},
+            "configs": {f"file{j}.yml": f"key_{j}: value_{j}\n" * 5
+                        for j in range(5)},
+            "extraEnv": [{"name": f"ENV_{j}", "value": str(j)}
+                         for j in range(10)],
+        }
+        for i in range(sections)
+    }
+
+
+def bench(label, func, repeat):
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"  {label:<28}{best * 1000:10.1f} ms")
+    return best
+
+
+def compare(title, data, repeat):
+    text = yaml.dump(data, default_flow_style=False)
+    print(f"{title} ({len(text) / 1024:.0f} KB)")
+    py_load = bench("load (SafeLoader)",
+                    lambda: yaml.load(text, Loader=yaml.SafeLoader), repeat)
+    c_load = bench("load (yaml_codec)",
+                   lambda: yaml_codec.safe_load(text), repeat)
+    py_dump = bench("dump (SafeDumper)",
+                    lambda: yaml.dump(data, Dumper=yaml.SafeDumper,
+                                      default_flow_style=False), repeat)
+    c_dump = bench("dump (yaml_codec)",
+                   lambda: yaml_codec.safe_dump(data), repeat)
+    print(f"  speedup: load x{py_load / c_load:.1f}, "
+          f"dump x{py_dump / c_dump:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--nodes', type=int, default=200)
+    parser.add_argument('--sections', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    print(f"libyaml available: {yaml_codec.LIBYAML_AVAILABLE}")
+    node_list = {"apiVersion": "v1", "kind": "List",
+                 "items": [make_node(i) for i in range(args.nodes)]}
+    compare(f"kubectl get nodes, {args.nodes} nodes", node_list, args.repeat)
+    compare(f"helm values, {args.sections} sections",
+            make_values(args.sections), args.repeat)
+
+
+if __name__ == '__main__':
+    main()